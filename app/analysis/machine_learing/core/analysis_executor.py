@@ -0,0 +1,308 @@
+"""
+统计分析执行器
+支持串行执行和多进程并行执行统计分析
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from app.core.logging import app_logger
+
+# 工作进程内共享的清洗后数据和中间结果，由进程池初始化函数写入，每个工作进程只接收一次
+_shared_data: pd.DataFrame | None = None
+_shared_intermediates: Dict[str, Any] = {}
+
+
+def _init_worker(data: pd.DataFrame | str, intermediates: Dict[str, Any]) -> None:
+    """
+    进程池初始化函数：把数据和中间结果保存到工作进程的全局变量中
+
+    Args:
+        data: 数据所在的 Parquet 文件路径；数据无法写入 Parquet 时为 DataFrame 本身
+        intermediates: 中间结果
+    """
+    global _shared_data, _shared_intermediates
+    _shared_data = pd.read_parquet(data) if isinstance(data, str) else data
+    _shared_intermediates = intermediates
+
+
+def _write_shared_data(data: pd.DataFrame) -> str | None:
+    """
+    把数据写入临时 Parquet 文件，供各工作进程读取
+
+    Returns:
+        文件路径；数据无法写入 Parquet（如列中混有不同类型的值）时返回 None
+    """
+    fd, path = tempfile.mkstemp(prefix="analysis_data_", suffix=".parquet")
+    os.close(fd)
+    try:
+        data.to_parquet(path)
+        return path
+    except Exception as e:
+        os.unlink(path)
+        app_logger.warning(f"数据无法写入 Parquet，改为随进程池初始化函数传给工作进程: {str(e)}")
+        return None
+
+
+def _run_in_worker(analysis_name: str, function: Callable, requires: List[str]) -> Dict[str, Any]:
+    """在工作进程中使用共享数据运行单个统计分析"""
+    inputs = {name: _shared_intermediates[name] for name in requires}
+    return run_single_analysis(analysis_name, function, _shared_data, inputs)
+
+
+def collect_required_intermediates(analyses: Dict[str, Dict[str, Any]]) -> List[str]:
+    """收集一组统计分析声明依赖的中间结果名称（去重并保持顺序）"""
+    required = []
+    for analysis_config in analyses.values():
+        for name in analysis_config.get("requires", []):
+            if name not in required:
+                required.append(name)
+    return required
+
+
+def build_intermediates(
+    intermediate_specs: Dict[str, Dict[str, Any]],
+    required: List[str],
+    data: pd.DataFrame,
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    按依赖关系计算统计分析共享的中间结果，每个中间结果只计算一次
+
+    Args:
+        intermediate_specs: {中间结果名称: {"function": 计算函数, "requires": 依赖的其它中间结果}}
+        required: 需要计算的中间结果名称
+        data: 清洗后的数据（计算函数不得修改）
+
+    Returns:
+        (计算成功的中间结果, {计算失败的中间结果名称: 错误信息})
+    """
+    values: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+
+    def resolve(name: str, path: List[str]) -> None:
+        if name in values or name in errors:
+            return
+        if name in path:
+            errors[name] = f"中间结果存在循环依赖: {' -> '.join(path + [name])}"
+            return
+
+        spec = intermediate_specs.get(name)
+        if spec is None:
+            errors[name] = f"未定义的中间结果: {name}"
+            return
+
+        requires = spec.get("requires", [])
+        for dependency in requires:
+            resolve(dependency, path + [name])
+
+        failed = [dependency for dependency in requires if dependency in errors]
+        if failed:
+            errors[name] = f"依赖的中间结果计算失败: {', '.join(failed)}"
+            return
+
+        try:
+            values[name] = spec["function"](data, **{dependency: values[dependency] for dependency in requires})
+            app_logger.info(f"中间结果 {name} 计算完成")
+        except Exception as e:
+            errors[name] = str(e)
+            app_logger.error(f"中间结果 {name} 计算失败: {str(e)}")
+
+    for name in required:
+        resolve(name, [])
+
+    return values, errors
+
+
+def run_single_analysis(
+    analysis_name: str,
+    function: Callable,
+    data: pd.DataFrame,
+    inputs: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    运行单个统计分析
+
+    部分分析函数会原地修改传入的数据（如去除空白、覆盖时间列），
+    因此每个分析都使用独立的副本，保证结果与执行顺序和执行方式无关
+
+    Args:
+        analysis_name: 分析名称
+        function: 分析函数
+        data: 清洗后的数据
+        inputs: 分析依赖的中间结果，以关键字参数传入分析函数
+
+    Returns:
+        与任务结果中 analysis_results 条目一致的结果字典
+    """
+    app_logger.info(f"开始运行统计分析: {analysis_name}")
+    start = time.perf_counter()
+
+    try:
+        analysis_result = function(data.copy(), **(inputs or {}))
+        app_logger.info(f"统计分析 {analysis_name} 完成")
+        return {
+            "status": "success",
+            "result": analysis_result,
+            "duration_seconds": round(time.perf_counter() - start, 3),
+        }
+    except Exception as e:
+        app_logger.error(f"统计分析 {analysis_name} 运行失败: {str(e)}")
+        return {
+            "status": "failed",
+            "message": f"统计分析 {analysis_name} 运行失败: {str(e)}",
+            "duration_seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+async def run_analyses(
+    analyses: Dict[str, Dict[str, Any]],
+    data: pd.DataFrame,
+    intermediate_specs: Dict[str, Dict[str, Any]] | None = None,
+    mode: str = "serial",
+    max_workers: int = 0,
+    on_result: Callable[[str, Dict[str, Any]], None] | None = None,
+    checkpoint: Callable[[], None] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    执行一组统计分析
+
+    先计算各分析声明依赖（requires）的共享中间结果，再把中间结果分发给对应的分析
+
+    Args:
+        analyses: {分析名称: {"function": 分析函数, "requires": 依赖的中间结果}}
+        data: 清洗后的数据
+        intermediate_specs: 可用的中间结果定义，见 build_intermediates
+        mode: 执行方式，serial 为串行，process 为多进程并行
+        max_workers: 进程池大小，0 表示取 CPU 核数与分析数量中的较小值
+        on_result: 每个分析结束时以 (分析名称, 结果字典) 调用，用于上报进度
+        checkpoint: 取消检查点，在各分析之间调用，抛出的异常会中止剩余的分析并向上传播
+
+    Returns:
+        {分析名称: 结果字典}，顺序与 analyses 一致
+    """
+    def report(analysis_name: str, analysis_result: Dict[str, Any]) -> None:
+        if on_result is not None:
+            on_result(analysis_name, analysis_result)
+
+    intermediates, intermediate_errors = build_intermediates(
+        intermediate_specs or {}, collect_required_intermediates(analyses), data
+    )
+
+    # 依赖的中间结果计算失败的分析直接记为失败，其余分析正常执行
+    analysis_results = {}
+    runnable = {}
+    for analysis_name, analysis_config in analyses.items():
+        failed = [name for name in analysis_config.get("requires", []) if name in intermediate_errors]
+        if failed:
+            message = "; ".join(f"{name}: {intermediate_errors[name]}" for name in failed)
+            app_logger.error(f"统计分析 {analysis_name} 依赖的中间结果计算失败: {message}")
+            analysis_results[analysis_name] = {
+                "status": "failed",
+                "message": f"统计分析 {analysis_name} 运行失败: 依赖的中间结果计算失败 ({message})",
+            }
+            report(analysis_name, analysis_results[analysis_name])
+        else:
+            runnable[analysis_name] = analysis_config
+
+    if mode == "process" and len(runnable) > 1:
+        # 守护进程（如 Celery prefork 子进程）不允许再创建子进程；Worker 启动时已对该配置组合给出警告
+        if multiprocessing.current_process().daemon:
+            app_logger.debug("当前进程为守护进程，无法创建进程池，统计分析改为串行执行")
+            mode = "serial"
+    elif mode not in ("serial", "process"):
+        app_logger.warning(f"不支持的统计分析执行方式: {mode}，改为串行执行")
+
+    if mode == "process" and len(runnable) > 1:
+        analysis_results.update(
+            await _run_in_process_pool(runnable, data, intermediates, max_workers, report, checkpoint)
+        )
+    else:
+        for analysis_name, analysis_config in runnable.items():
+            if checkpoint is not None:
+                checkpoint()
+            inputs = {name: intermediates[name] for name in analysis_config.get("requires", [])}
+            analysis_results[analysis_name] = run_single_analysis(
+                analysis_name, analysis_config["function"], data, inputs
+            )
+            report(analysis_name, analysis_results[analysis_name])
+
+    return {analysis_name: analysis_results[analysis_name] for analysis_name in analyses}
+
+
+async def _run_in_process_pool(
+    analyses: Dict[str, Dict[str, Any]],
+    data: pd.DataFrame,
+    intermediates: Dict[str, Any],
+    max_workers: int,
+    report: Callable[[str, Dict[str, Any]], None],
+    checkpoint: Callable[[], None] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    使用进程池并行执行统计分析
+
+    数据只写入一次临时 Parquet 文件，各工作进程在初始化时读取，不再为每个工作进程分别序列化整张表；
+    中间结果（聚合后的小表）通过进程池初始化函数传给每个工作进程一次，不随每个分析任务重复序列化。
+    使用 spawn 启动方式：执行统计分析的 Worker 进程可能已训练过模型、创建了 OpenMP 线程池（LightGBM、sklearn），
+    在这样的进程中 fork 会导致子进程死锁；只导入这些库而未执行计算的进程（如预加载模块的 Worker 父进程）fork 是安全的。
+    每个分析结束时调用取消检查点，触发后撤销尚未开始的分析，只等待正在运行的分析结束
+    """
+    workers = max_workers or min(len(analyses), os.cpu_count() or 1)
+    app_logger.info(f"使用 {workers} 个进程并行运行 {len(analyses)} 个统计分析")
+
+    loop = asyncio.get_running_loop()
+    analysis_results = {}
+
+    async def run(executor: ProcessPoolExecutor, analysis_name: str, analysis_config: Dict[str, Any]) -> None:
+        try:
+            analysis_results[analysis_name] = await loop.run_in_executor(
+                executor,
+                _run_in_worker,
+                analysis_name,
+                analysis_config["function"],
+                analysis_config.get("requires", []),
+            )
+        except Exception as e:
+            # 工作进程崩溃、结果无法序列化等进程池层面的错误
+            app_logger.error(f"统计分析 {analysis_name} 运行失败: {str(e)}")
+            analysis_results[analysis_name] = {
+                "status": "failed",
+                "message": f"统计分析 {analysis_name} 运行失败: {str(e)}",
+            }
+        report(analysis_name, analysis_results[analysis_name])
+
+        if checkpoint is not None:
+            try:
+                checkpoint()
+            except Exception:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    data_file = _write_shared_data(data)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(data_file or data, intermediates),
+        ) as executor:
+            outcomes = await asyncio.gather(
+                *(run(executor, analysis_name, analysis_config) for analysis_name, analysis_config in analyses.items()),
+                return_exceptions=True,
+            )
+    finally:
+        if data_file is not None:
+            os.unlink(data_file)
+
+    # 检查点抛出的异常（被撤销的分析只会得到 CancelledError）
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            raise outcome
+
+    return {analysis_name: analysis_results[analysis_name] for analysis_name in analyses}
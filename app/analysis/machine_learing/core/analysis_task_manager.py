@@ -1,15 +1,48 @@
+import hashlib
+import os
+import time
 import traceback
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 import pandas as pd
 import pickle
 import json
+import shutil
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.celery_app import BULK_QUEUE, FAST_QUEUE
 from app.core.config import settings
 from app.core.logging import app_logger
+from app.analysis.machine_learing.core.analysis_executor import (
+    build_intermediates,
+    collect_required_intermediates,
+    run_analyses,
+    run_single_analysis,
+)
+from app.analysis.machine_learing.core.result_memo import (
+    ResultMemo,
+    data_fingerprint,
+    memo_key,
+    source_paths,
+)
+from app.analysis.machine_learing.core.report_blob import (
+    remove_report_blobs,
+    select_report_blob,
+    write_report_blobs,
+)
+from app.analysis.machine_learing.core.task_artifact import (
+    ARTIFACT_NAMES,
+    COMPREHENSIVE_ANALYSIS,
+    RESULTS,
+    artifact_exists,
+    artifact_version,
+    read_artifact,
+    read_section,
+    remove_artifact,
+    write_artifact,
+)
 from app.analysis.machine_learing.models import ModelVersionManager
 from app.analysis.machine_learing.trainers import (
     what_if_decision_simulator_lgbmclassfier as wi_trainer,
@@ -29,8 +62,15 @@ from app.db.models.analysis import (
     StudentSatisfactionRouteSankeyChartData
 )
 from app.service.analysis_service import AnalysisService
+from app.service.data_clean_service import CLEAN_PIPELINE_VERSION
 from app.service.analysis_summary_rag_service import AnalysisSummaryRAGService
 from app.enum.enums import AnalysisStatusEnum
+from app.exception.exceptions.analysis import AnalysisCancelledError
+from app.utils.code_fingerprint import code_fingerprint
+from app.utils.json_utils import json_default
+from app.utils.memory_usage import PeakRssTracker, dataframe_memory_mb
+from app.utils.task_cancellation import raise_if_cancelled
+from app.utils.task_progress import publish_progress
 
 
 class AnalysisTaskManager:
@@ -58,6 +98,9 @@ class AnalysisTaskManager:
         # 分析总结服务
         self.summary_service = AnalysisSummaryRAGService()
 
+        # 单项结果缓存
+        self.result_memo = ResultMemo()
+
         # 支持的模型类型
         self.supported_models = {
             # "satisfaction_part": {
@@ -77,15 +120,35 @@ class AnalysisTaskManager:
             # },
             "what_if_decision_simulator": {
                 "trainer": wi_trainer.async_train,
+                # 影响训练结果的任务配置项，参与单项结果缓存键的计算
+                "params": ["target_column", "feature_score_threshold"],
                 "requires_target": True,
                 "description": "What-If决策模拟器",
             },
         }
 
+        # 统计分析共享的中间结果，每个任务只计算一次，再以同名关键字参数传给声明依赖（requires）的分析
+        self.supported_intermediates = {
+            "grouped_cells": {
+                "function": statistical.build_grouped_cells,
+                "description": "学院→专业→年级 分组",
+            },
+            "category_means": {
+                "function": statistical.build_category_means,
+                # 依赖部分满意度分析的预处理函数，其源码变化同样影响结果
+                "sources": [
+                    "analysis/statistical/shared_intermediates.py",
+                    "analysis/statistical/satisfaction_part_chart",
+                ],
+                "description": "满意度十二个类别的均值",
+            },
+        }
+
         # 支持的统计分析类型
         self.supported_analyses = {
             "group_comparison_radar_chart": {
                 "function": statistical.create_radar_echarts_json,
+                "requires": ["grouped_cells"],
                 "description": "雷达图分析",
             },
             "teacher_student_interaction_bubble_chart": {
@@ -94,6 +157,7 @@ class AnalysisTaskManager:
             },
             "student_time_allocation_pie_chart": {
                 "function": statistical.build_academy_array,
+                "requires": ["grouped_cells"],
                 "description": "学生时间分配饼图分析",
             },
             "academic_maturity_by_grade_aggregator": {
@@ -102,10 +166,12 @@ class AnalysisTaskManager:
             },
             "correlation_based_EHI_builder": {
                 "function": statistical.DataProcessor.process_dataframe_to_json,
+                "requires": ["grouped_cells"],
                 "description": "基于EHI的关联性分析仪表盘+雷达图",
             },
             "correlation_based_RPI_builder": {
                 "function": statistical.RPIProcessor.process_dataframe_to_json,
+                "requires": ["grouped_cells"],
                 "description": "基于RPI的关联性分析仪表盘+雷达图+热力图",
             },
             "student_portrait_chart": {
@@ -114,14 +180,18 @@ class AnalysisTaskManager:
             },
             "satisfaction_part_chart": {
                 "function": statistical.analyze_feedback_satisfaction,
+                "requires": ["category_means"],
                 "description": "部分满意度分析",
             },
             "satisfaction_whole_chart": {
                 "function": statistical.analyze_feedback,
+                "requires": ["category_means"],
                 "description": "整体满意度分析",
             },
             "student_satisfaction_route_sankey_chart": {
                 "function": statistical.analysis,
+                # 结构方程模型拟合耗时较长，拆分执行时放到批量队列，不阻塞其它图表
+                "queue": BULK_QUEUE,
                 "description": "学生满意度路线图分析"
             }
         }
@@ -148,7 +218,7 @@ class AnalysisTaskManager:
         analyses_to_run: List[str] = None,
         target_column: str = "学校整体满意度",
         feature_score_threshold: float = 0.16,
-
+        memo_key: str = None,
     ) -> AnalysisTask:
         """
         创建分析任务（仅创建任务记录，不执行分析）
@@ -159,6 +229,7 @@ class AnalysisTaskManager:
             analyses_to_run: 要运行的统计分析列表，如果为None则运行所有分析
             target_column: 目标列名（仅what_if模型需要）
             feature_score_threshold: 特征选择分数阈值（仅what_if模型需要）
+            memo_key: 任务结果复用键，见 compute_memo_key
 
         Returns:
             创建的分析任务对象
@@ -169,16 +240,12 @@ class AnalysisTaskManager:
         #     status=AnalysisStatusEnum.PENDING.value(),
         #     summary="",
         # )
-        task = await self.analysis_service.create_analysis_task(data_id, db)
+        task = await self.analysis_service.create_analysis_task(data_id, db, memo_key=memo_key)
 
         # 保存任务配置
-        task_config = {
-            "models_to_train": models_to_train if models_to_train else list(self.supported_models.keys()),
-            "analyses_to_run": analyses_to_run if analyses_to_run else list(self.supported_analyses.keys()),
-            "target_column": target_column,
-            "feature_score_threshold": feature_score_threshold,
-            "description": "",
-        }
+        task_config = self.build_task_config(
+            models_to_train, analyses_to_run, target_column, feature_score_threshold
+        )
 
         # 创建任务目录
         task_id = str(task.id)
@@ -193,155 +260,700 @@ class AnalysisTaskManager:
         app_logger.info(f"创建分析任务: {task_id}")
         return task
 
-    async def execute_analysis_task(
+    def build_task_config(
         self,
-        task_id: str,
-        data: pd.DataFrame,
+        models_to_train: List[str] = None,
+        analyses_to_run: List[str] = None,
+        target_column: str = "学校整体满意度",
+        feature_score_threshold: float = 0.16,
     ) -> Dict[str, Any]:
+        """构建任务配置（config.json 的内容），未指定模型或统计分析时使用全部"""
+        return {
+            "models_to_train": models_to_train if models_to_train else list(self.supported_models.keys()),
+            "analyses_to_run": analyses_to_run if analyses_to_run else list(self.supported_analyses.keys()),
+            "target_column": target_column,
+            "feature_score_threshold": feature_score_threshold,
+            "description": "",
+        }
+
+    @staticmethod
+    def compute_memo_key(data_hash: str, task_config: Dict[str, Any]) -> str:
         """
-        执行分析任务（训练模型并运行统计分析）
+        计算任务结果复用键
+
+        由上传文件哈希、清洗设置（清洗流程版本号、是否压缩数据类型）、规范化后的任务配置和分析代码指纹组成，
+        都相同时任务结果完全一致；模型和统计分析列表与顺序无关，任务描述不影响结果
 
         Args:
-            task_id: 任务ID
-            data: 输入数据
+            data_hash: 上传文件的哈希（Upload.hash）
+            task_config: 任务配置
 
         Returns:
-            任务结果字典
+            SHA-256 十六进制字符串
         """
+        normalized_config = {
+            "models_to_train": sorted(set(task_config.get("models_to_train", []))),
+            "analyses_to_run": sorted(set(task_config.get("analyses_to_run", []))),
+            "target_column": task_config.get("target_column"),
+            "feature_score_threshold": float(task_config.get("feature_score_threshold", 0.1)),
+        }
+        # 清洗流程和数据类型压缩会改变分析输入的取值和类型，切换后不能复用之前的结果
+        clean_settings = {
+            "pipeline_version": CLEAN_PIPELINE_VERSION,
+            "compact_dataframe": settings.compact_cleaned_dataframe,
+        }
+        payload = json.dumps(
+            {
+                "data_hash": data_hash,
+                "clean": clean_settings,
+                "config": normalized_config,
+                "code_version": code_fingerprint(),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load_reusable_results(self, task_id: str) -> Dict[str, Any] | None:
+        """
+        读取可供其它任务复用的结果
+
+        只有任务结果存在且所有模型和统计分析都成功时才可复用
+
+        Returns:
+            任务结果，不可复用时返回 None
+        """
+        try:
+            results = read_artifact(self.output_dir / task_id, RESULTS)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"读取任务 {task_id} 的结果失败: {str(e)}")
+            return None
+
+        if results.get("task_info", {}).get("status") != AnalysisStatusEnum.COMPLETED.value:
+            return None
+        parts = list(results.get("model_results", {}).values()) + list(results.get("analysis_results", {}).values())
+        if any(part.get("status") != "success" for part in parts):
+            return None
+        return results
+
+    def link_task_artifacts(self, source_task_id: str, task_id: str, results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        让新任务复用已完成任务的产物
+
+        模型文件以硬链接方式放入新任务目录（跨文件系统时复制），任务结果改写任务信息后保存；
+        综合分析报告与任务绑定（含 LLM 点评和数据库记录），不复用
+
+        Args:
+            source_task_id: 被复用的任务ID
+            task_id: 新任务ID
+            results: 被复用任务的结果（见 load_reusable_results）
+
+        Returns:
+            新任务的结果字典
+        """
+        source_dir = self._get_task_dir(source_task_id)
+        task_dir = self.output_dir / task_id
+        task_dir.mkdir(parents=True, exist_ok=True)
+
+        for model_name in results["task_info"].get("models_trained", []):
+            for model_file in source_dir.glob(f"{model_name}_v*.pkl"):
+                target_file = task_dir / model_file.name
+                if target_file.exists():
+                    continue
+                try:
+                    os.link(model_file, target_file)
+                except OSError:
+                    shutil.copy2(model_file, target_file)
+
+        task_info = {
+            **results["task_info"],
+            "task_id": task_id,
+            "output_dir": str(task_dir),
+            "reused_from": source_task_id,
+            "created_at": datetime.now().isoformat(),
+            "completed_at": datetime.now().isoformat(),
+        }
+        results = {**results, "task_info": task_info}
+        write_artifact(task_dir, RESULTS, results)
+
+        app_logger.info(f"分析任务 {task_id} 复用任务 {source_task_id} 的结果")
+        return results
+
+    def _get_task_dir(self, task_id: str) -> Path:
+        """获取任务目录，不存在时抛出 FileNotFoundError"""
         task_dir = self.output_dir / task_id
         if not task_dir.exists():
             raise FileNotFoundError(f"任务目录不存在: {task_id}")
+        return task_dir
 
-        # 加载任务配置
-        config_file = task_dir / "config.json"
+    def load_task_config(self, task_id: str) -> Dict[str, Any]:
+        """
+        加载任务配置
+
+        Args:
+            task_id: 任务ID
+
+        Returns:
+            任务配置字典
+        """
+        config_file = self._get_task_dir(task_id) / "config.json"
         if not config_file.exists():
             raise FileNotFoundError(f"任务配置文件不存在: {config_file}")
 
         with open(config_file, "r", encoding="utf-8") as f:
-            task_config = json.load(f)
+            return json.load(f)
 
-        # 记录任务信息
-        task_info = {
+    def _select_models(self, task_config: Dict[str, Any]) -> List[str]:
+        """过滤出任务配置中受支持的模型"""
+        models = []
+        for model_name in task_config.get("models_to_train", []):
+            if model_name not in self.supported_models:
+                app_logger.warning(f"不支持的模型类型: {model_name}")
+                continue
+            models.append(model_name)
+        return models
+
+    def _select_analyses(self, task_config: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """过滤出任务配置中受支持的统计分析"""
+        analysis_configs = {}
+        for analysis_name in task_config.get("analyses_to_run", []):
+            if analysis_name not in self.supported_analyses:
+                app_logger.warning(f"不支持的统计分析类型: {analysis_name}")
+                continue
+            analysis_configs[analysis_name] = self.supported_analyses[analysis_name]
+        return analysis_configs
+
+    async def train_model(
+        self,
+        task_id: str,
+        model_name: str,
+        data: pd.DataFrame,
+        task_config: Dict[str, Any],
+        data_hash: str = None,
+    ) -> Dict[str, Any]:
+        """
+        训练单个模型
+
+        提供 data_hash 时先查找单项结果缓存，命中则直接把缓存的模型文件放入任务目录；
+        训练成功后写入缓存
+
+        Args:
+            task_id: 任务ID
+            model_name: 模型名称
+            data: 输入数据
+            task_config: 任务配置
+            data_hash: 输入数据指纹，见 data_fingerprint
+
+        Returns:
+            与任务结果中 model_results 条目一致的结果字典
+        """
+        key = self._model_memo_key(model_name, task_config, data_hash)
+        cached = self._load_memo("model", key)
+        if cached is not None:
+            self.result_memo.restore_files("model", key, self.output_dir / task_id)
+            app_logger.info(f"模型 {model_name} 命中结果缓存")
+            return cached
+
+        result = await self._train_model(task_id, model_name, data, task_config)
+        if key is not None and result["status"] == "success":
+            # 同一任务目录中可能留有重试前的旧版本，只缓存最新的模型文件
+            model_files = sorted(
+                (self.output_dir / task_id).glob(f"{model_name}_v*.pkl"),
+                key=lambda path: path.stat().st_mtime,
+            )
+            self.result_memo.save("model", key, result, model_files[-1:])
+        return result
+
+    async def _train_model(
+        self,
+        task_id: str,
+        model_name: str,
+        data: pd.DataFrame,
+        task_config: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """训练单个模型（不经过单项结果缓存）"""
+        app_logger.info(f"开始训练模型: {model_name}")
+        model_config = self.supported_models[model_name]
+        start = time.perf_counter()
+
+        try:
+            if model_name == "what_if_decision_simulator":
+                # what_if模型需要目标列
+                target_column = task_config.get("target_column")
+                if target_column is None:
+                    raise ValueError(
+                        "what_if_decision_simulator模型需要指定target_column"
+                    )
+
+                if target_column not in data.columns:
+                    raise ValueError(f"数据中找不到目标列: {target_column}")
+
+                y = data[target_column]
+                feature_score_threshold = task_config.get("feature_score_threshold", 0.1)
+                await model_config["trainer"](
+                    data, y, feature_score_threshold, task_id,
+                    checkpoint=lambda: raise_if_cancelled(task_id),
+                )
+            else:
+                # 其他模型只需要数据
+                await model_config["trainer"](data)
+
+            app_logger.info(f"模型 {model_name} 训练完成")
+            return {
+                "status": "success",
+                "message": f"模型 {model_name} 训练成功",
+                "duration_seconds": round(time.perf_counter() - start, 3),
+            }
+
+        except AnalysisCancelledError:
+            app_logger.info(f"模型 {model_name} 训练已取消")
+            raise
+        except Exception as e:
+            app_logger.error(f"模型 {model_name} 训练失败: {str(e)}")
+            return {
+                "status": "failed",
+                "message": f"模型 {model_name} 训练失败: {str(e)}",
+                "duration_seconds": round(time.perf_counter() - start, 3),
+            }
+
+    def _model_memo_key(self, model_name: str, task_config: Dict[str, Any], data_hash: str | None) -> str | None:
+        """计算模型训练结果的缓存键，未提供数据指纹时返回 None"""
+        if data_hash is None:
+            return None
+        model_config = self.supported_models[model_name]
+        params = {name: task_config.get(name) for name in model_config.get("params", [])}
+        sources = model_config.get("sources") or source_paths(model_config["trainer"])
+        return memo_key("model", model_name, data_hash, params, sources)
+
+    def _analysis_memo_key(self, analysis_name: str, data_hash: str | None) -> str | None:
+        """计算统计分析结果的缓存键（源码包括其依赖的中间结果），未提供数据指纹时返回 None"""
+        if data_hash is None:
+            return None
+        analysis_config = self.supported_analyses[analysis_name]
+        sources = list(analysis_config.get("sources") or source_paths(analysis_config["function"]))
+        for name in analysis_config.get("requires", []):
+            spec = self.supported_intermediates[name]
+            sources += spec.get("sources") or source_paths(spec["function"])
+        return memo_key("analysis", analysis_name, data_hash, {}, sources)
+
+    def _data_hash(self, data: pd.DataFrame) -> str | None:
+        """计算输入数据指纹，关闭单项结果缓存时返回 None"""
+        if not settings.analysis_memo_enabled:
+            return None
+        return data_fingerprint(data)
+
+    def _load_memo(self, kind: str, key: str | None) -> Dict[str, Any] | None:
+        """读取单项结果缓存，命中时标记 cached"""
+        if key is None:
+            return None
+        result = self.result_memo.load(kind, key)
+        if result is None:
+            return None
+        return {**result, "cached": True, "duration_seconds": 0.0}
+
+    def _save_analysis_memo(self, key: str | None, result: Dict[str, Any]) -> None:
+        """统计分析成功时写入单项结果缓存"""
+        if key is not None and result["status"] == "success":
+            self.result_memo.save("analysis", key, result)
+
+    @staticmethod
+    def publish_part_progress(task_id: str, kind: str, name: str, result: Dict[str, Any]) -> None:
+        """发布单个模型训练或统计分析结束的进度事件"""
+        publish_progress(
+            task_id,
+            "model_trained" if kind == "model" else "analysis_finished",
+            name=name,
+            status=result.get("status"),
+            duration_seconds=result.get("duration_seconds"),
+            message=result.get("message"),
+        )
+
+    def _write_results(
+        self,
+        task_id: str,
+        task_info: Dict[str, Any],
+        model_results: Dict[str, Any],
+        analysis_results: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """汇总模型与统计分析结果，写入任务结果文件"""
+        task_info["models_trained"] = [
+            model_name
+            for model_name, model_result in model_results.items()
+            if model_result["status"] == "success"
+        ]
+        task_info["analyses_completed"] = [
+            analysis_name
+            for analysis_name, analysis_result in analysis_results.items()
+            if analysis_result["status"] == "success"
+        ]
+        task_info["status"] = AnalysisStatusEnum.COMPLETED.value
+        task_info["completed_at"] = datetime.now().isoformat()
+        app_logger.info(
+            f"分析任务 {task_id} 内存统计: 输入数据 {task_info.get('data_memory_mb')}MB, "
+            f"本次执行峰值 {task_info.get('peak_rss_mb')}MB（较开始时增加 {task_info.get('peak_rss_delta_mb')}MB，"
+            f"范围 {task_info.get('peak_rss_scope')}）"
+        )
+
+        results = {
+            "task_info": task_info,
+            "model_results": model_results,
+            "analysis_results": analysis_results,
+        }
+
+        # 保存结果到文件
+        write_artifact(self._get_task_dir(task_id), RESULTS, results)
+
+        app_logger.info(f"分析任务 {task_id} 完成")
+        return results
+
+    def _write_failed_results(self, task_id: str, task_info: Dict[str, Any], error: str) -> Dict[str, Any]:
+        """任务整体失败时写入任务结果文件"""
+        task_info["status"] = "failed"
+        task_info["error"] = error
+        task_info["failed_at"] = datetime.now().isoformat()
+
+        app_logger.error(f"分析任务 {task_id} 失败: {error}")
+
+        results = {"task_info": task_info, "error": error}
+        write_artifact(self._get_task_dir(task_id), RESULTS, results)
+
+        return results
+
+    def _new_task_info(self, task_id: str, task_config: Dict[str, Any], data: pd.DataFrame) -> Dict[str, Any]:
+        """创建任务结果中的任务信息"""
+        return {
             "task_id": task_id,
             "description": task_config.get("description"),
             "created_at": datetime.now().isoformat(),
             "status": AnalysisStatusEnum.PROCESSING.value,
             "models_trained": [],
             "analyses_completed": [],
-            "output_dir": str(task_dir),
+            "output_dir": str(self.output_dir / task_id),
+            # 输入数据的内存占用，用于对比 DataFrame 类型压缩前后的效果
+            "data_memory_mb": dataframe_memory_mb(data),
         }
 
+    async def execute_analysis_task(
+        self,
+        task_id: str,
+        data: pd.DataFrame,
+        memory: PeakRssTracker | None = None,
+    ) -> Dict[str, Any]:
+        """
+        在当前进程内执行分析任务（训练模型并运行统计分析）
+
+        Celery 默认把任务拆分为多个子任务执行（见 prepare_fan_out / finalize_fan_out），
+        关闭 analysis_fan_out 时使用本方法。任务被取消时清理已生成的产物并抛出 AnalysisCancelledError
+
+        Args:
+            task_id: 任务ID
+            data: 输入数据
+            memory: 本次执行的内存记录（在加载数据前创建），为 None 时从这里开始记录
+
+        Returns:
+            任务结果字典
+        """
+        memory = memory or PeakRssTracker()
+        task_config = self.load_task_config(task_id)
+
+        # 记录任务信息
+        task_info = self._new_task_info(task_id, task_config, data)
+
         try:
+            models = self._select_models(task_config)
+            analysis_configs = self._select_analyses(task_config)
+            publish_progress(task_id, "planned", models=models, analyses=list(analysis_configs))
+
+            data_hash = self._data_hash(data)
+
             # 1. 训练模型
-            models_to_train = task_config.get("models_to_train", [])
             model_results = {}
-            
-            for model_name in models_to_train:
-                if model_name not in self.supported_models:
-                    app_logger.warning(f"不支持的模型类型: {model_name}")
-                    continue
+            for model_name in models:
+                raise_if_cancelled(task_id)
+                model_results[model_name] = await self.train_model(
+                    task_id, model_name, data, task_config, data_hash
+                )
+                self.publish_part_progress(task_id, "model", model_name, model_results[model_name])
+
+            # 2. 运行统计分析，命中单项结果缓存的不再计算
+            memo_keys = {name: self._analysis_memo_key(name, data_hash) for name in analysis_configs}
+            cached_results = {}
+            for analysis_name in analysis_configs:
+                cached = self._load_memo("analysis", memo_keys[analysis_name])
+                if cached is not None:
+                    cached_results[analysis_name] = cached
+                    self.publish_part_progress(task_id, "analysis", analysis_name, cached)
+
+            def on_result(analysis_name: str, result: Dict[str, Any]) -> None:
+                self._save_analysis_memo(memo_keys[analysis_name], result)
+                self.publish_part_progress(task_id, "analysis", analysis_name, result)
+
+            computed_results = await run_analyses(
+                {name: config for name, config in analysis_configs.items() if name not in cached_results},
+                data,
+                intermediate_specs=self.supported_intermediates,
+                mode=settings.analysis_executor,
+                max_workers=settings.analysis_max_workers,
+                on_result=on_result,
+                checkpoint=lambda: raise_if_cancelled(task_id),
+            )
+            analysis_results = {
+                name: cached_results[name] if name in cached_results else computed_results[name]
+                for name in analysis_configs
+            }
 
-                app_logger.info(f"开始训练模型: {model_name}")
-                model_config = self.supported_models[model_name]
+            # 3. 保存任务结果
+            raise_if_cancelled(task_id)
+            task_info.update(memory.snapshot())
+            return self._write_results(task_id, task_info, model_results, analysis_results)
 
-                try:
-                    if model_name == "what_if_decision_simulator":
-                        # what_if模型需要目标列
-                        target_column = task_config.get("target_column")
-                        if target_column is None:
-                            raise ValueError(
-                                "what_if_decision_simulator模型需要指定target_column"
-                            )
-
-                        if target_column not in data.columns:
-                            raise ValueError(f"数据中找不到目标列: {target_column}")
-
-                        y = data[target_column]
-                        feature_score_threshold = task_config.get("feature_score_threshold", 0.1)
-                        model_result = await model_config["trainer"](
-                            data, y, feature_score_threshold, task_id
-                        )
-                    else:
-                        # 其他模型只需要数据
-                        model_result = await model_config["trainer"](data)
+        except AnalysisCancelledError:
+            self.cleanup_task_artifacts(task_id)
+            raise
+        except Exception as e:
+            return self._write_failed_results(task_id, task_info, str(e))
 
-                    model_results[model_name] = {
-                        "status": "success",
-                        "message": f"模型 {model_name} 训练成功",
-                    }
-                    task_info["models_trained"].append(model_name)
+    def prepare_fan_out(self, task_id: str, data: pd.DataFrame) -> Dict[str, List[str]]:
+        """
+        为拆分执行做准备：确定子任务列表，并计算统计分析共享的中间结果
 
-                    app_logger.info(f"模型 {model_name} 训练完成")
+        中间结果写入任务目录，各统计分析子任务直接读取，保证每个任务只计算一次
 
-                except Exception as e:
-                    model_results[model_name] = {
-                        "status": "failed",
-                        "message": f"模型 {model_name} 训练失败: {str(e)}",
-                    }
-                    app_logger.error(f"模型 {model_name} 训练失败: {str(e)}")
-
-            # 2. 运行统计分析
-            analyses_to_run = task_config.get("analyses_to_run", [])
-            analysis_results = {}
-            
-            for analysis_name in analyses_to_run:
-                if analysis_name not in self.supported_analyses:
-                    app_logger.warning(f"不支持的统计分析类型: {analysis_name}")
-                    continue
+        Args:
+            task_id: 任务ID
+            data: 清洗后的数据
 
-                app_logger.info(f"开始运行统计分析: {analysis_name}")
-                analysis_config = self.supported_analyses[analysis_name]
+        Returns:
+            {"models": 需要训练的模型, "analyses": 需要运行的统计分析, "analysis_queues": {统计分析: Celery 队列}}，
+            命中单项结果缓存的模型和统计分析已直接保存结果，不在其中
+        """
+        raise_if_cancelled(task_id)
+        task_config = self.load_task_config(task_id)
+        task_dir = self._get_task_dir(task_id)
+
+        models = self._select_models(task_config)
+        analysis_configs = self._select_analyses(task_config)
+        data_hash = self._data_hash(data)
+
+        plan_info = {
+            "models": models,
+            "analyses": list(analysis_configs),
+            "data_hash": data_hash,
+            "task_info": self._new_task_info(task_id, task_config, data),
+        }
+        with open(task_dir / "plan.json", "w", encoding="utf-8") as f:
+            json.dump(plan_info, f, ensure_ascii=False, indent=2, default=json_default)
+        publish_progress(task_id, "planned", models=models, analyses=list(analysis_configs))
+
+        # 清理上一次执行（如重试）残留的子任务结果
+        parts_dir = task_dir / "parts"
+        if parts_dir.exists():
+            for part_file in parts_dir.glob("*.json"):
+                part_file.unlink()
+        parts_dir.mkdir(exist_ok=True)
+
+        # 命中单项结果缓存的直接保存结果，不再分发子任务
+        pending_models = []
+        for model_name in models:
+            key = self._model_memo_key(model_name, task_config, data_hash)
+            cached = self._load_memo("model", key)
+            if cached is None:
+                pending_models.append(model_name)
+            else:
+                self.result_memo.restore_files("model", key, task_dir)
+                self.save_part(task_id, "model", model_name, cached)
+
+        pending_analyses = {}
+        for analysis_name, analysis_config in analysis_configs.items():
+            cached = self._load_memo("analysis", self._analysis_memo_key(analysis_name, data_hash))
+            if cached is None:
+                pending_analyses[analysis_name] = analysis_config
+            else:
+                self.save_part(task_id, "analysis", analysis_name, cached)
 
-                try:
-                    analysis_result = analysis_config["function"](data)
-                    analysis_results[analysis_name] = {
-                        "status": "success",
-                        "result": analysis_result,
-                    }
-                    task_info["analyses_completed"].append(analysis_name)
+        # 只计算仍需运行的统计分析依赖的中间结果
+        intermediates, intermediate_errors = build_intermediates(
+            self.supported_intermediates,
+            collect_required_intermediates(pending_analyses),
+            data,
+        )
+        with open(task_dir / "intermediates.pkl", "wb") as f:
+            pickle.dump({"values": intermediates, "errors": intermediate_errors}, f)
 
-                    app_logger.info(f"统计分析 {analysis_name} 完成")
+        app_logger.info(
+            f"分析任务 {task_id} 命中单项结果缓存: 模型 {len(models) - len(pending_models)}/{len(models)}, "
+            f"统计分析 {len(analysis_configs) - len(pending_analyses)}/{len(analysis_configs)}"
+        )
+        return {
+            "models": pending_models,
+            "analyses": list(pending_analyses),
+            "analysis_queues": {
+                analysis_name: analysis_config.get("queue", FAST_QUEUE)
+                for analysis_name, analysis_config in pending_analyses.items()
+            },
+        }
 
-                except Exception as e:
-                    analysis_results[analysis_name] = {
-                        "status": "failed",
-                        "message": f"统计分析 {analysis_name} 运行失败: {str(e)}",
-                    }
-                    app_logger.error(f"统计分析 {analysis_name} 运行失败: {str(e)}")
+    def _load_plan(self, task_id: str) -> Dict[str, Any]:
+        """读取 prepare_fan_out 写入的执行计划"""
+        with open(self._get_task_dir(task_id) / "plan.json", "r", encoding="utf-8") as f:
+            return json.load(f)
 
-            # 3. 保存任务结果
-            task_info["status"] = AnalysisStatusEnum.COMPLETED.value
-            task_info["completed_at"] = datetime.now().isoformat()
+    def save_part(
+        self, task_id: str, kind: str, name: str, result: Dict[str, Any], memory: PeakRssTracker | None = None
+    ) -> None:
+        """
+        保存单个子任务的结果（先写临时文件再原子替换），并发布进度事件
 
-            results = {
-                "task_info": task_info,
-                "model_results": model_results,
-                "analysis_results": analysis_results,
+        memory 为该子任务的内存记录，其峰值随结果保存，汇总时取各子任务的最大值
+        """
+        parts_dir = self._get_task_dir(task_id) / "parts"
+        parts_dir.mkdir(exist_ok=True)
+        part_file = parts_dir / f"{kind}__{name}.json"
+        temp_file = parts_dir / f"{kind}__{name}.json.tmp"
+
+        if memory is not None:
+            result = {**result, **memory.snapshot()}
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, default=json_default)
+        os.replace(temp_file, part_file)
+
+        self.publish_part_progress(task_id, kind, name, result)
+
+    async def run_model_part(
+        self, task_id: str, model_name: str, data: pd.DataFrame, memory: PeakRssTracker | None = None
+    ) -> str:
+        """
+        模型训练子任务：训练单个模型并保存结果
+
+        memory 为子任务开始（加载数据前）创建的内存记录
+
+        Returns:
+            子任务状态（success / failed）
+        """
+        raise_if_cancelled(task_id)
+        result = await self.train_model(
+            task_id, model_name, data, self.load_task_config(task_id), self._load_plan(task_id).get("data_hash")
+        )
+        self.save_part(task_id, "model", model_name, result, memory)
+        return result["status"]
+
+    def run_analysis_part(
+        self, task_id: str, analysis_name: str, data: pd.DataFrame, memory: PeakRssTracker | None = None
+    ) -> str:
+        """
+        统计分析子任务：使用准备阶段计算好的中间结果运行单个统计分析并保存结果
+
+        memory 为子任务开始（加载数据前）创建的内存记录
+
+        Returns:
+            子任务状态（success / failed）
+        """
+        raise_if_cancelled(task_id)
+        analysis_config = self.supported_analyses[analysis_name]
+        requires = analysis_config.get("requires", [])
+
+        with open(self._get_task_dir(task_id) / "intermediates.pkl", "rb") as f:
+            intermediates = pickle.load(f)
+
+        failed = [name for name in requires if name not in intermediates["values"]]
+        if failed:
+            message = "; ".join(f"{name}: {intermediates['errors'].get(name, '缺失')}" for name in failed)
+            app_logger.error(f"统计分析 {analysis_name} 依赖的中间结果计算失败: {message}")
+            result = {
+                "status": "failed",
+                "message": f"统计分析 {analysis_name} 运行失败: 依赖的中间结果计算失败 ({message})",
             }
+        else:
+            inputs = {name: intermediates["values"][name] for name in requires}
+            result = run_single_analysis(analysis_name, analysis_config["function"], data, inputs)
+            self._save_analysis_memo(
+                self._analysis_memo_key(analysis_name, self._load_plan(task_id).get("data_hash")), result
+            )
 
-            # 保存结果到文件
-            results_file = task_dir / "results.json"
-            with open(results_file, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        self.save_part(task_id, "analysis", analysis_name, result, memory)
+        return result["status"]
 
-            app_logger.info(f"分析任务 {task_id} 完成")
-            return results
+    def finalize_fan_out(self, task_id: str) -> Dict[str, Any]:
+        """
+        汇总所有子任务的结果并写入任务结果文件
 
-        except Exception as e:
-            task_info["status"] = "failed"
-            task_info["error"] = str(e)
-            task_info["failed_at"] = datetime.now().isoformat()
+        没有留下结果的子任务（如被强制终止）记为失败
 
-            app_logger.error(f"分析任务 {task_id} 失败: {str(e)}")
+        Args:
+            task_id: 任务ID
 
-            # 保存失败结果
-            results = {"task_info": task_info, "error": str(e)}
+        Returns:
+            任务结果字典
+        """
+        task_dir = self._get_task_dir(task_id)
+        plan_info = self._load_plan(task_id)
+
+        task_info = plan_info["task_info"]
+        parts = {}
+        for kind, names in (("model", plan_info["models"]), ("analysis", plan_info["analyses"])):
+            for name in names:
+                part_file = task_dir / "parts" / f"{kind}__{name}.json"
+                if part_file.exists():
+                    with open(part_file, "r", encoding="utf-8") as f:
+                        parts[(kind, name)] = json.load(f)
+                else:
+                    label = "模型" if kind == "model" else "统计分析"
+                    parts[(kind, name)] = {
+                        "status": "failed",
+                        "message": f"{label} {name} 子任务未返回结果",
+                    }
+
+        # 各子任务运行在不同进程，取其中的最大值作为本次执行的峰值内存
+        for field in ("peak_rss_mb", "peak_rss_delta_mb"):
+            values = [part.pop(field, None) for part in parts.values()]
+            values = [value for value in values if value is not None]
+            task_info[field] = max(values) if values else None
+        scopes = {part.pop("peak_rss_scope", None) for part in parts.values()} - {None}
+        task_info["peak_rss_scope"] = "process" if "process" in scopes else ("run" if scopes else None)
 
-            results_file = task_dir / "results.json"
-            with open(results_file, "w", encoding="utf-8") as f:
-                json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        model_results = {name: parts[("model", name)] for name in plan_info["models"]}
+        analysis_results = {name: parts[("analysis", name)] for name in plan_info["analyses"]}
+        results = self._write_results(task_id, task_info, model_results, analysis_results)
 
-            return results
+        # 中间结果只在本次执行中使用
+        (task_dir / "intermediates.pkl").unlink(missing_ok=True)
+        return results
+
+    def cleanup_task_artifacts(self, task_id: str) -> None:
+        """
+        清理被取消任务已生成的产物（子任务结果、中间结果、结果文件和模型文件）
+
+        保留 config.json；可重复调用，仍在运行的子任务结束后会再次调用
+        """
+        task_dir = self.output_dir / task_id
+        if not task_dir.exists():
+            return
+
+        shutil.rmtree(task_dir / "parts", ignore_errors=True)
+        for file_name in ("intermediates.pkl", "plan.json"):
+            (task_dir / file_name).unlink(missing_ok=True)
+        for artifact_name in ARTIFACT_NAMES:
+            remove_artifact(task_dir, artifact_name)
+        remove_report_blobs(task_dir)
+        for model_name in self.supported_models:
+            for model_file in task_dir.glob(f"{model_name}_v*.pkl"):
+                model_file.unlink(missing_ok=True)
+
+        app_logger.info(f"已清理被取消任务 {task_id} 的产物")
+
+    def fail_fan_out(self, task_id: str, error: str) -> Dict[str, Any]:
+        """拆分执行整体失败（如汇总任务本身出错）时写入失败结果"""
+        task_dir = self._get_task_dir(task_id)
+        plan_file = task_dir / "plan.json"
+        task_info = {"task_id": task_id}
+        if plan_file.exists():
+            with open(plan_file, "r", encoding="utf-8") as f:
+                task_info = json.load(f)["task_info"]
+
+        (task_dir / "intermediates.pkl").unlink(missing_ok=True)
+        return self._write_failed_results(task_id, task_info, error)
 
     async def generate_comprehensive_analysis(
         self,
@@ -365,19 +977,17 @@ class AnalysisTaskManager:
         if not task_dir.exists():
             raise FileNotFoundError(f"任务目录不存在: {task_dir}")
 
-        # 先看有没有结果文件
-        comprehensive_result_file = task_dir / "comprehensive_analysis.json"
-        if comprehensive_result_file.exists():
-            with open(comprehensive_result_file, "r", encoding="utf-8") as f:
-                return json.load(f)
-
-        # 加载任务信息
-        results_file = task_dir / "results.json"
-        if not results_file.exists():
-            raise FileNotFoundError(f"任务结果文件不存在: {results_file}")
+        # 先看有没有结果文件；本功能上线前生成的报告没有预序列化响应体，在这里补写
+        if artifact_exists(task_dir, COMPREHENSIVE_ANALYSIS):
+            comprehensive_results = read_artifact(task_dir, COMPREHENSIVE_ANALYSIS)
+            if select_report_blob(task_dir, None) is None:
+                write_report_blobs(task_dir, comprehensive_results)
+            return comprehensive_results
 
-        with open(results_file, "r", encoding="utf-8") as f:
-            task_results = json.load(f)
+        # 加载任务信息，只读取生成报告需要的部分
+        task_results = read_artifact(task_dir, RESULTS, ["task_info", "analysis_results"])
+        if "task_info" not in task_results:
+            raise ValueError(f"任务结果缺少任务信息: {task_id}")
 
         task_info = task_results["task_info"]
 
@@ -392,6 +1002,10 @@ class AnalysisTaskManager:
         }
 
         try:
+            # 需要 AI 总结的结果：名称 → 写入数据库的数据
+            summary_models = {}
+            summary_analyses = {}
+
             # 1. 加载模型并进行预测
             trained_models = task_info.get("models_trained", [])
 
@@ -437,23 +1051,10 @@ class AnalysisTaskManager:
                     else:
                         prediction_result = {"error": f"未知的模型类型: {model_name}"}
 
-                    # 调用LLM来给模型结果进行总结
-                    comment = self.summary_service.summarize_model_prediction(model_name, prediction_result)
-                    prediction_result["comment"] = comment
-
-                    task_data = self.db_map[model_name](
-                        task_id= int(task_id),
-                        data= prediction_result,
-                        comment=comment,
-                        created_at=datetime.now(timezone.utc)
-                    )
-                    db.add(task_data)
-                    await db.commit()
-
                     comprehensive_results["model_predictions"][model_name] = (
                         prediction_result
                     )
-                    comprehensive_results['comments'][model_name] = comment
+                    summary_models[model_name] = prediction_result
 
                     app_logger.info(f"模型 {model_name} 预测完成")
 
@@ -495,25 +1096,36 @@ class AnalysisTaskManager:
                     comprehensive_results["statistical_analyses"][analysis_name] = (
                         analysis_data.get("result", {})
                     )
-                    # 生成统计分析的AI总结
-                    analysis_comment = self.summary_service.summarize_statistical_analysis(analysis_name, analysis_data.get("result", {}))
-                    comprehensive_results['comments'][analysis_name] = analysis_comment
-
-                    task_data = self.db_map[analysis_name](
-                        task_id= int(task_id),
-                        data= analysis_data.get("result", {}),
-                        comment=analysis_comment,
-                        created_at=datetime.now(timezone.utc)
-                    )
-                    db.add(task_data)
-                    await db.commit()
-
-            # 3. 保存综合分析结果
-            comprehensive_file = task_dir / "comprehensive_analysis.json"
-            with open(comprehensive_file, "w", encoding="utf-8") as f:
-                json.dump(
-                    comprehensive_results, f, ensure_ascii=False, indent=2, default=str
-                )
+                    summary_analyses[analysis_name] = analysis_data.get("result", {})
+
+            # 3. 生成所有 AI 总结：批量模式下一次请求完成，否则逐项并发请求
+            comments, overall_summary = await self.summary_service.summarize_report_async(
+                task_id, summary_models, summary_analyses
+            )
+            if overall_summary is not None:
+                comprehensive_results["overall_summary"] = overall_summary
+            result_rows = []
+            for name, data in {**summary_models, **summary_analyses}.items():
+                comment = comments[name]
+                if name in summary_models:
+                    data["comment"] = comment
+                comprehensive_results["comments"][name] = comment
+                if name in self.db_map:
+                    result_rows.append((self.db_map[name], data, comment))
+                else:
+                    # 模型预测结果没有对应的结果表，只保存在综合分析报告中
+                    app_logger.debug(f"{name} 没有对应的结果表，跳过写入数据库")
+
+            # 所有结果在一个事务中按 task_id 插入或覆盖
+            await self.analysis_service.save_analysis_results(db, int(task_id), result_rows)
+
+            # 4. 保存综合分析结果，并写出结果接口直接返回的响应体
+            write_artifact(task_dir, COMPREHENSIVE_ANALYSIS, comprehensive_results)
+            try:
+                write_report_blobs(task_dir, comprehensive_results)
+            except Exception as e:
+                # 报告本身已保存，首次请求时提交后台任务补写响应体
+                app_logger.warning(f"写入任务 {task_id} 的报告响应体失败: {str(e)}")
 
             app_logger.info(f"综合分析报告生成完成: {task_id}")
             return comprehensive_results
@@ -573,44 +1185,6 @@ class AnalysisTaskManager:
         app_logger.info(f"What-If决策模拟器模型加载完成: {model_name}")
         return model
 
-    def list_tasks(self) -> List[Dict[str, Any]]:
-        """
-        列出所有分析任务
-
-        Returns:
-            任务列表
-        """
-        tasks = []
-
-        for task_dir in self.output_dir.iterdir():
-            if not task_dir.is_dir():
-                continue
-
-            results_file = task_dir / "results.json"
-            if not results_file.exists():
-                continue
-
-            try:
-                with open(results_file, "r", encoding="utf-8") as f:
-                    task_results = json.load(f)
-
-                task_info = task_results.get("task_info", {})
-                tasks.append(
-                    {
-                        "task_id": task_info.get("task_id"),
-                        "task_name": task_info.get("task_name"),
-                        "status": task_info.get("status"),
-                        "created_at": task_info.get("created_at"),
-                        "completed_at": task_info.get("completed_at"),
-                        "models_trained": task_info.get("models_trained", []),
-                        "analyses_completed": task_info.get("analyses_completed", []),
-                    }
-                )
-            except Exception as e:
-                app_logger.error(f"读取任务信息失败: {task_dir}, 错误: {str(e)}")
-
-        return sorted(tasks, key=lambda x: x.get("created_at", ""), reverse=True)
-
     def get_task_results(self, task_id: str) -> Dict[str, Any]:
         """
         获取任务结果
@@ -625,12 +1199,41 @@ class AnalysisTaskManager:
         if not task_dir.exists():
             raise FileNotFoundError(f"任务目录不存在: {task_id}")
 
-        results_file = task_dir / "results.json"
-        if not results_file.exists():
-            raise FileNotFoundError(f"任务结果文件不存在: {task_id}")
+        return read_artifact(task_dir, RESULTS)
 
-        with open(results_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+    def get_analysis_result(self, task_id: str, analysis_name: str) -> Dict[str, Any] | None:
+        """
+        获取任务中单个统计分析的结果，只解压该分析对应的分段
+
+        Args:
+            task_id: 任务ID
+            analysis_name: 统计分析名称
+
+        Returns:
+            与任务结果中 analysis_results 条目一致的结果字典，任务没有该分析时返回 None
+        """
+        return read_section(self._get_task_dir(task_id), RESULTS, "analysis_results", analysis_name)
+
+    def get_model_prediction(self, task_id: str, model_name: str) -> Dict[str, Any] | None:
+        """
+        获取综合分析报告中单个模型的预测结果，只解压该模型对应的分段
+
+        Returns:
+            预测结果（含 comment），报告中没有该模型时返回 None
+
+        Raises:
+            FileNotFoundError: 任务目录或综合分析报告不存在
+        """
+        return read_section(self._get_task_dir(task_id), COMPREHENSIVE_ANALYSIS, "model_predictions", model_name)
+
+    def get_artifact_version(self, task_id: str, name: str) -> str | None:
+        """
+        获取任务产物（results / comprehensive_analysis）的版本标识，用于计算 ETag
+
+        Returns:
+            版本标识，任务目录或产物不存在时返回 None
+        """
+        return artifact_version(self.output_dir / task_id, name)
 
     def get_comprehensive_analysis(self, task_id: str) -> Dict[str, Any]:
         """
@@ -646,9 +1249,30 @@ class AnalysisTaskManager:
         if not task_dir.exists():
             raise FileNotFoundError(f"任务目录不存在: {task_id}")
 
-        comprehensive_file = task_dir / "comprehensive_analysis.json"
-        if not comprehensive_file.exists():
+        if not artifact_exists(task_dir, COMPREHENSIVE_ANALYSIS):
             raise FileNotFoundError(f"综合分析报告文件不存在: {task_id}")
 
-        with open(comprehensive_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_artifact(task_dir, COMPREHENSIVE_ANALYSIS)
+
+    def get_report_blob(self, task_id: str, accept_encoding: str | None = None) -> Tuple[Path, str | None]:
+        """
+        获取综合分析报告的预序列化响应文件
+
+        只读取已写出的文件，不在请求中序列化和压缩；本功能上线前生成的报告由
+        build_comprehensive_report 任务或 task_artifact 转换命令补写
+
+        Args:
+            task_id: 任务ID
+            accept_encoding: 请求头 Accept-Encoding
+
+        Returns:
+            (文件路径, Content-Encoding)，未压缩版本的编码为 None
+
+        Raises:
+            FileNotFoundError: 任务目录或预序列化响应文件不存在
+        """
+        task_dir = self._get_task_dir(task_id)
+        blob = select_report_blob(task_dir, accept_encoding)
+        if blob is None:
+            raise FileNotFoundError(f"综合分析报告响应体不存在: {task_id}")
+        return blob
@@ -1,80 +1,194 @@
+import importlib
 import multiprocessing
+import os
 import signal
 import sys
+import time
 import traceback
 
+from app.core.config import settings
 from app.core.logging import app_logger
 
+# Worker 启动前预先导入的模块：分析任务、统计分析、各模型的训练和推理代码及其依赖的数值计算库
+# 导入 sklearn、lightgbm 只加载 OpenMP 运行库，线程池在首次训练或预测时才创建，
+# 父进程只导入、不执行任务，fork 出的子进程不会继承已创建的 OpenMP 线程池。
+# Celery 在 fork 前本就会导入任务模块（include），其依赖链同样会导入 sklearn
+PRELOAD_MODULES = (
+    "numpy",
+    "pandas",
+    "sklearn",
+    "lightgbm",
+    "optuna",
+    "semopy",
+    "app.analysis.statistical",
+    "app.analysis.machine_learing.trainers.satisfaction_part",
+    "app.analysis.machine_learing.trainers.satisfaction_whole",
+    "app.analysis.machine_learing.trainers.student_portrait",
+    "app.analysis.machine_learing.trainers.what_if_decision_simulator_lgbmclassfier",
+    "app.analysis.machine_learing.models.satisfaction_part",
+    "app.analysis.machine_learing.models.satisfaction_whole",
+    "app.analysis.machine_learing.models.student_portrait",
+    "app.analysis.machine_learing.tasks.celery_tasks",
+)
+
 
 class CeleryWorkerManager:
     def __init__(self):
-        self.worker_process: multiprocessing.Process | None = None
+        # 每个队列一个 Worker 进程
+        self.worker_processes: dict[str, multiprocessing.Process] = {}
         self.worker_stopped = multiprocessing.Event()
 
     def start_worker(self):
-        """启动 Celery Worker 进程"""
-        if self.worker_process and self.worker_process.is_alive():
-            app_logger.warning("Celery Worker 已经在运行")
-            return
+        """为配置的每个队列启动一个 Celery Worker 进程"""
+        from app.core.celery_app import QUEUE_WORKER_OPTIONS
 
         self.worker_stopped.clear()
-        self.worker_process = multiprocessing.Process(
-            target=self._run_worker, daemon=False
-        )
-        self.worker_process.start()
-        app_logger.info(f"Celery Worker 进程已启动，PID: {self.worker_process.pid}")
+        for queue in self._get_queues(QUEUE_WORKER_OPTIONS):
+            process = self.worker_processes.get(queue)
+            if process and process.is_alive():
+                app_logger.warning(f"Celery Worker [{queue}] 已经在运行")
+                continue
+
+            process = multiprocessing.Process(
+                target=self._run_worker, args=(queue,), daemon=False
+            )
+            process.start()
+            self.worker_processes[queue] = process
+            app_logger.info(f"Celery Worker [{queue}] 进程已启动，PID: {process.pid}")
 
     def stop_worker(self):
-        """停止 Celery Worker 进程"""
-        if not self.worker_process or not self.worker_process.is_alive():
+        """停止所有 Celery Worker 进程"""
+        running = {queue: process for queue, process in self.worker_processes.items() if process.is_alive()}
+        if not running:
             app_logger.warning("Celery Worker 未运行")
             return
 
         self.worker_stopped.set()
 
-        # 发送 SIGTERM 信号给 Worker 进程
-        self.worker_process.terminate()
-
-        # 等待进程结束
-        self.worker_process.join(timeout=5)
+        # 先向所有 Worker 发送 SIGTERM，再逐个等待，总等待时间不随队列数增加
+        for process in running.values():
+            process.terminate()
 
-        if self.worker_process.is_alive():
-            app_logger.warning("Celery Worker 未正常终止，强制结束")
-            self.worker_process.kill()
+        for queue, process in running.items():
+            process.join(timeout=5)
+            if process.is_alive():
+                app_logger.warning(f"Celery Worker [{queue}] 未正常终止，强制结束")
+                process.kill()
 
         app_logger.info("Celery Worker 进程已停止")
 
-    def _run_worker(self):
-        """运行 Celery Worker 的目标函数"""
+    def _run_worker(self, queue: str):
+        """运行 Celery Worker 的目标函数，只消费指定队列"""
         try:
             # 导入 Celery 应用
-            from app.core.celery_app import celery_app
+            from app.core.celery_app import celery_app, FAST_QUEUE, QUEUE_WORKER_OPTIONS, REPORT_QUEUE
 
             # 设置信号处理
             def signal_handler(signum, frame):
-                app_logger.info(f"收到信号 {signum}，正在停止 Celery Worker")
+                app_logger.info(f"收到信号 {signum}，正在停止 Celery Worker [{queue}]")
                 sys.exit(0)
 
             signal.signal(signal.SIGTERM, signal_handler)
             signal.signal(signal.SIGINT, signal_handler)
 
+            if settings.celery_worker_preload:
+                self._preload_modules()
+
             # 启动 Celery Worker
+            options = QUEUE_WORKER_OPTIONS[queue]
+            pool, concurrency = self._get_pool_options(options["pool"], options["concurrency"])
+            if queue != REPORT_QUEUE and pool == "prefork" and settings.analysis_executor == "process":
+                # prefork 子进程是守护进程，不能再创建进程池
+                app_logger.warning(
+                    f"Celery Worker [{queue}] 使用 prefork 执行池，analysis_executor=process 不生效，"
+                    "统计分析将串行执行；如需多进程并行请改用 solo 执行池"
+                )
             argv = [
                 "worker",
                 "--loglevel=info",
+                "-Q",
+                queue,
+                "-n",
+                f"{queue}@%h",
                 "-P",
-                "solo",
+                pool,
                 "-c",
-                "1",
-                "--max-tasks-per-child=1",
+                str(concurrency),
+                f"--prefetch-multiplier={options['prefetch_multiplier']}",
                 "--time-limit=3600",
                 "--soft-time-limit=3300",
             ]
-
-            app_logger.info("启动 Celery Worker")
+            # 子进程回收方式按队列设置，未设置的项以 celery_app 中的配置为准
+            if options.get("max_tasks_per_child"):
+                argv.append(f"--max-tasks-per-child={options['max_tasks_per_child']}")
+            if options.get("max_memory_per_child"):
+                argv.append(f"--max-memory-per-child={options['max_memory_per_child']}")
+            # 快速队列 Worker 内嵌 beat，定期巡检租约失效的任务
+            if queue == FAST_QUEUE and settings.analysis_sweep_interval_seconds > 0:
+                argv.append("-B")
+
+            app_logger.info(f"启动 Celery Worker [{queue}]: pool={pool}, concurrency={concurrency}")
             celery_app.worker_main(argv)
 
         except Exception as e:
-            app_logger.error(f"Celery Worker 进程出错: {str(e)}")
+            app_logger.error(f"Celery Worker [{queue}] 进程出错: {str(e)}")
             app_logger.error(f"详情:{traceback.format_exc()}")
-            sys.exit(1)
\ No newline at end of file
+            sys.exit(1)
+
+    @staticmethod
+    def _get_queues(queue_options: dict) -> list[str]:
+        """解析配置中本实例需要启动 Worker 的队列"""
+        queues = []
+        for queue in settings.celery_worker_queues.split(","):
+            queue = queue.strip()
+            if not queue:
+                continue
+            if queue not in queue_options:
+                app_logger.warning(f"未知的 Celery 队列: {queue}，忽略")
+                continue
+            queues.append(queue)
+        return queues
+
+    @staticmethod
+    def _get_pool_options(pool: str, concurrency: int) -> tuple[str, int]:
+        """
+        校验执行池类型并确定并发数
+
+        Args:
+            pool: 配置的执行池类型
+            concurrency: 配置的并发数，0 表示取 CPU 核数
+
+        Returns:
+            (执行池类型, 并发数)
+        """
+        if pool == "threads":
+            # 任务在进程内唯一的常驻事件循环和数据库连接池中运行（run_in_worker_loop），多个线程不能同时使用
+            app_logger.warning("Celery Worker 不支持 threads 执行池，改用 solo")
+            pool = "solo"
+        elif pool not in ("solo", "prefork"):
+            app_logger.warning(f"不支持的 Celery Worker 执行池: {pool}，改用 solo")
+            pool = "solo"
+
+        if pool == "solo":
+            if concurrency not in (0, 1):
+                app_logger.warning("solo 执行池只能串行执行任务，忽略并发数配置")
+            return pool, 1
+
+        return pool, concurrency or os.cpu_count() or 1
+
+    @staticmethod
+    def _preload_modules():
+        """
+        在 Worker 父进程中预先导入分析和机器学习相关模块
+
+        prefork 子进程 fork 后直接共享这些已导入的模块，首个任务不再承担导入开销；
+        某个模块导入失败只记录警告，任务执行时会再次导入并报告真正的错误
+        """
+        start = time.perf_counter()
+        for module_name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except Exception as e:
+                app_logger.warning(f"预加载模块 {module_name} 失败: {str(e)}")
+
+        app_logger.info(f"Celery Worker 预加载模块完成，耗时 {time.perf_counter() - start:.2f}s")
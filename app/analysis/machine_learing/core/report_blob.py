@@ -0,0 +1,116 @@
+"""
+综合分析报告的预序列化响应
+报告生成时直接写出结果接口的最终响应体（UTF-8 JSON）及其 gzip / brotli 压缩版本：
+
+    report.json | report.json.gz | report.json.br
+
+结果接口按 Accept-Encoding 选择其中一个文件原样返回，不再解析报告、构造 pydantic 模型和重新序列化
+"""
+
+import gzip
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Set, Tuple
+
+import orjson
+
+from app.core.logging import app_logger
+from app.utils.json_utils import json_default
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只生成 gzip 版本
+    brotli = None
+
+REPORT_BLOB = "report.json"
+GZIP_LEVEL = 6
+# 报告只压缩一次、读取多次，使用较高的压缩等级
+BROTLI_QUALITY = 9
+# Content-Encoding → 文件后缀，按返回时的优先顺序排列
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def blob_path(task_dir: Path, encoding: str | None = None) -> Path:
+    """预序列化响应文件路径，encoding 为 None 时是未压缩的版本"""
+    return task_dir / f"{REPORT_BLOB}{ENCODING_SUFFIXES[encoding] if encoding else ''}"
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    temp_file = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(data)
+        os.replace(temp_file, target)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+
+def write_report_blobs(task_dir: Path, report: Dict[str, Any]) -> None:
+    """
+    写出综合分析报告的响应体及其压缩版本
+
+    响应体与结果接口返回的 BaseHTTPResponse 一致：{"http_status": 200, "message": 报告}
+    """
+    body = orjson.dumps({"http_status": 200, "message": report}, default=json_default, option=_ORJSON_OPTIONS)
+    variants = {"gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    for encoding in ENCODING_SUFFIXES:
+        if encoding in variants:
+            _write_atomic(blob_path(task_dir, encoding), variants[encoding])
+        else:
+            blob_path(task_dir, encoding).unlink(missing_ok=True)
+    # 未压缩版本最后写入，存在即表示整组文件已写入
+    _write_atomic(blob_path(task_dir), body)
+
+    app_logger.info(
+        f"综合分析报告响应体已写入: {task_dir.name}，{len(body)} 字节，"
+        + "，".join(f"{encoding} {len(data)} 字节" for encoding, data in variants.items())
+    )
+
+
+def remove_report_blobs(task_dir: Path) -> None:
+    """删除预序列化响应文件"""
+    blob_path(task_dir).unlink(missing_ok=True)
+    for encoding in ENCODING_SUFFIXES:
+        blob_path(task_dir, encoding).unlink(missing_ok=True)
+
+
+def _accepted_encodings(accept_encoding: str | None) -> Set[str]:
+    """解析 Accept-Encoding，返回客户端接受（q > 0）的编码"""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+    if "*" in accepted:
+        accepted.update(ENCODING_SUFFIXES)
+    return accepted
+
+
+def select_report_blob(task_dir: Path, accept_encoding: str | None) -> Tuple[Path, str | None] | None:
+    """
+    按 Accept-Encoding 选择要返回的文件
+
+    Returns:
+        (文件路径, Content-Encoding)，未压缩版本的编码为 None；还没有预序列化响应时返回 None
+    """
+    if not blob_path(task_dir).exists():
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    for encoding in ENCODING_SUFFIXES:
+        if encoding in accepted and blob_path(task_dir, encoding).exists():
+            return blob_path(task_dir, encoding), encoding
+    return blob_path(task_dir), None
@@ -0,0 +1,172 @@
+"""
+单项结果缓存
+按 输入数据指纹 + 调用参数 + 源码指纹 缓存单个模型训练或统计分析的结果，
+重新执行任务时只计算发生变化的部分
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logging import app_logger
+from app.utils.code_fingerprint import APP_ROOT, code_fingerprint
+from app.utils.json_utils import json_default
+
+# 统计分析都位于该目录下的独立子包中
+STATISTICAL_ROOT = APP_ROOT / "analysis" / "statistical"
+
+
+def data_fingerprint(df: pd.DataFrame) -> str:
+    """
+    计算 DataFrame 内容的指纹（列名、数据类型和逐行哈希）
+
+    Args:
+        df: 输入数据
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()],
+                             ensure_ascii=False).encode("utf-8"))
+    try:
+        hasher.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        # 包含列表等不可哈希对象的列无法逐行哈希，退化为序列化后整体哈希
+        hasher.update(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    return hasher.hexdigest()
+
+
+def source_paths(function: Callable) -> List[str]:
+    """
+    确定一个分析函数或训练函数依赖的源码
+
+    统计分析取其所在的整个子包（包含同包的预处理模块），其余取函数所在文件
+
+    Returns:
+        相对于 app 包的路径列表，可直接传给 code_fingerprint
+    """
+    source_file = Path(inspect.getsourcefile(inspect.unwrap(function))).resolve()
+    package_dir = source_file.parent
+    if package_dir.parent == STATISTICAL_ROOT:
+        return [package_dir.relative_to(APP_ROOT).as_posix()]
+    return [source_file.relative_to(APP_ROOT).as_posix()]
+
+
+def memo_key(kind: str, name: str, data_hash: str, params: Dict[str, Any], sources: Iterable[str]) -> str:
+    """
+    计算单项结果的缓存键
+
+    Args:
+        kind: model 或 analysis
+        name: 模型或统计分析名称
+        data_hash: 输入数据指纹，见 data_fingerprint
+        params: 影响结果的调用参数
+        sources: 影响结果的源码路径，见 source_paths
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    payload = json.dumps(
+        {
+            "kind": kind,
+            "name": name,
+            "data": data_hash,
+            "params": params,
+            "code": code_fingerprint(tuple(sorted(set(sources)))),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        default=json_default,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultMemo:
+    """单项结果缓存，每个条目是一个目录：result.json 保存结果字典，模型文件等产物与之放在一起"""
+
+    def __init__(self, root: str = None):
+        self.root = Path(root or settings.analysis_memo_path)
+
+    def _entry_dir(self, kind: str, key: str) -> Path:
+        return self.root / kind / key
+
+    def load(self, kind: str, key: str) -> Dict[str, Any] | None:
+        """
+        读取缓存的结果
+
+        Returns:
+            结果字典，未命中或条目损坏时返回 None
+        """
+        result_file = self._entry_dir(kind, key) / "result.json"
+        if not result_file.exists():
+            return None
+
+        try:
+            with open(result_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"读取结果缓存 {kind}/{key} 失败: {str(e)}")
+            return None
+
+    def save(self, kind: str, key: str, result: Dict[str, Any], files: Iterable[Path] = ()) -> None:
+        """
+        保存结果及其产物
+
+        先写入临时目录再整体重命名，并发写入同一个键时只保留先完成的一份；
+        缓存只用于加速，写入失败只记录警告
+
+        Args:
+            kind: model 或 analysis
+            key: 缓存键，见 memo_key
+            result: 结果字典
+            files: 需要一并保存的产物文件（如训练好的模型）
+        """
+        entry_dir = self._entry_dir(kind, key)
+        if entry_dir.exists():
+            return
+
+        temp_dir = entry_dir.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+        try:
+            temp_dir.mkdir(parents=True)
+            for file_path in files:
+                shutil.copy2(file_path, temp_dir / Path(file_path).name)
+            with open(temp_dir / "result.json", "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, default=json_default)
+            os.rename(temp_dir, entry_dir)
+        except OSError as e:
+            if not entry_dir.exists():
+                app_logger.warning(f"保存结果缓存 {kind}/{key} 失败: {str(e)}")
+        finally:
+            if temp_dir.exists():
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def restore_files(self, kind: str, key: str, target_dir: Path) -> List[Path]:
+        """
+        把缓存条目中的产物文件放入目标目录（硬链接，跨文件系统时复制）
+
+        Returns:
+            放入目标目录的文件路径
+        """
+        target_dir.mkdir(parents=True, exist_ok=True)
+        restored = []
+        for file_path in self._entry_dir(kind, key).iterdir():
+            if file_path.name == "result.json":
+                continue
+            target_file = target_dir / file_path.name
+            if not target_file.exists():
+                try:
+                    os.link(file_path, target_file)
+                except OSError:
+                    shutil.copy2(file_path, target_file)
+            restored.append(target_file)
+        return restored
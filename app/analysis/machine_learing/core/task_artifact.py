@@ -0,0 +1,302 @@
+"""
+任务产物文件
+任务结果（results）和综合分析报告（comprehensive_analysis）以分段压缩格式保存在任务目录中：
+
+    魔数 b"EFAR" | 格式版本（1 字节）| 索引长度（uint32 小端）| 索引（JSON）| 各分段数据
+
+每个分段是一段独立的 zstd 压缩 orjson。model_results、analysis_results 等按名称索引的字典
+逐项拆分为分段，其余顶层键各为一个分段。读取单个统计分析或只读取任务信息时，
+只解压对应的分段，不解析整个文件。
+
+旧版本生成的 .json 文件仍可读取，可用以下命令转换为新格式（同时补写综合分析报告的预序列化响应体）：
+
+    python -m app.analysis.machine_learing.core.task_artifact [任务根目录]
+"""
+
+import json
+import os
+import struct
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import orjson
+import zstandard
+
+from app.analysis.machine_learing.core.report_blob import REPORT_BLOB, select_report_blob, write_report_blobs
+from app.core.logging import app_logger
+from app.utils.json_utils import json_default
+
+MAGIC = b"EFAR"
+FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = ".efar"
+ZSTD_LEVEL = 3
+
+# 按名称逐项拆分为分段的顶层键
+SPLIT_KEYS = (
+    "model_results",
+    "analysis_results",
+    "model_predictions",
+    "statistical_analyses",
+    "comments",
+)
+
+# 魔数、格式版本和索引长度
+_HEADER = struct.Struct("<4sBI")
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# 各任务产物的名称
+RESULTS = "results"
+COMPREHENSIVE_ANALYSIS = "comprehensive_analysis"
+ARTIFACT_NAMES = (RESULTS, COMPREHENSIVE_ANALYSIS)
+
+
+def artifact_path(task_dir: Path, name: str) -> Path:
+    """分段压缩格式的产物文件路径"""
+    return task_dir / f"{name}{ARTIFACT_SUFFIX}"
+
+
+def legacy_path(task_dir: Path, name: str) -> Path:
+    """旧版本的 JSON 产物文件路径"""
+    return task_dir / f"{name}.json"
+
+
+def artifact_exists(task_dir: Path, name: str) -> bool:
+    """任务目录中是否有该产物（任一格式）"""
+    return artifact_path(task_dir, name).exists() or legacy_path(task_dir, name).exists()
+
+
+def artifact_version(task_dir: Path, name: str) -> str | None:
+    """
+    产物的版本标识（文件修改时间和大小），产物重新写入后改变；产物不存在时返回 None
+    """
+    for file_path in (artifact_path(task_dir, name), legacy_path(task_dir, name)):
+        try:
+            stat = file_path.stat()
+        except FileNotFoundError:
+            continue
+        return f"{file_path.suffix}:{stat.st_mtime_ns}:{stat.st_size}"
+    return None
+
+
+def _dumps(value: Any) -> bytes:
+    return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+
+
+def _split_sections(data: Dict[str, Any]) -> Iterable[Tuple[str, str | None, Any]]:
+    """把结果字典拆分为 (顶层键, 子键, 值) 分段"""
+    for key, value in data.items():
+        if key in SPLIT_KEYS and isinstance(value, dict):
+            for name, item in value.items():
+                yield key, str(name), item
+        else:
+            yield key, None, value
+
+
+def write_artifact(task_dir: Path, name: str, data: Dict[str, Any]) -> Path:
+    """
+    以分段压缩格式写入产物
+
+    先写入临时文件再替换，读取方不会看到写了一半的文件；同名的旧 JSON 文件随之删除
+
+    Args:
+        task_dir: 任务目录
+        name: 产物名称，如 results、comprehensive_analysis
+        data: 产物内容
+
+    Returns:
+        写入的文件路径
+    """
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    sections = []
+    payloads = []
+    offset = 0
+    for key, sub_key, value in _split_sections(data):
+        payload = compressor.compress(_dumps(value))
+        sections.append([key, sub_key, offset, len(payload)])
+        payloads.append(payload)
+        offset += len(payload)
+
+    index = _dumps({
+        "keys": list(data.keys()),
+        "split_keys": [key for key in data if key in SPLIT_KEYS and isinstance(data[key], dict)],
+        "sections": sections,
+    })
+
+    target = artifact_path(task_dir, name)
+    temp_file = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_file, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(index)))
+            f.write(index)
+            for payload in payloads:
+                f.write(payload)
+        os.replace(temp_file, target)
+    finally:
+        temp_file.unlink(missing_ok=True)
+
+    legacy_path(task_dir, name).unlink(missing_ok=True)
+    return target
+
+
+class _ArtifactReader:
+    """按索引读取分段压缩格式的产物"""
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        with open(file_path, "rb") as f:
+            magic, version, index_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                raise ValueError(f"无法识别的任务产物文件: {file_path}")
+            index = orjson.loads(f.read(index_length))
+
+        self.keys: List[str] = index["keys"]
+        self.split_keys: List[str] = index["split_keys"]
+        self.sections: List[Tuple[str, str | None, int, int]] = [tuple(section) for section in index["sections"]]
+        self.data_offset = _HEADER.size + index_length
+
+    def read(self, wanted: Iterable[Tuple[str, str | None]] = None) -> Dict[Tuple[str, str | None], Any]:
+        """
+        读取并解压分段
+
+        Args:
+            wanted: 需要的 (顶层键, 子键) 集合，为 None 时读取全部分段；子键为 None 时匹配该顶层键下的所有分段
+
+        Returns:
+            (顶层键, 子键) 到分段内容的映射
+        """
+        wanted = set(wanted) if wanted is not None else None
+        decompressor = zstandard.ZstdDecompressor()
+        values = {}
+        with open(self.file_path, "rb") as f:
+            for key, sub_key, offset, length in self.sections:
+                if wanted is not None and (key, sub_key) not in wanted and (key, None) not in wanted:
+                    continue
+                f.seek(self.data_offset + offset)
+                try:
+                    values[(key, sub_key)] = orjson.loads(decompressor.decompress(f.read(length)))
+                except zstandard.ZstdError as e:
+                    raise ValueError(f"任务产物分段 {key}/{sub_key} 已损坏: {self.file_path}") from e
+        return values
+
+    def assemble(self, values: Dict[Tuple[str, str | None], Any], keys: Iterable[str]) -> Dict[str, Any]:
+        """把分段内容还原为结果字典"""
+        data = {}
+        for key in keys:
+            if key in self.split_keys:
+                data[key] = {}
+            elif (key, None) in values:
+                data[key] = values[(key, None)]
+        for (key, sub_key), value in values.items():
+            if sub_key is not None and key in data:
+                data[key][sub_key] = value
+        return data
+
+
+def read_artifact(task_dir: Path, name: str, keys: Iterable[str] = None) -> Dict[str, Any]:
+    """
+    读取产物
+
+    Args:
+        task_dir: 任务目录
+        name: 产物名称
+        keys: 只读取这些顶层键（如 ["task_info"]），为 None 时读取全部
+
+    Returns:
+        产物内容
+
+    Raises:
+        FileNotFoundError: 产物不存在
+    """
+    file_path = artifact_path(task_dir, name)
+    if file_path.exists():
+        reader = _ArtifactReader(file_path)
+        keys = reader.keys if keys is None else [key for key in reader.keys if key in set(keys)]
+        values = reader.read((key, None) for key in keys)
+        return reader.assemble(values, keys)
+
+    legacy_file = legacy_path(task_dir, name)
+    if not legacy_file.exists():
+        raise FileNotFoundError(f"任务产物不存在: {file_path}")
+    with open(legacy_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if keys is None else {key: data[key] for key in keys if key in data}
+
+
+def read_section(task_dir: Path, name: str, key: str, sub_key: str) -> Any:
+    """
+    读取拆分保存的单项结果，如某个统计分析的结果
+
+    Args:
+        task_dir: 任务目录
+        name: 产物名称
+        key: 顶层键，如 analysis_results
+        sub_key: 名称，如 sankey_chart
+
+    Returns:
+        单项结果，不存在时返回 None
+
+    Raises:
+        FileNotFoundError: 产物不存在
+    """
+    file_path = artifact_path(task_dir, name)
+    if file_path.exists():
+        return _ArtifactReader(file_path).read([(key, sub_key)]).get((key, sub_key))
+
+    return read_artifact(task_dir, name, [key]).get(key, {}).get(sub_key)
+
+
+def remove_artifact(task_dir: Path, name: str) -> None:
+    """删除产物（两种格式）"""
+    artifact_path(task_dir, name).unlink(missing_ok=True)
+    legacy_path(task_dir, name).unlink(missing_ok=True)
+
+
+def migrate_task_dir(task_dir: Path) -> List[str]:
+    """
+    把任务目录中旧版本的 JSON 产物转换为分段压缩格式，并补写缺少的综合分析报告预序列化响应体
+
+    Returns:
+        转换或补写了的产物名称
+    """
+    migrated = []
+    for name in ARTIFACT_NAMES:
+        legacy_file = legacy_path(task_dir, name)
+        if not legacy_file.exists():
+            continue
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        write_artifact(task_dir, name, data)
+        migrated.append(name)
+
+    if artifact_exists(task_dir, COMPREHENSIVE_ANALYSIS) and select_report_blob(task_dir, None) is None:
+        write_report_blobs(task_dir, read_artifact(task_dir, COMPREHENSIVE_ANALYSIS))
+        migrated.append(REPORT_BLOB)
+    return migrated
+
+
+def migrate_task_dirs(root: Path) -> int:
+    """
+    转换任务根目录下所有任务的产物，单个任务转换失败只记录错误
+
+    Returns:
+        转换的任务数
+    """
+    count = 0
+    for task_dir in sorted(root.iterdir()):
+        if not task_dir.is_dir():
+            continue
+        try:
+            if migrate_task_dir(task_dir):
+                count += 1
+        except Exception as e:
+            app_logger.error(f"转换任务产物失败: {task_dir}, 错误: {str(e)}")
+    app_logger.info(f"任务产物转换完成: {root}, 共 {count} 个任务")
+    return count
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+
+    migrate_task_dirs(Path(sys.argv[1] if len(sys.argv) > 1 else settings.machine_learning_models_path))
@@ -1,176 +1,520 @@
 """
 Celery 任务定义
 定义分析任务的异步执行逻辑
+
+一个分析任务默认拆分为 chord 执行：
+    execute_analysis_task（清洗数据、计算共享中间结果）
+        → 每个模型一个 run_model_subtask、每个统计分析一个 run_analysis_subtask（并行）
+        → finalize_analysis_task（汇总任务结果文件并更新任务状态）
+        → build_comprehensive_report（后台生成综合分析报告）
+
+模型训练进入批量队列（bulk），统计图表分析进入快速队列（fast），路由见 app.core.celery_app
+
+每个任务通过租约（app.utils.task_lease）保证只执行一次：主任务领取租约，子任务和汇总任务携带租约令牌，
+执行期间续约，任务结束后释放；租约失效的任务由 check_and_execute_pending_tasks 定期重新提交
 """
 
+import time
 import traceback
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+from celery import chord
 
 from app.analysis.machine_learing.models.student_portrait import clean_input_data
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.logging import app_logger
 from app.analysis.machine_learing.core.analysis_task_manager import AnalysisTaskManager
-from app.db.database import db_manager
 from app.db.models.analysis import AnalysisTask
 from app.db.session import get_session
 from app.enum.enums import AnalysisStatusEnum
+from app.exception.exceptions.analysis import AnalysisCancelledError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-import asyncio
 import json
 
+from app.analysis.machine_learing.tasks.worker_runtime import run_in_worker_loop
+from app.service.analysis_service import AnalysisService
 from app.service.data_clean_service import data_clean_task
+from app.utils.json_utils import json_default
+from app.utils.memory_usage import PeakRssTracker
+from app.utils.report_status import clear_report_status, mark_report_failed, mark_report_generating
+from app.utils.task_cancellation import is_cancelled, register_celery_ids
+from app.utils.task_lease import (
+    claim_lease,
+    has_lease,
+    is_lease_holder,
+    lease_heartbeat,
+    mark_queued,
+    release_lease,
+    renew_lease,
+)
+from app.utils.task_progress import publish_progress, reset_progress
+
+
+async def _update_task_status(
+    task_id: int, status: AnalysisStatusEnum, summary: str, task_info: Dict[str, Any] = None
+) -> None:
+    """更新数据库中的任务状态和摘要（已取消的任务不再更新），任务完成时同时记录任务信息"""
+    async with get_session() as session:
+        statement = select(AnalysisTask).where(AnalysisTask.id == task_id)
+        result = await session.execute(statement)
+        task = result.scalar_one_or_none()
+
+        if task and task.status != AnalysisStatusEnum.CANCELLED:
+            task.status = status
+            task.summary = summary
+            if task_info is not None:
+                AnalysisService.record_task_result(task, task_info)
+            await session.commit()
+
+
+def _mark_task_failed(task_id: int, error: str) -> None:
+    """把任务标记为失败；任务已被取消时按取消处理"""
+    if is_cancelled(task_id):
+        _finish_cancelled(task_id)
+        return
+
+    run_in_worker_loop(lambda: _update_task_status(
+        task_id,
+        AnalysisStatusEnum.FAILED,
+        json.dumps({"error": error}, ensure_ascii=False),
+    ))
+    publish_progress(task_id, "failed", error=error)
+
+
+def _finish_cancelled(task_id: int) -> Dict[str, Any]:
+    """
+    Worker 发现任务已被取消后的收尾：清理已生成的产物，确保数据库状态为已取消
+
+    API 取消任务时已经更新状态并清理过一次，这里处理之后仍在运行的子任务留下的产物
+    """
+    app_logger.info(f"分析任务已取消，停止执行: task_id={task_id}")
+    AnalysisTaskManager().cleanup_task_artifacts(str(task_id))
+    run_in_worker_loop(lambda: _update_task_status(task_id, AnalysisStatusEnum.CANCELLED, ""))
+    publish_progress(task_id, "cancelled")
+    return {"task_id": task_id, "status": AnalysisStatusEnum.CANCELLED.value}
 
 
 @celery_app.task(bind=True)
 def execute_analysis_task(self, task_id: int, data_id: int) -> Dict[str, Any]:
     """
     执行分析任务的 Celery 任务
-    
+
+    清洗数据（结果写入清洗缓存供子任务读取）并计算共享中间结果，然后分发子任务；
+    关闭 analysis_fan_out 时在当前任务内完成全部分析
+
     Args:
         task_id: 数据库中的任务ID
         data_id: 数据ID
-        
+
     Returns:
         任务执行结果
     """
     app_logger.info(f"开始执行分析任务: task_id={task_id}, data_id={data_id}")
-    
-    def run_async_task(async_func):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            return loop.run_until_complete(async_func())
-        finally:
-            # 确保所有异步任务完成
-            pending = asyncio.all_tasks(loop)
-            if pending:
-                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-            loop.close()
-    
+    if is_cancelled(task_id):
+        return _finish_cancelled(task_id)
+
+    # 同一任务的重复投递（巡检重新提交、Worker 重启后消息重新投递）只有一个能领取租约
+    lease_token = claim_lease(task_id)
+    if lease_token is None:
+        app_logger.info(f"分析任务 {task_id} 正由其它 Worker 执行，忽略本次投递")
+        return {"task_id": task_id, "status": "skipped"}
+
+    # 重新执行的任务从头记录进度
+    reset_progress(task_id)
+
+    dispatched = False
     try:
-        # # 获取数据库会话
-        # try:
-        #     loop = asyncio.get_running_loop()
-        # except RuntimeError:
-        #     loop = asyncio.new_event_loop()
-        #     asyncio.set_event_loop(loop)
-        async def init_db():
-            if not db_manager.engine:
-                await db_manager.init()
-
-        async def run_task():
-            await init_db()
-            async with get_session() as session:
-                # 查询任务记录
-                statement = select(AnalysisTask).where(AnalysisTask.id == task_id)
-                result = await session.execute(statement)
-                task = result.scalar_one_or_none()
-                
-                if not task:
-                    raise ValueError(f"任务不存在: {task_id}")
-                
-                # 更新任务状态为运行中
-                task.status = AnalysisStatusEnum.PROCESSING
-                await session.commit()
-                
-                # 创建分析任务管理器
-                task_manager = AnalysisTaskManager()
-                task_manager.db = session
-                
-                # 加载数据（这里假设有一个方法可以根据data_id加载数据）
-                # 实际实现中，你需要根据你的数据存储方式来实现这个方法
-                data = await _load_data_by_id(task_id, data_id, session)
-                
-                if data is None:
-                    raise ValueError(f"数据不存在: {data_id}")
-                
-                # 执行分析任务
-                result = await task_manager.execute_analysis_task(
-                    task_id=str(task_id),
-                    data=data
-                )
-                
-                # 更新任务状态
+        with lease_heartbeat(task_id, lease_token):
+            async def run_task():
+                async with get_session() as session:
+                    # 查询任务记录
+                    statement = select(AnalysisTask).where(AnalysisTask.id == task_id)
+                    result = await session.execute(statement)
+                    task = result.scalar_one_or_none()
+
+                    if not task:
+                        raise ValueError(f"任务不存在: {task_id}")
+                    if task.status == AnalysisStatusEnum.CANCELLED:
+                        raise AnalysisCancelledError(task_id)
+                    if task.status not in (AnalysisStatusEnum.PENDING, AnalysisStatusEnum.PROCESSING):
+                        # 任务已经执行完毕，迟到的重复投递不再执行
+                        return {"task_id": task_id, "status": "skipped"}
+
+                    # 更新任务状态为运行中
+                    task.status = AnalysisStatusEnum.PROCESSING
+                    await session.commit()
+                    publish_progress(task_id, "started")
+
+                    # 创建分析任务管理器
+                    task_manager = AnalysisTaskManager()
+                    task_manager.db = session
+
+                    start = time.perf_counter()
+                    # 在加载数据前开始记录内存，峰值包含清洗和缓存读取
+                    memory = PeakRssTracker()
+                    data = await _load_data_by_id(task_id, data_id, session)
+
+                    if data is None:
+                        raise ValueError(f"数据不存在: {data_id}")
+                    publish_progress(
+                        task_id,
+                        "data_cleaned",
+                        rows=len(data),
+                        duration_seconds=round(time.perf_counter() - start, 3),
+                    )
+
+                    if settings.analysis_fan_out:
+                        return {"plan": task_manager.prepare_fan_out(str(task_id), data)}
+
+                    # 不拆分时直接在当前任务内执行
+                    result = await task_manager.execute_analysis_task(
+                        task_id=str(task_id),
+                        data=data,
+                        memory=memory,
+                    )
+
+                    # 更新任务状态（任务可能在执行期间被取消）
+                    await session.refresh(task)
+                    if task.status == AnalysisStatusEnum.CANCELLED:
+                        raise AnalysisCancelledError(task_id)
+                    if result.get("task_info", {}).get("status") == AnalysisStatusEnum.COMPLETED:
+                        task.status = AnalysisStatusEnum.COMPLETED
+                        task.summary = json.dumps(result, ensure_ascii=False, default=json_default)
+                        AnalysisService.record_task_result(task, result["task_info"])
+                    else:
+                        task.status = AnalysisStatusEnum.FAILED
+                        task.summary = json.dumps({
+                            "error": result.get("error", "未知错误")
+                        }, ensure_ascii=False)
+
+                    await session.commit()
+
+                    return result
+
+            result = run_in_worker_loop(run_task)
+            if result.get("status") == "skipped":
+                app_logger.info(f"分析任务 {task_id} 已执行完毕，忽略本次投递")
+                return result
+            if "plan" not in result:
                 if result.get("task_info", {}).get("status") == AnalysisStatusEnum.COMPLETED:
-                    task.status = AnalysisStatusEnum.COMPLETED
-                    task.summary = json.dumps(result, ensure_ascii=False)
+                    publish_progress(task_id, "completed")
+                    enqueue_report_build(task_id)
                 else:
-                    task.status = AnalysisStatusEnum.FAILED
-                    task.summary = json.dumps({
-                        "error": result.get("error", "未知错误")
-                    }, ensure_ascii=False)
-                
-                await session.commit()
-                
+                    publish_progress(task_id, "failed", error=result.get("error", "未知错误"))
                 return result
-        
-        # 运行异步任务
-        # loop = asyncio.new_event_loop()
-        # asyncio.set_event_loop(loop)
-        # try:
-        #     return loop.run_until_complete(run_task())
-        # finally:
-        #     loop.close()
-        return run_async_task(run_task)
-            
+
+            plan = result["plan"]
+            subtasks = [
+                run_model_subtask.si(task_id, data_id, model_name, lease_token) for model_name in plan["models"]
+            ] + [
+                # 统计分析按声明的队列分发，耗时的分析进入批量队列
+                run_analysis_subtask.si(task_id, data_id, analysis_name, lease_token).set(
+                    queue=plan["analysis_queues"][analysis_name]
+                )
+                for analysis_name in plan["analyses"]
+            ]
+            app_logger.info(f"分析任务 {task_id} 拆分为 {len(subtasks)} 个子任务")
+
+            # 准备阶段结束后再检查一次，避免为已取消的任务分发子任务
+            if is_cancelled(task_id):
+                raise AnalysisCancelledError(task_id)
+
+            # 预先分配子任务ID并登记，取消任务时据此撤销仍在排队的子任务
+            register_celery_ids(task_id, [subtask.freeze().id for subtask in subtasks])
+
+            # 租约交给子任务续约，有效期延长到足以覆盖子任务的排队时间
+            renew_lease(task_id, lease_token, settings.analysis_lease_dispatch_seconds)
+            if not subtasks:
+                finalize_analysis_task.delay([], task_id, lease_token)
+            else:
+                chord(subtasks)(
+                    finalize_analysis_task.s(task_id, lease_token).on_error(
+                        on_analysis_chord_error.s(task_id, lease_token)
+                    )
+                )
+            dispatched = True
+
+            return {
+                "task_id": task_id,
+                "status": "dispatched",
+                "subtasks": len(subtasks),
+            }
+
+    except AnalysisCancelledError:
+        return _finish_cancelled(task_id)
+
     except Exception as e:
         app_logger.error(f"执行分析任务失败: task_id={task_id}, error={str(e)}")
         app_logger.error(f"详情:{traceback.format_exc()}")
-        
+
         # 更新任务状态为失败
-        async def update_task_status():
-            async with get_session() as session:
-                statement = select(AnalysisTask).where(AnalysisTask.id == task_id)
-                result = await session.execute(statement)
-                task = result.scalar_one_or_none()
-                
-                if task:
-                    task.status = AnalysisStatusEnum.FAILED
-                    task.summary = json.dumps({"error": str(e)}, ensure_ascii=False)
-                    await session.commit()
-        
-        # loop = asyncio.new_event_loop()
-        # asyncio.set_event_loop(loop)
-        # try:
-        #     loop.run_until_complete(update_task_status())
-        # finally:
-        #     loop.close()
-        
-        run_async_task(update_task_status)
+        _mark_task_failed(task_id, str(e))
         return {
             "task_id": task_id,
             "status": "failed",
             "error": str(e)
         }
-        
+
+    finally:
+        if not dispatched:
+            release_lease(task_id, lease_token)
+
+
+@celery_app.task(bind=True)
+def run_model_subtask(
+    self, task_id: int, data_id: int, model_name: str, lease_token: str | None = None
+) -> Dict[str, Any]:
+    """
+    模型训练子任务
+
+    数据从清洗缓存读取；任何异常都记录为该模型失败，不影响同一任务的其它子任务
+
+    Args:
+        task_id: 数据库中的任务ID
+        data_id: 数据ID
+        model_name: 模型名称
+        lease_token: 分发该子任务时的任务租约，租约已被重新提交的任务领取时不再执行
+
+    Returns:
+        子任务状态
+    """
+    if not is_lease_holder(task_id, lease_token):
+        app_logger.info(f"任务 {task_id} 已被重新提交，忽略旧的模型 {model_name} 子任务")
+        return {"kind": "model", "name": model_name, "status": "superseded"}
+
+    task_manager = AnalysisTaskManager()
+
+    async def run_task():
+        memory = PeakRssTracker()
+        async with get_session() as session:
+            data = await _load_data_by_id(task_id, data_id, session)
+        return await task_manager.run_model_part(str(task_id), model_name, data, memory)
+
+    try:
+        with lease_heartbeat(task_id, lease_token):
+            status = run_in_worker_loop(run_task)
+    except AnalysisCancelledError:
+        status = "cancelled"
+    except Exception as e:
+        if is_cancelled(task_id):
+            # 任务取消时产物已被清理，后续读写失败不再记为模型失败
+            status = "cancelled"
+        else:
+            app_logger.error(f"模型 {model_name} 子任务失败: task_id={task_id}, error={str(e)}")
+            task_manager.save_part(str(task_id), "model", model_name, {
+                "status": "failed",
+                "message": f"模型 {model_name} 训练失败: {str(e)}",
+            })
+            status = "failed"
+
+    if status == "cancelled" or is_cancelled(task_id):
+        task_manager.cleanup_task_artifacts(str(task_id))
+        status = "cancelled"
+    elif lease_token is not None:
+        # 为仍在排队的其它子任务保留租约
+        renew_lease(task_id, lease_token, settings.analysis_lease_dispatch_seconds)
+
+    return {"kind": "model", "name": model_name, "status": status}
+
+
+@celery_app.task(bind=True)
+def run_analysis_subtask(
+    self, task_id: int, data_id: int, analysis_name: str, lease_token: str | None = None
+) -> Dict[str, Any]:
+    """
+    统计分析子任务
+
+    数据从清洗缓存读取，共享中间结果从任务目录读取；任何异常都记录为该分析失败
+
+    Args:
+        task_id: 数据库中的任务ID
+        data_id: 数据ID
+        analysis_name: 统计分析名称
+        lease_token: 分发该子任务时的任务租约，见 run_model_subtask
+
+    Returns:
+        子任务状态
+    """
+    if not is_lease_holder(task_id, lease_token):
+        app_logger.info(f"任务 {task_id} 已被重新提交，忽略旧的统计分析 {analysis_name} 子任务")
+        return {"kind": "analysis", "name": analysis_name, "status": "superseded"}
+
+    task_manager = AnalysisTaskManager()
+
+    async def load_data():
+        async with get_session() as session:
+            return await _load_data_by_id(task_id, data_id, session)
+
+    try:
+        with lease_heartbeat(task_id, lease_token):
+            memory = PeakRssTracker()
+            data = run_in_worker_loop(load_data)
+            status = task_manager.run_analysis_part(str(task_id), analysis_name, data, memory)
+    except AnalysisCancelledError:
+        status = "cancelled"
+    except Exception as e:
+        if is_cancelled(task_id):
+            # 任务取消时产物已被清理，后续读写失败不再记为分析失败
+            status = "cancelled"
+        else:
+            app_logger.error(f"统计分析 {analysis_name} 子任务失败: task_id={task_id}, error={str(e)}")
+            task_manager.save_part(str(task_id), "analysis", analysis_name, {
+                "status": "failed",
+                "message": f"统计分析 {analysis_name} 运行失败: {str(e)}",
+            })
+            status = "failed"
+
+    if status == "cancelled" or is_cancelled(task_id):
+        task_manager.cleanup_task_artifacts(str(task_id))
+        status = "cancelled"
+    elif lease_token is not None:
+        renew_lease(task_id, lease_token, settings.analysis_lease_dispatch_seconds)
+
+    return {"kind": "analysis", "name": analysis_name, "status": status}
+
+
+@celery_app.task(bind=True)
+def finalize_analysis_task(
+    self, subtask_results: List[Dict[str, Any]], task_id: int, lease_token: str | None = None
+) -> Dict[str, Any]:
+    """
+    汇总子任务结果，写入任务结果文件并更新任务状态，完成后释放任务租约
+
+    Args:
+        subtask_results: 各子任务返回的状态（详细结果由子任务写入任务目录）
+        task_id: 数据库中的任务ID
+        lease_token: 分发子任务时的任务租约，见 run_model_subtask
+
+    Returns:
+        任务执行结果
+    """
+    app_logger.info(f"汇总分析任务: task_id={task_id}, 子任务数={len(subtask_results)}")
+    if not is_lease_holder(task_id, lease_token):
+        app_logger.info(f"任务 {task_id} 已被重新提交，忽略旧的汇总任务")
+        return {"task_id": task_id, "status": "superseded"}
+
+    try:
+        return _finalize_fan_out(task_id)
+    finally:
+        if lease_token is not None:
+            release_lease(task_id, lease_token)
+
+
+def _finalize_fan_out(task_id: int) -> Dict[str, Any]:
+    """汇总子任务结果并更新任务状态"""
+    if is_cancelled(task_id):
+        return _finish_cancelled(task_id)
+
+    task_manager = AnalysisTaskManager()
+
+    try:
+        result = task_manager.finalize_fan_out(str(task_id))
+        run_in_worker_loop(lambda: _update_task_status(
+            task_id,
+            AnalysisStatusEnum.COMPLETED,
+            json.dumps(result, ensure_ascii=False, default=json_default),
+            result["task_info"],
+        ))
+        publish_progress(task_id, "completed")
+        enqueue_report_build(task_id)
+        return {"task_id": task_id, "status": AnalysisStatusEnum.COMPLETED.value}
+
+    except Exception as e:
+        app_logger.error(f"汇总分析任务失败: task_id={task_id}, error={str(e)}")
+        app_logger.error(f"详情:{traceback.format_exc()}")
+        task_manager.fail_fan_out(str(task_id), str(e))
+        _mark_task_failed(task_id, str(e))
+        return {"task_id": task_id, "status": "failed", "error": str(e)}
+
+
+@celery_app.task
+def on_analysis_chord_error(request, exc, exc_traceback, task_id: int, lease_token: str | None = None) -> None:
+    """
+    chord 执行出错（如子任务超时被强制终止）时的回调，把任务标记为失败并释放任务租约
+    """
+    if not is_lease_holder(task_id, lease_token):
+        app_logger.info(f"任务 {task_id} 已被重新提交，忽略旧的子任务错误: {exc}")
+        return
+
+    try:
+        if is_cancelled(task_id):
+            # 被撤销的子任务也会触发该回调
+            _finish_cancelled(task_id)
+            return
+
+        app_logger.error(f"分析任务子任务执行出错: task_id={task_id}, error={exc}")
+        try:
+            AnalysisTaskManager().fail_fan_out(str(task_id), str(exc))
+        finally:
+            _mark_task_failed(task_id, str(exc))
     finally:
-        if db_manager and db_manager.engine:
-            async def cleanup_db():
-                await db_manager.engine.dispose()
-            try:
-                loop = asyncio.get_running_loop()
-                loop.run_until_complete(cleanup_db())
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(cleanup_db())
-                finally:
-                    loop.close()
-    
+        if lease_token is not None:
+            release_lease(task_id, lease_token)
+
+
+@celery_app.task(bind=True)
+def build_comprehensive_report(self, task_id: int) -> Dict[str, Any]:
+    """
+    任务完成后在后台生成综合分析报告（模型预测、LLM 点评并写入各分析结果表）
+
+    结果接口只读取生成好的报告，不再在请求中等待 LLM
+
+    Args:
+        task_id: 数据库中的任务ID
+
+    Returns:
+        生成状态
+    """
+    app_logger.info(f"开始生成综合分析报告: task_id={task_id}")
+    if is_cancelled(task_id):
+        clear_report_status(task_id)
+        return {"task_id": task_id, "status": AnalysisStatusEnum.CANCELLED.value}
+
+    async def run_task():
+        async with get_session() as session:
+            return await AnalysisTaskManager().generate_comprehensive_analysis(str(task_id), session)
+
+    try:
+        report = run_in_worker_loop(run_task)
+    except Exception as e:
+        app_logger.error(f"生成综合分析报告失败: task_id={task_id}, error={str(e)}")
+        app_logger.error(f"详情:{traceback.format_exc()}")
+        report = {"error": str(e)}
+
+    if "error" in report:
+        mark_report_failed(task_id, report["error"])
+        return {"task_id": task_id, "status": "failed", "error": report["error"]}
+
+    clear_report_status(task_id)
+    return {"task_id": task_id, "status": AnalysisStatusEnum.COMPLETED.value}
+
+
+def enqueue_report_build(task_id: int) -> bool:
+    """
+    提交综合分析报告的生成，报告正在生成时不重复提交
+
+    Returns:
+        是否提交
+    """
+    if not mark_report_generating(task_id):
+        return False
+
+    build_comprehensive_report.delay(task_id)
+    return True
 
 
 async def _load_data_by_id(task_id: int, data_id: int, db: AsyncSession) -> pd.DataFrame:
     """
     根据数据ID加载数据
-    
+
     Args:
         db: 数据库会话
         data_id: 数据ID
         task_id: 任务ID
-        
+
     Returns:
         加载的数据DataFrame，如果不存在则返回None
     """
@@ -179,31 +523,50 @@ async def _load_data_by_id(task_id: int, data_id: int, db: AsyncSession) -> pd.D
     return df
 
 
+def enqueue_analysis_task(task_id: int, data_id: int) -> bool:
+    """
+    提交分析任务执行，任务已在队列中或正在执行时不重复提交
+
+    Args:
+        task_id: 数据库中的任务ID
+        data_id: 数据ID
+
+    Returns:
+        是否提交
+    """
+    if not mark_queued(task_id):
+        return False
+
+    async_result = execute_analysis_task.delay(task_id, data_id)
+    register_celery_ids(task_id, [async_result.id])
+    return True
+
+
 @celery_app.task
 def check_and_execute_pending_tasks():
     """
-    检查并执行待处理的任务
-    这个任务可以定期执行，以确保没有遗漏的任务
+    重新提交租约已失效的待执行和执行中任务
+
+    由 beat 定期执行。正常排队或执行中的任务持有入队标记或租约，不会被重复提交；
+    Worker 崩溃、消息丢失后租约到期，任务在下一次巡检时恢复执行
     """
-    app_logger.info("检查待执行的分析任务")
-    
+    app_logger.info("检查租约失效的分析任务")
+
     async def check_tasks():
         async with get_session() as session:
-            # 查询所有待处理的任务
             statement = select(AnalysisTask).where(
-                AnalysisTask.status == AnalysisStatusEnum.PENDING
+                AnalysisTask.status.in_([AnalysisStatusEnum.PENDING, AnalysisStatusEnum.PROCESSING])
             )
             result = await session.execute(statement)
-            pending_tasks = result.scalars().all()
-            
-            for task in pending_tasks:
-                app_logger.info(f"发现待处理任务: {task.id}")
-                # 提交执行任务
-                execute_analysis_task.delay(task.id, task.data_id)
-    
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(check_tasks())
-    finally:
-        loop.close()
\ No newline at end of file
+            return [(task.id, task.data_id) for task in result.scalars().all()]
+
+    resubmitted = []
+    for task_id, data_id in run_in_worker_loop(check_tasks):
+        if has_lease(task_id) or is_cancelled(task_id):
+            continue
+        if enqueue_analysis_task(task_id, data_id):
+            resubmitted.append(task_id)
+
+    if resubmitted:
+        app_logger.warning(f"重新提交租约失效的分析任务: {resubmitted}")
+    return resubmitted
@@ -0,0 +1,98 @@
+"""
+Celery Worker 进程运行时
+每个 Worker 进程只创建一次事件循环和数据库连接池，在该进程执行的所有任务之间复用
+"""
+
+import asyncio
+import os
+
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+
+from app.core.logging import app_logger
+from app.db.database import db_manager
+
+# 当前进程的事件循环，以及创建它的进程号（fork 出的子进程会继承父进程的对象）
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_pid: int | None = None
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """
+    获取当前 Worker 进程的事件循环，不存在时创建
+
+    数据库连接绑定在创建它的事件循环和进程上，因此新建事件循环时同时丢弃从父进程继承的连接池
+
+    Returns:
+        当前进程的事件循环
+    """
+    global _loop, _loop_pid
+
+    if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        _loop_pid = os.getpid()
+        asyncio.set_event_loop(_loop)
+        # 父进程（如 FastAPI 主进程）的连接池不能跨进程使用，只丢弃引用、不关闭其连接
+        db_manager.engine = None
+        app_logger.info(f"Worker 进程 {_loop_pid} 已创建事件循环")
+
+    return _loop
+
+
+async def _ensure_db() -> None:
+    if not db_manager.engine:
+        await db_manager.init()
+
+
+def run_in_worker_loop(async_func):
+    """
+    在当前 Worker 进程的常驻事件循环中运行协程函数
+
+    Args:
+        async_func: 无参数的协程函数
+
+    Returns:
+        协程函数的返回值
+    """
+    loop = get_worker_loop()
+
+    async def run():
+        await _ensure_db()
+        return await async_func()
+
+    return loop.run_until_complete(run())
+
+
+def _close_worker_loop() -> None:
+    """释放数据库连接池并关闭事件循环"""
+    global _loop
+
+    if _loop is None or _loop_pid != os.getpid() or _loop.is_closed():
+        return
+
+    try:
+        if db_manager.engine:
+            _loop.run_until_complete(db_manager.close())
+    except Exception as e:
+        app_logger.warning(f"Worker 进程 {_loop_pid} 释放数据库连接池失败: {e}")
+    finally:
+        _loop.close()
+        _loop = None
+        app_logger.info(f"Worker 进程 {_loop_pid} 已关闭事件循环")
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs) -> None:
+    """prefork 子进程启动时创建事件循环和数据库引擎"""
+    get_worker_loop().run_until_complete(_ensure_db())
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs) -> None:
+    """prefork 子进程退出（包括按任务数或内存回收）时释放资源"""
+    _close_worker_loop()
+
+
+@worker_shutdown.connect
+def _on_worker_shutdown(**kwargs) -> None:
+    """solo 池在 Worker 主进程中执行任务，主进程退出时释放资源"""
+    _close_worker_loop()
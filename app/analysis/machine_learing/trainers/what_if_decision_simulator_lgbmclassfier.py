@@ -1,6 +1,7 @@
 import asyncio
 import pickle
 from concurrent.futures.thread import ThreadPoolExecutor
+from typing import Callable
 from lightgbm import LGBMClassifier
 from sklearn.feature_selection import SelectKBest, mutual_info_classif
 import pandas as pd
@@ -23,6 +24,18 @@ def preprocess(X):
     X = X.iloc[:, 5:]
     return X
 
+def _to_levels(values: pd.Series, scaler: int) -> pd.Series:
+    """
+    把 0-1 归一化的得分还原为整数等级
+
+    压缩后的 DataFrame（compact_cleaned_dataframe）中得分列为 float32，乘法结果可能是 1.9999999，
+    需先四舍五入再取整；float64 列保持原来的直接截断，不改变未开启压缩时的模型输入
+    """
+    scaled = values.multiply(scaler)
+    if scaled.dtype == np.float32:
+        scaled = scaled.round()
+    return scaled.astype(int)
+
 def normalize(X):
     """去归一化"""
     for col in X.columns:
@@ -31,7 +44,7 @@ def normalize(X):
             X.drop(col, axis=1, inplace=True)
             continue
         temp: pd.Series = X[col]
-        X[col] = temp.multiply(scaler).astype(int)
+        X[col] = _to_levels(temp, scaler)
     return X
 
 def pick_up_features(X: pd.DataFrame, y: pd.Series, score: float) -> tuple[pd.DataFrame, pd.Series, list[str]]:
@@ -56,7 +69,7 @@ def pick_up_features(X: pd.DataFrame, y: pd.Series, score: float) -> tuple[pd.Da
         X.drop(y.name, axis=1, inplace=True)
     except Exception:
         app_logger.warn(f"在训练whatif决策器模型时发生问题：没有该列: {y.name}")
-    y = y.multiply(len(np.unique(y)-1)).astype(int)
+    y = _to_levels(y, len(np.unique(y)-1))
 
     # 互信息算法
     selector_mi = SelectKBest(score_func=mutual_info_classif, k='all')
@@ -73,12 +86,16 @@ def pick_up_features(X: pd.DataFrame, y: pd.Series, score: float) -> tuple[pd.Da
 
     return X, y, selected_features
 
-def training_with_EMOTE_bayes_search(X, y) -> LGBMClassifier:
+def _no_checkpoint() -> None:
+    pass
+
+def training_with_EMOTE_bayes_search(X, y, checkpoint: Callable[[], None] = _no_checkpoint) -> LGBMClassifier:
     """
     使用EMOTE进行过采样，并使用贝叶斯搜索进行超参数优化
 
     :param X: 训练集特征
     :param y: 训练集标签
+    :param checkpoint: 取消检查点，任务已被取消时抛出异常；在过采样后、每次试验开始前和最终训练前调用
     :return:
     """
     sss = StratifiedShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
@@ -93,6 +110,7 @@ def training_with_EMOTE_bayes_search(X, y) -> LGBMClassifier:
     ('tomek', TomekLinks())  # 在过采样后再应用Tomek
     ])
     X_resampled, y_resampled = pipeline.fit_resample(X_train, y_train)
+    checkpoint()
 
     base_params = {
             # 'device': 'gpu',
@@ -107,6 +125,8 @@ def training_with_EMOTE_bayes_search(X, y) -> LGBMClassifier:
 
     # 定义贝叶斯优化目标函数
     def objective(trial):
+        # 每次试验开始前检查，异常会直接中断 study.optimize
+        checkpoint()
         params = {
             'n_estimators': trial.suggest_int('n_estimators', 30, 300),
             'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
@@ -141,6 +161,7 @@ def training_with_EMOTE_bayes_search(X, y) -> LGBMClassifier:
     app_logger.info("最佳参数:", study.best_params)
 
     # 用最佳参数训练最终模型
+    checkpoint()
     best_params = {**base_params, **study.best_params}
     final_model = lgb.LGBMClassifier(**best_params)
 
@@ -177,30 +198,35 @@ def training_with_EMOTE_bayes_search(X, y) -> LGBMClassifier:
 
     return final_model
 
-def train(X: pd.DataFrame, y: pd.Series, score: float) -> LGBMClassifier:
+def train(X: pd.DataFrame, y: pd.Series, score: float, checkpoint: Callable[[], None] = _no_checkpoint) -> LGBMClassifier:
     """
     开始训练
     :param X: 总数据集
     :param y: 目标指标
+    :param checkpoint: 取消检查点，见 training_with_EMOTE_bayes_search
     :return: 训练好的lgb分类器
     """
     X = preprocess(X)
     X = normalize(X)
     X, y , _ = pick_up_features(X, y, score)
-    model = training_with_EMOTE_bayes_search(X, y)
+    checkpoint()
+    model = training_with_EMOTE_bayes_search(X, y, checkpoint)
 
     return model
 
-async def async_train(X: pd.DataFrame, y: pd.Series, score: float, taskid: str) -> LGBMClassifier:
+async def async_train(
+    X: pd.DataFrame, y: pd.Series, score: float, taskid: str, checkpoint: Callable[[], None] = _no_checkpoint
+) -> LGBMClassifier:
     """
     开始训练
     :param X: 总数据集
     :param y: 目标指标
+    :param checkpoint: 取消检查点，见 training_with_EMOTE_bayes_search
     :return: 训练好的lgb分类器
     """
     loop = asyncio.get_running_loop()
     with ThreadPoolExecutor() as executor:
-        future = loop.run_in_executor(executor, train, X, y, score)
+        future = loop.run_in_executor(executor, train, X, y, score, checkpoint)
         model = await future
 
     version_manager = ModelVersionManager(settings.machine_learning_models_path)
@@ -13,6 +13,7 @@ from app.analysis.statistical.student_portrait_chart import analyze_student_pers
 from app.analysis.statistical.satisfaction_part_chart import analyze_feedback_satisfaction
 from app.analysis.statistical.satisfaction_whole_chart import analyze_feedback
 from app.analysis.statistical.student_satisfaction_route_sankey_chart import analysis
+from app.analysis.statistical.shared_intermediates import build_grouped_cells, build_category_means
 
 __all__ = [
     'create_radar_echarts_json',
@@ -24,5 +25,7 @@ __all__ = [
     'analyze_student_persona',
     'analyze_feedback_satisfaction',
     'analyze_feedback',
-    'analysis'
+    'analysis',
+    'build_grouped_cells',
+    'build_category_means',
 ]
\ No newline at end of file
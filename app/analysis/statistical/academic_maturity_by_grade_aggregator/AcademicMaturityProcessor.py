@@ -85,7 +85,8 @@ def process_maturity_to_json(df: pd.DataFrame) -> List[Dict[str, Any]]:
     # 中文年级 -> 数字
     grade_map = {"大一": 1, "大二": 2, "大三": 3, "大四": 4}
     # 使用 .loc 进行赋值，避免 SettingWithCopyWarning
-    processed_df.loc[:, "年级数字"] = processed_df["年级"].map(grade_map)
+    # 年级列可能是 category 类型，先转为 object，保证映射结果为数值列
+    processed_df.loc[:, "年级数字"] = processed_df["年级"].astype(object).map(grade_map)
 
     # 按年级聚合（均值）
     # 过滤出 COLUMN_MAP 中的所有列名，并且这些列名必须在 processed_df 中存在
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
 
+from app.analysis.statistical.shared_intermediates import build_grouped_cells
+
 
 class DataProcessor:
     """数据处理类，使用相关性分析计算权重并返回前端JSON"""
@@ -18,13 +20,15 @@ class DataProcessor:
     }
 
     @classmethod
-    def process_dataframe_to_json(cls, df: pd.DataFrame, outcome_variables: List[str] = None) -> List[Dict[str, Any]]:
+    def process_dataframe_to_json(cls, df: pd.DataFrame, outcome_variables: List[str] = None,
+                                  grouped_cells: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         处理DataFrame并返回前端JSON，使用相关性分析计算权重
 
         Args:
             df: 包含数据的DataFrame
             outcome_variables: 学业成果变量列表，如果为None则使用默认列表
+            grouped_cells: 学院→专业→年级 分组（共享中间结果），如果为None则自行构建
 
         Returns:
             前端需要的嵌套JSON数据结构
@@ -39,7 +43,7 @@ class DataProcessor:
         df = cls._calculate_ehi_scores(df, weights)
 
         # 组装前端数据
-        return cls._assemble_frontend_data(df)
+        return cls._assemble_frontend_data(df, grouped_cells)
 
     @classmethod
     def _get_default_outcome_variables(cls) -> List[str]:
@@ -132,30 +136,31 @@ class DataProcessor:
         return result_df
 
     @classmethod
-    def _assemble_frontend_data(cls, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _assemble_frontend_data(cls, df: pd.DataFrame, grouped_cells: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """组装前端JSON数据"""
         radar_kpi_cols = list(cls.KPI_MAPPING.values())
         academies_data = []
 
+        if grouped_cells is None:
+            grouped_cells = build_grouped_cells(df)
+
         # 定义年级排序
         grade_order = {'freshmen': 0, 'sophomore': 1, 'junior': 2, 'senior': 3}
 
-        for academy_name in df['学院'].unique():
+        for academy_name, academy_cells in grouped_cells.items():
             academy_majors = []
-            academy_df = df[df['学院'] == academy_name]
 
-            for major_name in academy_df['专业'].unique():
+            for major_name, major_cells in academy_cells.items():
                 major_grades = []
-                major_df = academy_df[academy_df['专业'] == major_name]
 
                 # 按年级排序
                 sorted_grades = sorted(
-                    major_df['年级'].unique(),
+                    major_cells,
                     key=lambda x: grade_order.get(x, 99)
                 )
 
                 for grade_name in sorted_grades:
-                    grade_df = major_df[major_df['年级'] == grade_name]
+                    grade_df = df.iloc[major_cells[grade_name]]
 
                     if len(grade_df) > 0:
                         # 计算7个指标的平均值并扩大100倍，转换为Python float
@@ -4,6 +4,8 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List, Any
 
+from app.analysis.statistical.shared_intermediates import build_grouped_cells
+
 class RPIProcessor:
     """资源感知度(RPI)处理器：权重->RPI->JSON"""
 
@@ -18,16 +20,18 @@ class RPIProcessor:
     }
 
     @classmethod
-    def process_dataframe_to_json(cls, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def process_dataframe_to_json(cls, df: pd.DataFrame, grouped_cells: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         输入原始 DataFrame → 计算 RPI → 返回前端 JSON
+
+        grouped_cells 为共享的 学院→专业→年级 分组，未提供时自行构建
         """
         # 1️⃣ 计算权重
         weights = cls._calc_weights(df)
         # 2️⃣ 计算 RPI 并写回
         df = cls._calc_rpi(df, weights)
         # 3️⃣ 组装 JSON
-        return cls._assemble_json(df)
+        return cls._assemble_json(df, grouped_cells)
 
     # ---------- 内部辅助 ----------
     @classmethod
@@ -53,19 +57,20 @@ class RPIProcessor:
         return df
 
     @classmethod
-    def _assemble_json(cls, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _assemble_json(cls, df: pd.DataFrame, grouped_cells: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """学院→专业→年级 嵌套 JSON"""
         grade_order = {'freshmen': 0, 'sophomore': 1, 'junior': 2, 'senior': 3}
 
+        if grouped_cells is None:
+            grouped_cells = build_grouped_cells(df)
+
         academies_json = []
-        for ac_name in df['学院'].unique():
-            ac_df = df[df['学院'] == ac_name]
+        for ac_name, ac_cells in grouped_cells.items():
             majors_json = []
-            for maj_name in ac_df['专业'].unique():
-                maj_df = ac_df[ac_df['专业'] == maj_name]
+            for maj_name, maj_cells in ac_cells.items():
                 grades_json = []
-                for gr_name in sorted(maj_df['年级'].unique(), key=lambda x: grade_order.get(x, 99)):
-                    gr_df = maj_df[maj_df['年级'] == gr_name]
+                for gr_name in sorted(maj_cells, key=lambda x: grade_order.get(x, 99)):
+                    gr_df = df.iloc[maj_cells[gr_name]]
                     if gr_df.empty:
                         continue
                     # 各资源均值×100
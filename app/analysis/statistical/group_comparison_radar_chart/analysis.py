@@ -7,6 +7,8 @@ import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
 
+from app.analysis.statistical.shared_intermediates import build_grouped_cells
+
 
 def prepare_radar_data(df, groups_dict, radar_dimensions):
     """
@@ -66,7 +68,7 @@ def prepare_radar_data(df, groups_dict, radar_dimensions):
     return radar_data
 
 
-def analyze_college_groups(df, feature_groups, radar_dimensions):
+def analyze_college_groups(df, feature_groups, radar_dimensions, grouped_cells=None):
     """
     按学院分组进行分析
     
@@ -74,24 +76,25 @@ def analyze_college_groups(df, feature_groups, radar_dimensions):
         df: 输入的DataFrame
         feature_groups: 特征分组字典
         radar_dimensions: 雷达图维度列表
+        grouped_cells: 学院→专业→年级 分组（共享中间结果），为None时自行构建
     
     Returns:
         dict: 学院分组的雷达图数据
     """
+    if grouped_cells is None:
+        grouped_cells = build_grouped_cells(df)
+
     college_groups = {}
     # 我们需要调用返回每一个学院里的每一个专业的每一个年级的组
-    for academy in df['学院'].unique():
-        college_df = df[df['学院'] == academy]
-        for major in college_df['专业'].unique():
-            major_df = college_df[college_df['专业'] == major]
-            for grade in major_df['年级'].unique():
-                grade_df = major_df[major_df['年级'] == grade]
-                college_groups[f"{academy} {major} {grade}"] = grade_df
+    for academy, academy_cells in grouped_cells.items():
+        for major, major_cells in academy_cells.items():
+            for grade, positions in major_cells.items():
+                college_groups[f"{academy} {major} {grade}"] = df.iloc[positions]
     
     return prepare_radar_data(df, college_groups, radar_dimensions)
 
 
-def perform_radar_analysis(df, feature_groups, radar_dimensions):
+def perform_radar_analysis(df, feature_groups, radar_dimensions, grouped_cells=None):
     """
     执行完整的雷达图分析，生成三种分组方案的雷达图数据
     
@@ -99,11 +102,12 @@ def perform_radar_analysis(df, feature_groups, radar_dimensions):
         df: 输入的DataFrame
         feature_groups: 特征分组字典
         radar_dimensions: 雷达图维度列表
+        grouped_cells: 学院→专业→年级 分组（共享中间结果），为None时自行构建
     
     Returns:
         dict: 包含三种分组方案雷达图数据的字典
     """
     # 执行分析
-    college_radar = analyze_college_groups(df, feature_groups, radar_dimensions)
+    college_radar = analyze_college_groups(df, feature_groups, radar_dimensions, grouped_cells)
     
     return college_radar
\ No newline at end of file
@@ -9,12 +9,13 @@ from .data_preprocessing import preprocess_radar_data
 from .analysis import perform_radar_analysis
 
 
-def create_radar_echarts_json(df):
+def create_radar_echarts_json(df, grouped_cells=None):
     """
     创建完整的雷达图ECharts JSON数据（统一入口函数）
     
     Args:
         df (pd.DataFrame): 输入的DataFrame
+        grouped_cells (dict): 学院→专业→年级 分组（共享中间结果），为None时自行构建
     
     Returns:
         dict: 完整的雷达图JSON数据，可直接用于ECharts
@@ -23,7 +24,7 @@ def create_radar_echarts_json(df):
     processed_df, feature_groups, radar_dimensions = preprocess_radar_data(df)
     
     # 2. 执行分析
-    echarts_json = perform_radar_analysis(processed_df, feature_groups, radar_dimensions)
+    echarts_json = perform_radar_analysis(processed_df, feature_groups, radar_dimensions, grouped_cells)
     
     # # 3. 组织JSON输出
     # echarts_json = create_radar_echarts_json_from_analysis(radar_results)
@@ -0,0 +1,86 @@
+"""
+统计分析共享中间结果模块
+多个统计分析重复计算的中间结果统一在这里构建，由任务管理器每个任务只计算一次后分发给各个分析
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# 学院→专业→年级 分组列
+GROUP_COLUMNS = ['学院', '专业', '年级']
+
+# 满意度十二个类别及其包含的列
+SATISFACTION_CATEGORIES = {
+    '学习情况': ['课前预学','课堂参与','课后复习','延伸阅读','完成作业时间','自习时间','课外阅读时间','网络课程时间','实验科研时间',
+                 '社团活动时间','竞赛活动时间','其他学习时间','同学合作','参与科研团队','参与学科竞赛','学习同学方法','师生交流频度'],
+    '思政课': ['思政课总体满意度','思政课设置满意度','思政课内容满意度','思政课质量满意度','思政课效果满意度'],
+    '专业课': ['专业课知识融合','专业课解决问题能力','专业课交叉融合','专业课实践结合','专业课努力程度','专业课前沿内容',
+               '传统讲授','课堂互动','案例讨论','小组合作'],
+    '体育教育': ['体育教育满意度'],
+    '美育教育': ['美育教育满意度'],
+    '劳动教育': ['劳动教育满意度'],
+    '校园生活': ['社团活动满意度','校园文化满意度','创新创业满意度','国际交流满意度','社会实践满意度'],
+    '实习': ['实习内容满意度','实习时间满意度','实习场地满意度','实习指导满意度'],
+    '自我提升': ['问题解决能力提升','自主学习能力提升','合作能力提升','表达沟通能力提升','未来规划能力提升','人文底蕴提升',
+                 '科学精神提升','学会学习提升','健康生活提升','责任担当提升','实践创新提升','自我提升'],
+    '老师教育': ['教师履职满意度','关爱学生满意度','教学投入满意度','教师总体满意度','课程目标解释','激发学习兴趣',
+                 '课后辅导答疑','立德树人','创造性思考'],
+    '学校服务': ['一站式服务','实训安全管理','教师参与活动','学术讲座多','心理健康满意度','职业规划满意度',
+                 '班主任工作满意度','学业指导满意度','资助工作满意度'],
+    '学校基础条件': ['教室设备满意度','实训室满意度','图书馆满意度','网络资源满意度','体育设施满意度','住宿条件满意度','学校整体满意度']
+}
+
+# 类别均值列名
+CATEGORY_MEAN_COLUMNS = [cat + '_均值' for cat in SATISFACTION_CATEGORIES]
+
+
+def build_grouped_cells(df: pd.DataFrame) -> Dict[str, Dict[str, Dict[str, np.ndarray]]]:
+    """
+    构建 学院→专业→年级 的分组
+
+    各层级按首次出现的顺序排列（与逐层 unique() 遍历的顺序一致），
+    学院、专业或年级缺失的行不属于任何分组
+
+    Args:
+        df: 清洗后的数据
+
+    Returns:
+        {学院: {专业: {年级: 行位置数组}}}，行位置可用于 df.iloc，
+        对保持行顺序的副本（如 df.copy() 后新增列）同样有效
+    """
+    grouped = df.groupby(GROUP_COLUMNS, observed=True, dropna=True)
+
+    cells = {}
+    # 每个分组的位置数组升序排列，按首行位置排序即为首次出现的顺序
+    for (academy, major, grade), positions in sorted(
+        grouped.indices.items(), key=lambda item: item[1][0]
+    ):
+        cells.setdefault(academy, {}).setdefault(major, {})[grade] = positions
+
+    return cells
+
+
+def build_category_means(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    计算满意度十二个类别的均值
+
+    与整体/部分满意度分析原有的预处理一致：先对时间列量化评分，再按类别求行均值
+    （原流程中去除制表符只影响文本列，与均值无关，这里省略）
+
+    Args:
+        df: 清洗后的数据（不会被修改）
+
+    Returns:
+        只包含十二个 `_均值` 列的 DataFrame，索引与输入一致
+    """
+    # 满意度分析模块反过来依赖本模块的类别定义，这里延迟导入以避免循环导入
+    from app.analysis.statistical.satisfaction_part_chart.data_preprocessing import data_cleaning
+
+    df = data_cleaning(df.copy())
+
+    return pd.DataFrame(
+        {cat + '_均值': df[cols].mean(axis=1) for cat, cols in SATISFACTION_CATEGORIES.items()},
+        index=df.index,
+    )
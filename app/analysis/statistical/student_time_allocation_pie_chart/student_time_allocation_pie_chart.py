@@ -2,6 +2,8 @@ import pandas as pd
 import json
 from pathlib import Path
 
+from app.analysis.statistical.shared_intermediates import build_grouped_cells
+
 # 8 个指标顺序（前端硬编码用）
 METRICS = [
     '作业时间', '自习时间', '课外阅读', '网络课程',
@@ -14,27 +16,29 @@ COLS = [
     '实验科研时间', '社团活动时间', '竞赛活动时间', '其他学习时间'
 ]
 
-def build_academy_array(df: pd.DataFrame) -> list:
+def build_academy_array(df: pd.DataFrame, grouped_cells: dict = None) -> list:
     if {'学院', '专业', '年级'}.difference(df.columns):
         raise ValueError('缺少 学院/专业/年级 列')
     if not set(COLS).issubset(df.columns):
         raise ValueError('缺少部分时间列')
 
-    # 先拿到 学院→专业→年级→8 指标列表
-    grouped = (
-        df.groupby(['学院', '专业', '年级'])[COLS]
-          .mean()
-          .round(3)
-          .apply(list, axis=1)
-    )
+    # 学院→专业→年级 分组（共享中间结果），未提供时自行构建
+    if grouped_cells is None:
+        grouped_cells = build_grouped_cells(df)
 
-    # 转成前端要的 Academy[]
+    # 按 学院→专业→年级 排序后计算 8 指标均值列表
+    time_values = df[COLS]
     academy_map = {}
-    for (academy, major, grade), data in grouped.items():
-        academy_map.setdefault(academy, {}) \
-                   .setdefault(major, []) \
-                   .append({'name': grade, 'data': data})
+    for academy in sorted(grouped_cells):
+        for major in sorted(grouped_cells[academy]):
+            major_cells = grouped_cells[academy][major]
+            for grade in sorted(major_cells):
+                data = time_values.iloc[major_cells[grade]].mean().round(3).tolist()
+                academy_map.setdefault(academy, {}) \
+                           .setdefault(major, []) \
+                           .append({'name': grade, 'data': data})
 
+    # 转成前端要的 Academy[]
     return [
         {
             'name': ac,
@@ -1,19 +1,58 @@
+import json
 import traceback
+from typing import AsyncGenerator
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.logging import app_logger
+from app.db.models.analysis import AnalysisTask
 from app.dependencies import get_current_operator, get_db_session
+from app.enum.enums import AnalysisStatusEnum
+from app.exception.exceptions.analysis import AnalysisTaskConflictError
 from app.schemas.analysis import AnalysisRequest, AnalysisMetaData
 from app.schemas.base_http_response import BaseHTTPResponse
 from app.service.analysis_service import AnalysisService
 import app.service.analysis_operation_service as operation_service
-from app.service.data_clean_service import data_clean_task
+from app.utils.report_status import FAILED, GENERATING
+from app.utils.task_progress import TERMINAL_STAGES, get_progress_history, stream_progress
 
 router = APIRouter()
 
 
+def _format_event(event: dict) -> str:
+    return f"data:{json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def generate_progress_stream(task_id: int, status: AnalysisStatusEnum) -> AsyncGenerator[str, None]:
+    """
+    生成任务进度的流式响应
+
+    任务已结束时只回放历史事件；历史已过期则根据数据库状态补发一个结束事件
+    """
+    try:
+        if status in (AnalysisStatusEnum.PENDING, AnalysisStatusEnum.PROCESSING):
+            async for event in stream_progress(task_id):
+                # 没有新事件时发送 SSE 注释行，防止连接被代理断开
+                yield ": keep-alive\n\n" if event is None else _format_event(event)
+        else:
+            history = await get_progress_history(task_id)
+            for event in history:
+                yield _format_event(event)
+            if not history or history[-1]["stage"] not in TERMINAL_STAGES:
+                stage = {
+                    AnalysisStatusEnum.COMPLETED: "completed",
+                    AnalysisStatusEnum.CANCELLED: "cancelled",
+                }.get(status, "failed")
+                yield _format_event({"task_id": str(task_id), "stage": stage, "status": status.value})
+    except Exception as e:
+        app_logger.error(f"推送任务 {task_id} 进度失败: {e}")
+        yield _format_event({"task_id": str(task_id), "stage": "error", "error": str(e)})
+
+    yield "data: [DONE]\n\n"
+
+
 @router.get("/", dependencies=[Depends(get_current_operator)])
 async def get_all_analysis_tasks(
     db: AsyncSession = Depends(get_db_session),
@@ -35,6 +74,39 @@ async def get_all_analysis_tasks(
         )
 
 
+@router.get("/tasks", dependencies=[Depends(get_current_operator)])
+async def list_analysis_tasks(
+    limit: int = Query(20, ge=1, le=100, description="每页数量"),
+    cursor: str | None = Query(None, description="上一页返回的 next_cursor"),
+    status: AnalysisStatusEnum | None = Query(None, description="按任务状态筛选"),
+    data_id: int | None = Query(None, description="按数据ID筛选"),
+    db: AsyncSession = Depends(get_db_session),
+    analysis_operation_service: operation_service.AnalysisService = Depends(operation_service.AnalysisService)
+):
+    """
+    分页获取分析任务列表（按创建时间倒序）
+    """
+    try:
+        page = await analysis_operation_service.list_tasks(
+            db, limit=limit, cursor=cursor, status=status, data_id=data_id
+        )
+        return BaseHTTPResponse(
+            http_status=200,
+            message=page
+        )
+    except ValueError as e:
+        return BaseHTTPResponse(
+            http_status=400,
+            message=str(e)
+        )
+    except Exception as e:
+        app_logger.error(traceback.format_exc())
+        return BaseHTTPResponse(
+            http_status=500,
+            message=str(e)
+        )
+
+
 @router.post("/start", dependencies=[Depends(get_current_operator)])
 async def start_analysis_task(
     request: AnalysisRequest,
@@ -67,6 +139,12 @@ async def start_analysis_task(
             http_status=202,
             message=task_metadata
         )
+    except AnalysisTaskConflictError as e:
+        # 相同的任务正在由另一个请求创建，客户端稍后重试即可拿到该任务
+        return BaseHTTPResponse(
+            http_status=409,
+            message=e.message
+        )
     except ValueError as e:
         # 请求参数错误
         error_response = BaseHTTPResponse(
@@ -118,49 +196,167 @@ async def get_analysis_status(
         return error_response
 
 
+@router.post("/cancel/{task_id}", dependencies=[Depends(get_current_operator)])
+async def cancel_analysis_task(
+    task_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    analysis_operation_service: operation_service.AnalysisService = Depends(operation_service.AnalysisService)
+):
+    """
+    取消指定的分析任务（仅限待处理或运行中的任务）
+    """
+    try:
+        cancelled = await analysis_operation_service.cancel_task(db, task_id)
+        if not cancelled:
+            return BaseHTTPResponse(
+                http_status=409,
+                message="任务已结束，无法取消"
+            )
+        return BaseHTTPResponse(
+            http_status=200,
+            message="任务已取消"
+        )
+    except ValueError as e:
+        return BaseHTTPResponse(
+            http_status=404,
+            message=str(e)
+        )
+    except Exception as e:
+        app_logger.error(traceback.format_exc())
+        return BaseHTTPResponse(
+            http_status=500,
+            message=str(e)
+        )
+
+
+@router.get("/progress/{task_id}", dependencies=[Depends(get_current_operator)])
+async def stream_analysis_progress(
+    task_id: int,
+    db: AsyncSession = Depends(get_db_session),
+):
+    """
+    以 SSE 流式推送指定分析任务的阶段进度（数据清洗、各模型训练、各统计分析完成及耗时）
+    """
+    # 只在建立连接时查询一次数据库，之后的进度全部来自 Redis
+    task = await db.get(AnalysisTask, task_id)
+    if task is None:
+        return BaseHTTPResponse(
+            http_status=404,
+            message="任务不存在"
+        )
+
+    return StreamingResponse(
+        generate_progress_stream(task_id, task.status),
+        media_type="text/event-stream"
+    )
+
+
 @router.get("/results/{task_id}", dependencies=[Depends(get_current_operator)])
 async def get_analysis_results(
     task_id: int,
+    accept_encoding: str | None = Header(None),
     db: AsyncSession = Depends(get_db_session),
-    analysis_service: AnalysisService = Depends(AnalysisService),
     analysis_operation_service: operation_service.AnalysisService = Depends(operation_service.AnalysisService)
 ):
     """
-    获取指定分析任务的结果数据
+    获取指定分析任务的综合分析报告
+
+    报告在任务完成后由 Worker 在后台生成，这里只读取；尚未生成完时返回 202。
+    报告以生成时写出的响应体文件原样返回（按 Accept-Encoding 选择 br / gzip 压缩版本），不再解析和重新序列化
     """
     try:
-        # 检查任务是否存在
-        task_exists = await analysis_service.check_task_exists(str(task_id), db)
-        if not task_exists:
-            error_response = BaseHTTPResponse(
+        task = await db.get(AnalysisTask, task_id)
+        if task is None:
+            return BaseHTTPResponse(
                 http_status=404,
                 message="任务不存在或结果未生成"
             )
-            return error_response
-        
-        # 检查任务是否已完成
-        is_completed = await analysis_service.is_task_completed(str(task_id), db)
-        if not is_completed:
-            error_response = BaseHTTPResponse(
+
+        if task.status != AnalysisStatusEnum.COMPLETED:
+            return BaseHTTPResponse(
                 http_status=404,
                 message="任务尚未完成"
             )
-            return error_response
-        
-        # 获取分析结果
-        data_id = await analysis_service.get_data_id_for_task(int(task_id), db)
-        df = await data_clean_task(int(task_id), data_id, db)
 
-        results = await analysis_operation_service.generate_comprehensive_analysis(db, int(task_id), df)
+        report = await analysis_operation_service.get_comprehensive_report(task_id, accept_encoding)
+        if report["status"] == GENERATING:
+            return BaseHTTPResponse(
+                http_status=202,
+                message={"taskid": str(task_id), "status": GENERATING, "message": "综合分析报告生成中"}
+            )
+        if report["status"] == FAILED:
+            return BaseHTTPResponse(
+                http_status=500,
+                message=f"综合分析报告生成失败: {report['error']}"
+            )
+
+        headers = {"Vary": "Accept-Encoding"}
+        if report["encoding"] is not None:
+            headers["Content-Encoding"] = report["encoding"]
+        return FileResponse(report["path"], media_type="application/json", headers=headers)
+    except Exception as e:
+        error_response = BaseHTTPResponse(
+            http_status=500,
+            message=str(e)
+        )
+        app_logger.error(traceback.format_exc())
+        return error_response
+
 
+@router.get("/results/{task_id}/{analysis_name}", dependencies=[Depends(get_current_operator)])
+async def get_analysis_chart_result(
+    task_id: int,
+    analysis_name: str,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_db_session),
+    analysis_operation_service: operation_service.AnalysisService = Depends(operation_service.AnalysisService)
+):
+    """
+    获取指定分析任务中单个图表的结果（统计分析或模型预测）
+
+    只读取该图表对应的一条结果记录或结果分段；支持 ETag，结果未变化时返回 304
+    """
+    try:
+        task = await db.get(AnalysisTask, task_id)
+        if task is None:
+            return BaseHTTPResponse(
+                http_status=404,
+                message="任务不存在"
+            )
+
+        if task.status != AnalysisStatusEnum.COMPLETED:
+            return BaseHTTPResponse(
+                http_status=404,
+                message="任务尚未完成"
+            )
+
+        etag, chart = await analysis_operation_service.get_chart_result(
+            db, task_id, analysis_name, if_none_match
+        )
+        # 客户端每次使用缓存前都需要携带 If-None-Match 重新验证
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if chart is None:
+            return Response(status_code=304, headers=cache_headers)
+
+        response.headers.update(cache_headers)
         return BaseHTTPResponse(
             http_status=200,
-            message=results
+            message=chart
+        )
+    except ValueError as e:
+        return BaseHTTPResponse(
+            http_status=400,
+            message=str(e)
+        )
+    except FileNotFoundError as e:
+        return BaseHTTPResponse(
+            http_status=404,
+            message=str(e)
         )
     except Exception as e:
-        error_response = BaseHTTPResponse(
+        app_logger.error(traceback.format_exc())
+        return BaseHTTPResponse(
             http_status=500,
             message=str(e)
         )
-        app_logger.error(traceback.format_exc())
-        return error_response
\ No newline at end of file
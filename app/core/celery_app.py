@@ -4,16 +4,68 @@ Celery 应用配置
 """
 
 from celery import Celery
+from kombu import Queue
+
 from app.core.config import settings
 
+# 快速队列：统计图表分析、数据清洗与任务编排，保证新上传数据的看板尽快出现
+FAST_QUEUE = "fast"
+# 批量队列：模型训练（LightGBM + Optuna）和结构方程模型拟合等耗时任务
+BULK_QUEUE = "bulk"
+# 报告队列：任务完成后的综合分析报告（模型预测 + 多次 LLM 请求），单个任务可能持续数分钟，
+# 独立于快速队列，避免阻塞图表子任务、汇总和租约巡检
+REPORT_QUEUE = "report"
+
+TASKS_MODULE = 'app.analysis.machine_learing.tasks.celery_tasks'
+
 # 创建 Celery 实例
 celery_app = Celery(
     'edu_feedback_analysis',
     broker=settings.redis_url,
     backend=settings.redis_url,
-    include=['app.analysis.machine_learing.tasks.celery_tasks']
+    include=[TASKS_MODULE]
 )
 
+# 批量队列 Worker 子进程回收方式
+if settings.celery_worker_recycle == "memory":
+    # 子进程常驻，事件循环、数据库连接池和已导入的模块在任务之间复用，常驻内存超过阈值后才重启
+    worker_recycle_conf = {
+        "worker_max_tasks_per_child": None,
+        "worker_max_memory_per_child": settings.celery_worker_max_memory_mb * 1024,  # 单位为 KB
+    }
+else:
+    # 每个worker进程处理完一个任务后重启，防止内存泄漏
+    worker_recycle_conf = {"worker_max_tasks_per_child": 1}
+
+# 各队列 Worker 的启动参数，由 CeleryWorkerManager 为每个队列启动一个 Worker
+QUEUE_WORKER_OPTIONS = {
+    FAST_QUEUE: {
+        "pool": settings.celery_fast_worker_pool,
+        "concurrency": settings.celery_fast_worker_concurrency,
+        # 图表分析耗时短，多预取几条减少往返
+        "prefetch_multiplier": 4,
+        # 图表分析内存占用小，子进程长期复用，按任务数和常驻内存兜底回收
+        "max_tasks_per_child": 1000,
+        "max_memory_per_child": settings.celery_worker_max_memory_mb * 1024,
+    },
+    BULK_QUEUE: {
+        "pool": settings.celery_worker_pool,
+        "concurrency": settings.celery_worker_concurrency,
+        # 训练任务耗时长，一次只取一条，避免消息积压在忙碌的 Worker 上
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": worker_recycle_conf["worker_max_tasks_per_child"],
+        "max_memory_per_child": worker_recycle_conf.get("worker_max_memory_per_child"),
+    },
+    REPORT_QUEUE: {
+        "pool": settings.celery_report_worker_pool,
+        "concurrency": settings.celery_report_worker_concurrency,
+        # 报告耗时长，一次只取一条
+        "prefetch_multiplier": 1,
+        "max_tasks_per_child": 100,
+        "max_memory_per_child": settings.celery_worker_max_memory_mb * 1024,
+    },
+}
+
 # Celery 配置
 celery_app.conf.update(
     task_serializer='json',
@@ -25,18 +77,35 @@ celery_app.conf.update(
     task_time_limit=3600,  # 1小时超时
     task_soft_time_limit=3300,  # 55分钟软超时
     worker_prefetch_multiplier=1,  # 确保一个worker一次只处理一个任务
-    worker_max_tasks_per_child=1,  # 每个worker进程处理完一个任务后重启，防止内存泄漏
     result_expires=3600,  # 结果过期时间（1小时）
     task_acks_late=True,  # 任务完成后才确认
     worker_disable_rate_limits=True,  # 禁用速率限制
     task_compression='gzip',  # 使用gzip压缩任务消息
     result_compression='gzip',  # 使用gzip压缩结果
+    **worker_recycle_conf,
+    task_queues=(Queue(FAST_QUEUE), Queue(BULK_QUEUE), Queue(REPORT_QUEUE)),
+    task_default_queue=FAST_QUEUE,
+    task_routes={
+        # 拆分执行时主任务只做清洗和编排；不拆分时在主任务内训练模型，归入批量队列
+        f'{TASKS_MODULE}.execute_analysis_task': {
+            'queue': FAST_QUEUE if settings.analysis_fan_out else BULK_QUEUE
+        },
+        f'{TASKS_MODULE}.run_model_subtask': {'queue': BULK_QUEUE},
+        # 统计分析子任务默认走快速队列，耗时的分析在分发时按 supported_analyses 中的 queue 指定
+        f'{TASKS_MODULE}.run_analysis_subtask': {'queue': FAST_QUEUE},
+        f'{TASKS_MODULE}.finalize_analysis_task': {'queue': FAST_QUEUE},
+        f'{TASKS_MODULE}.on_analysis_chord_error': {'queue': FAST_QUEUE},
+        # 综合分析报告主要等待 LLM 响应，使用独立的报告队列
+        f'{TASKS_MODULE}.build_comprehensive_report': {'queue': REPORT_QUEUE},
+        f'{TASKS_MODULE}.check_and_execute_pending_tasks': {'queue': FAST_QUEUE},
+    },
 )
 
-# 如果需要，可以在这里定义定时任务
-# celery_app.conf.beat_schedule = {
-#     'check-pending-tasks': {
-#         'task': 'app.analysis.machine_learing.tasks.celery_tasks.check_and_execute_pending_tasks',
-#         'schedule': 300.0,  # 每5分钟执行一次
-#     },
-# }
\ No newline at end of file
+# 定期重新提交租约已失效的任务（Worker 崩溃、消息丢失），由快速队列 Worker 内嵌的 beat 调度
+if settings.analysis_sweep_interval_seconds > 0:
+    celery_app.conf.beat_schedule = {
+        'check-pending-tasks': {
+            'task': f'{TASKS_MODULE}.check_and_execute_pending_tasks',
+            'schedule': float(settings.analysis_sweep_interval_seconds),
+        },
+    }
\ No newline at end of file
@@ -24,6 +24,63 @@ class Settings(BaseSettings):
     project_name: str
     version: str
 
+    # 清洗后 DataFrame 的列式缓存目录（按 Upload.hash + 清洗流程版本号命名）
+    cleaned_data_cache_path: str = "data/processed/cleaned_cache/"
+    # 清洗完成后是否压缩 DataFrame 的数据类型（得分列 float32、人口学列 category、多选列 bool）
+    compact_cleaned_dataframe: bool = False
+    # 统计分析执行方式：serial 为串行，process 为多进程并行（需在 solo 执行池的 Worker 中运行，prefork 子进程中退回串行）
+    analysis_executor: str = "serial"
+    # 并行执行时的进程数，0 表示取 CPU 核数与分析数量中的较小值
+    analysis_max_workers: int = 0
+    # 是否把分析任务拆分为 Celery 子任务（每个模型、每个统计分析一个）并行执行
+    analysis_fan_out: bool = True
+    # 批量队列 Worker 子进程回收方式：per_task 每个任务后重启；memory 常驻内存超过阈值后重启
+    celery_worker_recycle: str = "per_task"
+    # 子进程的常驻内存上限（MB），用于批量队列的 memory 回收方式和快速队列
+    celery_worker_max_memory_mb: int = 2048
+    # 批量队列（模型训练）Worker 执行池：solo 在 Worker 主进程中串行执行；prefork 为多进程。
+    # 任务使用进程内常驻事件循环，不支持 threads（配置为 threads 时改用 solo）
+    celery_worker_pool: str = "solo"
+    # 批量队列 Worker 并发数，0 表示取 CPU 核数（solo 池固定为 1）
+    celery_worker_concurrency: int = 1
+    # 快速队列（统计图表）Worker 执行池和并发数，含义同上
+    celery_fast_worker_pool: str = "solo"
+    celery_fast_worker_concurrency: int = 1
+    # 报告队列（综合分析报告）Worker 执行池和并发数，含义同上
+    celery_report_worker_pool: str = "solo"
+    celery_report_worker_concurrency: int = 1
+    # 本实例为哪些队列启动 Worker（逗号分隔），如分析专用机器只运行 bulk
+    celery_worker_queues: str = "fast,bulk,report"
+    # 启动 Worker 前是否在父进程中预先导入分析和机器学习相关模块，prefork 子进程 fork 后直接复用
+    celery_worker_preload: bool = True
+    # 上传文件、任务配置和分析代码都相同时，新任务是否直接复用已完成任务的结果
+    analysis_result_reuse: bool = True
+    # 是否按 输入数据指纹 + 调用参数 + 源码指纹 缓存单个模型训练和统计分析的结果
+    analysis_memo_enabled: bool = True
+    # 单项结果缓存目录
+    analysis_memo_path: str = "data/processed/analysis_memo/"
+    # 分析任务租约有效期（秒），执行期间每隔三分之一有效期续约，Worker 崩溃后租约到期即可被重新提交
+    analysis_lease_seconds: int = 300
+    # 子任务分发后租约的有效期（秒），需覆盖子任务在队列中的等待时间
+    analysis_lease_dispatch_seconds: int = 3600
+    # 入队标记的有效期（秒），超过该时间仍未开始执行的任务会被巡检重新提交
+    analysis_lease_queued_seconds: int = 3600
+    # 巡检租约失效任务的间隔（秒），0 表示不巡检
+    analysis_sweep_interval_seconds: int = 300
+    # 生成综合分析报告时同时进行的 LLM 总结请求数
+    llm_summary_concurrency: int = 4
+    # 单次 LLM 总结请求的超时时间（秒）
+    llm_summary_timeout_seconds: float = 60.0
+    # LLM 总结请求失败或超时后的重试次数
+    llm_summary_max_retries: int = 2
+    # LLM 总结缓存的有效期（秒），相同模型、提示词、分析类型和数据的总结直接复用；0 表示不缓存
+    llm_summary_cache_ttl_seconds: int = 30 * 24 * 3600
+    # 放入单项 LLM 总结提示词的分析数据 token 上限，超过时按分析类型压缩为摘要
+    llm_summary_token_budget: int = 3000
+    # 是否用一次 LLM 请求生成整份报告的各项点评和整体总结（返回 JSON），失败时退回逐项请求
+    llm_summary_batch_mode: bool = False
+    # 批量总结时所有分析摘要合计的 token 上限，超过时逐项请求
+    llm_summary_batch_token_budget: int = 16000
 
 
     class Config:
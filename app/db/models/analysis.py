@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, BIGINT, JSON
+from sqlalchemy import DateTime, BIGINT, JSON, Index
 from sqlmodel import SQLModel, Field
 from snowflake import SnowflakeGenerator
 from datetime import datetime, timezone
@@ -11,18 +11,34 @@ class AnalysisTask(SQLModel, table=True):
     """
     分析任务表
     """
+    # 任务列表按 (created_at, id) 倒序分页
+    __table_args__ = (Index("ix_analysistask_created_at_id", "created_at", "id"),)
+
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
     data_id: int = Field(foreign_key="upload.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
     status: AnalysisStatusEnum = Field(default=AnalysisStatusEnum.PENDING, index=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
+    updated_at: datetime | None = Field(
+        default_factory=lambda:datetime.now(timezone.utc),
+        nullable=True,
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"onupdate": lambda:datetime.now(timezone.utc)},
+    )
+    completed_at: datetime | None = Field(default=None, nullable=True, sa_type=DateTime(timezone=True))
     summary: str = Field(nullable=True)
+    # 任务结果复用键（上传文件哈希 + 规范化任务配置 + 分析代码指纹）
+    memo_key: str | None = Field(default=None, nullable=True, index=True)
+    # 训练成功的模型和完成的统计分析，任务列表直接读取，不再解析结果文件
+    models_trained: list | None = Field(default=None, nullable=True, sa_type=JSON)
+    analyses_completed: list | None = Field(default=None, nullable=True, sa_type=JSON)
 
 class AcademicMaturityProcessorData(SQLModel, table=True):
     """
     学术成熟度数据处理器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -32,7 +48,8 @@ class CorrelationBasedEHIBuilderData(SQLModel, table=True):
     基于学习关联度的EHI（学习健康指标）构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -42,7 +59,8 @@ class CorrelationBasedRPIBuilderData(SQLModel, table=True):
     基于资源感知度的RPI（资源感知指标）构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -52,7 +70,8 @@ class GroupComparisonRadarChartData(SQLModel, table=True):
     组间比较雷达图构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -62,7 +81,8 @@ class StudentSatisfactionRouteSankeyChartData(SQLModel, table=True):
     学生满意度路径桑基图构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -72,7 +92,8 @@ class StudentTimeAllocationPieChartData(SQLModel, table=True):
     学生时间分配饼图构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -82,7 +103,8 @@ class TeacherStudentInteractionBubbleChartData(SQLModel, table=True):
     教师学生互动气泡图构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -92,7 +114,8 @@ class SatisfactionWholeData(SQLModel, table=True):
     整体满意度分析构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -102,7 +125,8 @@ class SatisfactionPartData(SQLModel, table=True):
     部分满意度分析构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
@@ -112,7 +136,8 @@ class StudentPortraitData(SQLModel, table=True):
     学生画像分析构建器的输出
     """
     id: int = Field(default_factory=lambda:next(snowflake), primary_key=True, sa_type=BIGINT)
-    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, sa_type=BIGINT)
+    # 每个任务一条结果，按 task_id 幂等写入
+    task_id: int = Field(foreign_key="analysistask.id", nullable=False, ondelete="CASCADE", index=True, unique=True, sa_type=BIGINT)
     data: dict = Field(nullable=False, sa_type=JSON)
     comment: str = Field(nullable=True)
     created_at: datetime = Field(default_factory=lambda:datetime.now(timezone.utc), sa_type=DateTime(timezone=True))
\ No newline at end of file
@@ -0,0 +1,21 @@
+from .base import AppException
+
+class AnalysisException(AppException):
+    """分析任务相关异常基类"""
+    pass
+
+class AnalysisCancelledError(AnalysisException):
+    """分析任务已被取消"""
+    def __init__(self, task_id: int | str):
+        super().__init__(
+            message=f"分析任务 {task_id} 已被取消",
+            error_code="ANALYSIS_CANCELLED",
+        )
+
+class AnalysisTaskConflictError(AnalysisException):
+    """相同数据和配置的任务正在由另一个请求创建"""
+    def __init__(self, data_id: int | str):
+        super().__init__(
+            message=f"相同数据和配置的分析任务正在创建，请稍后重试: data_id={data_id}",
+            error_code="ANALYSIS_TASK_CONFLICT",
+        )
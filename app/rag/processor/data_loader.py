@@ -2,59 +2,52 @@ import traceback
 
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, CSVLoader
 from app.core.logging import app_logger
-from app.utils.detect_file_encoding_with_cchardet import detect_file_encoding_with_cchardet
+from app.utils.detect_file_encoding_with_cchardet import detect_file_encoding_with_cchardet, decode_file_with_fallback
 from typing import Any
 
 import docx
 
-def load_documents(file_paths: list[str]) -> list[dict[str, Any]]:
+def load_documents(file_paths: list[str], file_hashes: dict[str, str] | None = None) -> list[dict[str, Any]]:
     """
     加载多种格式的文档。
     返回一个列表，每个元素包含 'page_content' 和 'metadata'。
+
+    file_hashes 为 {文件路径: 内容哈希}，提供时编码检测结果按哈希缓存，重复加载同一内容时跳过检测。
     """
     documents = []
     for file_path in file_paths:
+        file_hash = (file_hashes or {}).get(file_path)
         try:
             if file_path.lower().endswith(".pdf"):
                 loader = PyPDFLoader(file_path)
             elif file_path.lower().endswith(".txt"):
                 # 检测文件编码并使用正确的编码加载文本文件
-                encoding, confidence = detect_file_encoding_with_cchardet(file_path)
+                encoding, confidence = detect_file_encoding_with_cchardet(file_path, file_hash)
                 if encoding and confidence > 0.7:
                     app_logger.info(f"检测到文件 {file_path} 编码为: {encoding} (置信度: {confidence:.2f})")
                     loader = TextLoader(file_path, encoding=encoding)
                 else:
-                    # 如果检测失败，尝试常见编码
-                    for enc in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']:
-                        try:
-                            app_logger.info(f"尝试使用编码 {enc} 加载文件: {file_path}")
-                            loader = TextLoader(file_path, encoding=enc)
-                            loaded_docs = loader.load()
-                            app_logger.info(f"成功使用编码 {enc} 加载文件: {file_path}")
-                            break
-                        except UnicodeDecodeError:
-                            continue
+                    # 如果检测失败，只读取一次文件，在内存中依次尝试常见编码
+                    text, enc = decode_file_with_fallback(file_path, file_hash)
+                    if enc:
+                        app_logger.info(f"成功使用编码 {enc} 加载文件: {file_path}")
                     else:
                         # 如果所有编码都失败，使用默认编码并忽略错误
                         app_logger.warning(f"无法确定文件 {file_path} 的编码，使用默认编码并忽略错误字符")
-                        loader = TextLoader(file_path, encoding='utf-8', encoding_errors='ignore')
+                    documents.append({"page_content": text, "metadata": {"source": file_path}})
+                    continue
             elif file_path.lower().endswith(".csv"):
                 # CSV文件也需要处理编码问题
-                encoding, confidence = detect_file_encoding_with_cchardet(file_path)
+                encoding, confidence = detect_file_encoding_with_cchardet(file_path, file_hash)
                 if encoding and confidence > 0.7:
                     app_logger.info(f"检测到CSV文件 {file_path} 编码为: {encoding} (置信度: {confidence:.2f})")
                     loader = CSVLoader(file_path, encoding=encoding)
                 else:
-                    # 如果检测失败，尝试常见编码
-                    for enc in ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']:
-                        try:
-                            app_logger.info(f"尝试使用编码 {enc} 加载CSV文件: {file_path}")
-                            loader = CSVLoader(file_path, encoding=enc)
-                            loaded_docs = loader.load()
-                            app_logger.info(f"成功使用编码 {enc} 加载CSV文件: {file_path}")
-                            break
-                        except UnicodeDecodeError:
-                            continue
+                    # 如果检测失败，只读取一次文件，在内存中依次尝试常见编码
+                    _, enc = decode_file_with_fallback(file_path, file_hash)
+                    if enc:
+                        app_logger.info(f"成功使用编码 {enc} 加载CSV文件: {file_path}")
+                        loader = CSVLoader(file_path, encoding=enc)
                     else:
                         # 如果所有编码都失败，使用默认编码并忽略错误
                         app_logger.warning(f"无法确定CSV文件 {file_path} 的编码，使用默认编码并忽略错误字符")
@@ -3,7 +3,7 @@
 定义API请求和响应的数据结构
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -24,6 +24,24 @@ class AnalysisMetaData(BaseModel):
     dataid: str = Field(..., description="数据ID")
     status: AnalysisStatusEnum = Field(..., description="任务状态")
 
+class AnalysisTaskSummary(BaseModel):
+    """任务列表中的一项"""
+    taskid: str = Field(..., description="任务ID")
+    dataid: str = Field(..., description="数据ID")
+    status: AnalysisStatusEnum = Field(..., description="任务状态")
+    created_at: datetime = Field(..., description="创建时间")
+    updated_at: datetime | None = Field(None, description="最后更新时间")
+    completed_at: datetime | None = Field(None, description="完成时间")
+    models_trained: List[str] = Field(default_factory=list, description="训练成功的模型")
+    analyses_completed: List[str] = Field(default_factory=list, description="完成的统计分析")
+
+class AnalysisTaskPage(BaseModel):
+    """任务列表分页响应"""
+    tasks: List[AnalysisTaskSummary] = Field(..., description="当前页的任务")
+    total: int = Field(..., description="符合筛选条件的任务总数")
+    limit: int = Field(..., description="每页数量")
+    next_cursor: str | None = Field(None, description="下一页游标，没有下一页时为空")
+
 class AnalysisTaskStatusResponse(BaseModel):
     """分析任务状态响应"""
     taskid: str = Field(..., description="任务ID")
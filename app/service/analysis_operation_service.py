@@ -3,17 +3,38 @@
 提供分析任务的创建、执行和管理功能
 """
 
+import asyncio
+import base64
+import json
+from datetime import datetime
+
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 
+from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.logging import app_logger
 from app.analysis.machine_learing.core.analysis_task_manager import AnalysisTaskManager
-from app.analysis.machine_learing.tasks.celery_tasks import execute_analysis_task
+from app.analysis.machine_learing.core.task_artifact import COMPREHENSIVE_ANALYSIS, RESULTS
+from app.analysis.machine_learing.tasks.celery_tasks import enqueue_analysis_task, enqueue_report_build
+from app.db.models import Upload
 from app.db.models.analysis import AnalysisTask
 from app.enum.enums import AnalysisStatusEnum
+from app.exception.exceptions.analysis import AnalysisTaskConflictError
+from app.schemas.analysis import AnalysisTaskPage, AnalysisTaskSummary
+from app.utils.etag import etag_matches, make_etag
+from app.utils.json_utils import json_default
+from app.utils.redis_client import async_redis_client
+from app.utils.report_status import FAILED, GENERATING, UNAVAILABLE, clear_report_status, get_report_status
+from app.utils.task_cancellation import clear_cancel, get_celery_ids, request_cancel
+from app.utils.task_progress import publish_progress
+from sqlalchemy import func, tuple_
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 
+# 创建任务期间持有的单飞锁，任务提交到数据库后由任务记录本身表示“执行中”
+MEMO_LOCK_TTL_SECONDS = 30
+
 
 class AnalysisService:
     """分析任务服务类"""
@@ -43,32 +64,156 @@ class AnalysisService:
             description: 任务描述
             
         Returns:
-            创建的分析任务对象
+            创建的分析任务对象；相同数据和配置的任务已完成或正在执行时返回复用的任务
+
+        Raises:
+            AnalysisTaskConflictError: 相同数据和配置的任务正由另一个请求创建
         """
         app_logger.info(f"创建分析任务: data_id={data_id}")
 
         self.task_manager.db = session
-        
-        # 创建分析任务记录
-        task = await self.task_manager.create_analysis_task(
-            data_id=data_id,
-            models_to_train=models_to_train,
-            analyses_to_run=analyses_to_run,
-            target_column=target_column,
-            feature_score_threshold=feature_score_threshold,
-            db=session
-        )
-        
-        # 保存任务到数据库
-        session.add(task)
-        await session.commit()
-        await session.refresh(task)
-        
+        task_options = {
+            "models_to_train": models_to_train,
+            "analyses_to_run": analyses_to_run,
+            "target_column": target_column,
+            "feature_score_threshold": feature_score_threshold,
+        }
+
+        memo_key = None
+        upload = await session.get(Upload, data_id)
+        if settings.analysis_result_reuse and upload is not None:
+            memo_key = self.task_manager.compute_memo_key(
+                upload.hash, self.task_manager.build_task_config(**task_options)
+            )
+
+        lock_key = None
+        if memo_key:
+            # 相同数据和配置已有完成的任务：新任务直接复用其结果
+            task = await self._reuse_completed_task(session, data_id, memo_key, task_options)
+            if task is not None:
+                return task
+
+            # 相同数据和配置的任务正在执行：返回该任务，不再重复排队
+            task = await self._find_inflight_task(session, memo_key)
+            if task is not None:
+                app_logger.info(f"相同数据和配置的任务正在执行，复用任务: task_id={task.id}")
+                return task
+
+            lock_key = await self._acquire_memo_lock(memo_key)
+            if lock_key is None:
+                # 另一个请求正在创建相同的任务，不在请求中等待：已提交则返回该任务，否则由调用方返回 409
+                task = await self._find_inflight_task(session, memo_key)
+                if task is not None:
+                    return task
+                raise AnalysisTaskConflictError(data_id)
+
+        try:
+            # 创建分析任务记录
+            task = await self.task_manager.create_analysis_task(
+                data_id=data_id,
+                db=session,
+                memo_key=memo_key,
+                **task_options,
+            )
+
+            # 保存任务到数据库
+            session.add(task)
+            await session.commit()
+            await session.refresh(task)
+        finally:
+            if lock_key is not None:
+                await self._release_memo_lock(lock_key)
+
         # 将任务加入队列
-        execute_analysis_task.delay(task.id, data_id)
+        enqueue_analysis_task(task.id, data_id)
         
         app_logger.info(f"分析任务已创建并加入队列: task_id={task.id}")
         return task
+
+    async def _reuse_completed_task(
+        self,
+        session: AsyncSession,
+        data_id: int,
+        memo_key: str,
+        task_options: Dict[str, Any],
+    ) -> AnalysisTask | None:
+        """
+        查找结果可复用的已完成任务，找到时创建一个直接完成的新任务并链接其产物
+
+        Returns:
+            新创建的任务，没有可复用的任务时返回 None
+        """
+        statement = (
+            select(AnalysisTask)
+            .where(AnalysisTask.memo_key == memo_key)
+            .where(AnalysisTask.status == AnalysisStatusEnum.COMPLETED)
+            .order_by(AnalysisTask.created_at.desc())
+        )
+        result = await session.execute(statement)
+
+        for source_task in result.scalars().all():
+            results = self.task_manager.load_reusable_results(str(source_task.id))
+            if results is None:
+                continue
+
+            task = await self.task_manager.create_analysis_task(
+                data_id=data_id,
+                db=session,
+                memo_key=memo_key,
+                **task_options,
+            )
+            results = self.task_manager.link_task_artifacts(str(source_task.id), str(task.id), results)
+
+            task.status = AnalysisStatusEnum.COMPLETED
+            task.summary = json.dumps(results, ensure_ascii=False, default=json_default)
+            self.task_manager.analysis_service.record_task_result(task, results["task_info"])
+            await session.commit()
+            await session.refresh(task)
+            # 综合分析报告与任务绑定，不复用，为新任务重新生成
+            enqueue_report_build(task.id)
+
+            app_logger.info(f"分析任务已创建并复用已有结果: task_id={task.id}, source_task_id={source_task.id}")
+            return task
+
+        return None
+
+    async def _find_inflight_task(self, session: AsyncSession, memo_key: str) -> AnalysisTask | None:
+        """查找相同复用键的待处理或运行中的任务"""
+        statement = (
+            select(AnalysisTask)
+            .where(AnalysisTask.memo_key == memo_key)
+            .where(AnalysisTask.status.in_([AnalysisStatusEnum.PENDING, AnalysisStatusEnum.PROCESSING]))
+            .order_by(AnalysisTask.created_at)
+            .limit(1)
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def _acquire_memo_lock(memo_key: str) -> str | None:
+        """
+        获取创建任务的单飞锁
+
+        Redis 不可用时视为获取成功，只是失去并发去重能力
+
+        Returns:
+            锁的键名，锁已被其它请求持有时返回 None
+        """
+        lock_key = f"analysis_memo_lock:{memo_key}"
+        try:
+            if await async_redis_client.set(lock_key, "1", nx=True, ex=MEMO_LOCK_TTL_SECONDS):
+                return lock_key
+            return None
+        except Exception as e:
+            app_logger.warning(f"获取任务单飞锁失败，跳过并发去重: {str(e)}")
+            return lock_key
+
+    @staticmethod
+    async def _release_memo_lock(lock_key: str) -> None:
+        try:
+            await async_redis_client.delete(lock_key)
+        except Exception as e:
+            app_logger.warning(f"释放任务单飞锁失败: {str(e)}")
     
     async def get_task_status(self, session: AsyncSession, task_id: int) -> Dict[str, Any]:
         """
@@ -127,6 +272,103 @@ class AnalysisService:
                 "error": "结果文件不存在",
             }
     
+    async def get_comprehensive_report(self, task_id: int, accept_encoding: str | None = None) -> Dict[str, Any]:
+        """
+        读取任务完成后在后台生成的综合分析报告（不在请求中生成）
+
+        报告已生成时返回预序列化的响应文件，按 Accept-Encoding 选择压缩版本；
+        响应文件既不存在也没有生成状态时（如本功能上线前完成的任务、Worker 崩溃）提交后台任务生成或补写；
+        生成失败的状态只返回一次，下次请求时重新生成。
+        读取状态和提交生成需要访问 Redis 和 Broker，在线程池中执行
+
+        Args:
+            task_id: 任务ID（任务须已完成）
+            accept_encoding: 请求头 Accept-Encoding
+
+        Returns:
+            {"status": "ready", "path": 响应文件, "encoding": Content-Encoding 或 None}、
+            {"status": "generating"} 或 {"status": "failed", "error": ...}
+        """
+        return await asyncio.to_thread(self._resolve_comprehensive_report, task_id, accept_encoding)
+
+    def _resolve_comprehensive_report(self, task_id: int, accept_encoding: str | None) -> Dict[str, Any]:
+        """get_comprehensive_report 的同步实现"""
+        try:
+            path, encoding = self.task_manager.get_report_blob(str(task_id), accept_encoding)
+            return {"status": "ready", "path": path, "encoding": encoding}
+        except FileNotFoundError:
+            pass
+
+        report_status = get_report_status(task_id)
+        if report_status is not None and report_status["status"] == FAILED:
+            clear_report_status(task_id)
+            return report_status
+
+        # 只在确认没有生成状态时提交；Redis 不可用时无法去重，不随每次轮询重复提交
+        if report_status is None:
+            enqueue_report_build(task_id)
+        elif report_status["status"] == UNAVAILABLE:
+            app_logger.warning(f"无法读取任务 {task_id} 的报告生成状态，暂不提交报告生成")
+        return {"status": GENERATING}
+
+    async def get_chart_result(
+        self, session: AsyncSession, task_id: int, name: str, if_none_match: str | None = None
+    ) -> Tuple[str, Dict[str, Any] | None]:
+        """
+        读取任务中单个图表（统计分析或模型预测）的结果
+
+        统计分析读取对应结果表中该任务的一条记录（含 AI 总结），报告尚未写入数据库时读取任务结果文件中的对应分段；
+        模型预测读取综合分析报告中的对应分段。ETag 只由记录 ID 和写入时间或文件版本计算，
+        与 If-None-Match 一致时不读取结果本身
+
+        Args:
+            session: 数据库会话
+            task_id: 任务ID（任务须已完成）
+            name: 统计分析或模型名称
+            if_none_match: 请求头 If-None-Match
+
+        Returns:
+            (ETag, {"name": ..., "data": ..., "comment": ...})；结果未变化时第二项为 None
+
+        Raises:
+            ValueError: 不支持的分析或模型名称
+            FileNotFoundError: 结果尚未生成或任务没有该项结果
+        """
+        table = self.task_manager.db_map.get(name)
+        if table is not None:
+            row = (await session.execute(
+                select(table.id, table.created_at).where(table.task_id == task_id)
+            )).first()
+            if row is not None:
+                etag = make_etag(task_id, name, row.id, row.created_at.isoformat())
+                if etag_matches(if_none_match, etag):
+                    return etag, None
+                record = await session.get(table, row.id)
+                return etag, {"name": name, "data": record.data, "comment": record.comment}
+            source = RESULTS
+        elif name in self.task_manager.supported_models:
+            source = COMPREHENSIVE_ANALYSIS
+        else:
+            raise ValueError(f"不支持的分析: {name}")
+
+        version = self.task_manager.get_artifact_version(str(task_id), source)
+        if version is None:
+            raise FileNotFoundError(f"任务 {task_id} 的结果尚未生成")
+        etag = make_etag(task_id, name, source, version)
+        if etag_matches(if_none_match, etag):
+            return etag, None
+
+        if source == RESULTS:
+            entry = self.task_manager.get_analysis_result(str(task_id), name)
+            if entry is None:
+                raise FileNotFoundError(f"任务 {task_id} 没有 {name} 的结果")
+            return etag, {"name": name, "data": entry.get("result", {}), "comment": None}
+
+        prediction = self.task_manager.get_model_prediction(str(task_id), name)
+        if prediction is None:
+            raise FileNotFoundError(f"任务 {task_id} 没有 {name} 的结果")
+        return etag, {"name": name, "data": prediction, "comment": prediction.get("comment")}
+
     async def generate_comprehensive_analysis(
         self,
         session: AsyncSession,
@@ -164,59 +406,97 @@ class AnalysisService:
         self,
         session: AsyncSession,
         limit: int = 10,
-        offset: int = 0,
-        status: str = None,
-    ) -> Dict[str, Any]:
+        cursor: str = None,
+        status: AnalysisStatusEnum = None,
+        data_id: int = None,
+    ) -> AnalysisTaskPage:
         """
-        列出分析任务
-        
+        列出分析任务，按创建时间倒序游标分页
+
+        只查询任务列表需要的列，结果文件和任务摘要都不读取；
+        游标为上一页最后一条任务的 (created_at, id)，翻页代价与页码无关
+
         Args:
             session: 数据库会话
-            limit: 限制返回数量
-            offset: 偏移量
+            limit: 每页数量
+            cursor: 上一页返回的 next_cursor，为 None 时从最新的任务开始
             status: 状态筛选
-            
+            data_id: 数据ID筛选
+
         Returns:
-            任务列表和总数
+            任务列表、符合条件的任务总数和下一页游标
         """
-        # 构建查询
-        statement = select(AnalysisTask)
-        
-        if status:
-            statement = statement.where(AnalysisTask.status == status)
-        
-        # 获取总数
-        count_statement = select(AnalysisTask)
+        filters = []
         if status:
-            count_statement = count_statement.where(AnalysisTask.status == status)
-        
-        count_result = await session.execute(count_statement)
-        total = len(count_result.scalars().all())
-        
-        # 应用分页
-        statement = statement.offset(offset).limit(limit).order_by(AnalysisTask.created_at.desc())
-        result = await session.execute(statement)
-        tasks = result.scalars().all()
-        
-        # 转换为字典格式
-        task_list = []
-        for task in tasks:
-            task_list.append({
-                "task_id": task.id,
-                "data_id": task.data_id,
-                "status": task.status,
-                "summary": task.summary,
-                "created_at": task.created_at,
-                "updated_at": task.updated_at,
-            })
-        
-        return {
-            "tasks": task_list,
-            "total": total,
-            "limit": limit,
-            "offset": offset,
-        }
-    
+            filters.append(AnalysisTask.status == status)
+        if data_id is not None:
+            filters.append(AnalysisTask.data_id == data_id)
+
+        count_statement = select(func.count()).select_from(AnalysisTask)
+        for condition in filters:
+            count_statement = count_statement.where(condition)
+        total = (await session.execute(count_statement)).scalar_one()
+
+        statement = select(
+            AnalysisTask.id,
+            AnalysisTask.data_id,
+            AnalysisTask.status,
+            AnalysisTask.created_at,
+            AnalysisTask.updated_at,
+            AnalysisTask.completed_at,
+            AnalysisTask.models_trained,
+            AnalysisTask.analyses_completed,
+        )
+        for condition in filters:
+            statement = statement.where(condition)
+        if cursor:
+            created_at, task_id = self._decode_cursor(cursor)
+            statement = statement.where(
+                tuple_(AnalysisTask.created_at, AnalysisTask.id) < tuple_(created_at, task_id)
+            )
+        # 多取一条判断是否还有下一页
+        statement = statement.order_by(AnalysisTask.created_at.desc(), AnalysisTask.id.desc()).limit(limit + 1)
+        rows = (await session.execute(statement)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return AnalysisTaskPage(
+            tasks=[
+                AnalysisTaskSummary(
+                    taskid=str(row.id),
+                    dataid=str(row.data_id),
+                    status=row.status,
+                    created_at=row.created_at,
+                    updated_at=row.updated_at,
+                    completed_at=row.completed_at,
+                    models_trained=row.models_trained or [],
+                    analyses_completed=row.analyses_completed or [],
+                )
+                for row in rows
+            ],
+            total=total,
+            limit=limit,
+            next_cursor=next_cursor,
+        )
+
+    @staticmethod
+    def _encode_cursor(created_at: datetime, task_id: int) -> str:
+        """把分页位置编码为不透明的游标字符串"""
+        raw = f"{created_at.isoformat()}|{task_id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+        """解析游标，格式不正确时抛出 ValueError"""
+        try:
+            created_at, task_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            return datetime.fromisoformat(created_at), int(task_id)
+        except (ValueError, UnicodeError) as e:
+            raise ValueError(f"无效的分页游标: {cursor}") from e
+
     async def cancel_task(self, session: AsyncSession, task_id: int) -> bool:
         """
         取消任务
@@ -239,15 +519,38 @@ class AnalysisService:
         if task.status in [AnalysisStatusEnum.PENDING, AnalysisStatusEnum.PROCESSING]:
             task.status = AnalysisStatusEnum.CANCELLED
             await session.commit()
-            
-            # 这里可以添加取消Celery任务的逻辑
-            # 例如：celery_app.control.revoke(task_id, terminate=True)
-            
-            app_logger.info(f"任务已取消: {task_id}")
+
+            # 撤销消息需要访问 Broker，清理产物是文件操作，都放到线程池中执行，不阻塞事件循环
+            celery_ids = await asyncio.to_thread(self._revoke_and_cleanup, task_id)
+
+            app_logger.info(f"任务已取消: {task_id}, 撤销 Celery 任务 {len(celery_ids)} 个")
             return True
         
         return False
     
+    def _revoke_and_cleanup(self, task_id: int) -> List[str]:
+        """
+        设置取消标记、撤销已登记的 Celery 任务、清理已生成的产物并发布取消进度（同步执行，会访问 Redis、Broker 和文件系统）
+
+        Returns:
+            撤销的 Celery 任务ID
+        """
+        # 正在运行的 Worker 在下一个检查点读到取消标记后停止
+        request_cancel(task_id)
+
+        # 撤销仍在排队的消息；不强制终止正在运行的任务，solo 执行池中会连同 Worker 进程一起终止
+        celery_ids = get_celery_ids(task_id)
+        if celery_ids:
+            try:
+                celery_app.control.revoke(celery_ids)
+            except Exception as e:
+                # 数据库中已标记为取消，Worker 仍会在检查点读到取消标记后停止
+                app_logger.warning(f"撤销任务 {task_id} 的 Celery 任务失败: {str(e)}")
+
+        self.task_manager.cleanup_task_artifacts(str(task_id))
+        publish_progress(task_id, "cancelled")
+        return celery_ids
+
     async def retry_task(self, session: AsyncSession, task_id: int) -> AnalysisTask:
         """
         重试失败的任务
@@ -274,9 +577,12 @@ class AnalysisService:
         task.status = AnalysisStatusEnum.PENDING
         task.summary = ""
         await session.commit()
-        
+
+        # 清除上一次执行遗留的取消标记和 Celery 任务ID，避免新提交的任务在第一个检查点即被停止、取消时撤销已结束的旧任务
+        await asyncio.to_thread(clear_cancel, task_id)
+
         # 重新加入队列
-        execute_analysis_task.delay(task.id, task.data_id)
+        enqueue_analysis_task(task.id, task.data_id)
         
         app_logger.info(f"任务已重试: {task_id}")
         return task
@@ -1,13 +1,15 @@
-from typing import List
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple, Type
 
 from nbclient.client import timestamp
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlmodel import select
+from sqlmodel import SQLModel, select
 from win32timezone import utcnow
 
 from app.db.models import Upload
 from app.enum.enums import AnalysisStatusEnum
-from app.db.models.analysis import AnalysisTask
+from app.db.models.analysis import AnalysisTask, snowflake
 from app.schemas.analysis import (
     AnalysisMetaData,
     AnalysisTaskStatusResponse,
@@ -35,6 +37,53 @@ class AnalysisService:
         ) for task in tasks]
         return tasks
 
+    @staticmethod
+    def record_task_result(task: AnalysisTask, task_info: Dict[str, Any]) -> None:
+        """
+        把任务结果中的任务信息写入任务记录，任务列表直接查询数据库，不再读取结果文件
+        """
+        task.completed_at = datetime.now(timezone.utc)
+        task.models_trained = task_info.get("models_trained", [])
+        task.analyses_completed = task_info.get("analyses_completed", [])
+
+    @staticmethod
+    async def save_analysis_results(
+        db: AsyncSession, task_id: int, rows: List[Tuple[Type[SQLModel], Dict[str, Any], str]]
+    ) -> None:
+        """
+        在一个事务中写入任务的各项分析结果（每张结果表一条）
+
+        按 task_id 插入或覆盖，重新生成报告或任务重试时不会产生重复记录；任一条写入失败时全部回滚
+
+        Args:
+            db: 数据库会话
+            task_id: 任务ID
+            rows: (结果表, 结果数据, AI总结) 列表
+        """
+        created_at = datetime.now(timezone.utc)
+        try:
+            for table, data, comment in rows:
+                statement = pg_insert(table).values(
+                    id=next(snowflake),
+                    task_id=task_id,
+                    data=data,
+                    comment=comment,
+                    created_at=created_at,
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=["task_id"],
+                    set_={
+                        "data": statement.excluded.data,
+                        "comment": statement.excluded.comment,
+                        "created_at": statement.excluded.created_at,
+                    },
+                )
+                await db.execute(statement)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
     async def check_data_file_exists(self, data_id: int, db: AsyncSession) -> bool:
         """
         检查数据文件是否存在
@@ -44,14 +93,15 @@ class AnalysisService:
         upload = result.scalar_one_or_none()
         return upload is not None
 
-    async def create_analysis_task(self, data_id: int, db: AsyncSession) -> AnalysisTask:
+    async def create_analysis_task(self, data_id: int, db: AsyncSession, memo_key: str = None) -> AnalysisTask:
         """
         创建分析任务
         """
         task = AnalysisTask(
             data_id=data_id,
             status=AnalysisStatusEnum.PENDING,
-            summary=""
+            summary="",
+            memo_key=memo_key,
         )
         db.add(task)
         await db.commit()
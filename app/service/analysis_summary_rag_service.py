@@ -1,9 +1,19 @@
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema.output_parser import StrOutputParser
 from app.rag.model.chat_model import get_chat_model
+from app.core.config import settings
 from app.core.logging import app_logger
+from app.utils.json_utils import json_default
+from app.utils.llm_payload import compact_for_summary, count_tokens, dumps_payload
+from app.utils.redis_client import async_redis_client
+
+# 总结缓存的键前缀和命中统计（Redis 哈希，hits / misses 两个计数）
+SUMMARY_CACHE_PREFIX = "llm_summary"
+SUMMARY_CACHE_STATS_KEY = "llm_summary:stats"
 
 class AnalysisSummaryRAGService:
     """
@@ -12,6 +22,8 @@ class AnalysisSummaryRAGService:
     
     def __init__(self):
         self.llm = get_chat_model(streaming=False)
+        # 限制异步总结的并发请求数
+        self._semaphore = asyncio.Semaphore(max(settings.llm_summary_concurrency, 1))
         self._init_prompt_templates()
     
     def _init_prompt_templates(self):
@@ -82,6 +94,22 @@ class AnalysisSummaryRAGService:
 
         综合总结：
         """
+
+        # 批量总结模板：一次请求生成各项分析的点评和整体总结，以 JSON 返回
+        self.batch_report_template = """
+        你是一位教育数据分析专家，请对以下分析报告中的每一项结果分别进行专业点评，并给出整体总结：
+
+        需要点评的分析项：{analysis_names}
+        模型预测结果：{model_predictions}
+        统计分析结果：{statistical_analyses}
+
+        每一项的点评包括关键发现、主要趋势和对教育实践的建议，字数控制在150-250字之间；
+        整体总结概括各项结果的关联性和一致性，提出对教育质量提升的综合性建议，字数控制在300-400字之间。
+
+        请只返回如下格式的 JSON，不要添加其他内容：
+        {{"comments": {{"分析项名称": "点评"}}, "overall_summary": "整体总结"}}
+        其中 comments 必须包含上面列出的每一个分析项
+        """
     
     def summarize_model_prediction(self, analysis_type: str, prediction_data: Dict[str, Any]) -> str:
         """
@@ -177,6 +205,157 @@ class AnalysisSummaryRAGService:
             app_logger.error(f"生成综合分析总结失败: {str(e)}")
             return f"总结生成失败: {str(e)}"
     
+    async def _ainvoke_summary(self, template: str, inputs: Dict[str, Any], label: str) -> str:
+        """
+        异步调用 LLM 生成总结
+
+        同一服务实例内同时进行的请求数受 llm_summary_concurrency 限制；
+        每次请求有超时，失败或超时后按指数退避重试
+
+        Args:
+            template: 提示词模板
+            inputs: 模板参数
+            label: 日志中的总结名称
+
+        Returns:
+            AI生成的总结文本
+
+        Raises:
+            最后一次重试仍失败时的异常
+        """
+        chain = ChatPromptTemplate.from_template(template) | self.llm | StrOutputParser()
+        attempts = settings.llm_summary_max_retries + 1
+        async with self._semaphore:
+            for attempt in range(1, attempts + 1):
+                try:
+                    return await asyncio.wait_for(
+                        chain.ainvoke(inputs), timeout=settings.llm_summary_timeout_seconds
+                    )
+                except Exception as e:
+                    if attempt == attempts:
+                        raise
+                    reason = "超时" if isinstance(e, asyncio.TimeoutError) else str(e)
+                    app_logger.warning(f"{label} 的AI总结第 {attempt} 次请求失败，稍后重试: {reason}")
+                    await asyncio.sleep(2 ** (attempt - 1))
+
+    @staticmethod
+    def _summary_cache_key(template: str, analysis_type: str, data: Dict[str, Any]) -> str:
+        """
+        计算总结缓存键：LLM 模型名、提示词模板指纹、分析类型和规范化后的数据哈希
+
+        修改提示词模板或更换模型后旧的总结自动失效
+        """
+        payload = json.dumps(
+            {
+                "model": settings.llm_model_name,
+                "template": hashlib.sha256(template.encode("utf-8")).hexdigest(),
+                "analysis_type": analysis_type,
+                "data": data,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+            default=json_default,
+        )
+        return f"{SUMMARY_CACHE_PREFIX}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    # 缓存读写在并发的总结协程中进行，使用异步客户端，不阻塞事件循环
+
+    @staticmethod
+    async def _get_cached_summary(cache_key: str) -> str | None:
+        """读取缓存的总结，Redis 不可用时视为未命中"""
+        try:
+            cached = await async_redis_client.get(cache_key)
+        except Exception as e:
+            app_logger.warning(f"读取AI总结缓存失败: {str(e)}")
+            return None
+        return cached.decode("utf-8") if cached is not None else None
+
+    @staticmethod
+    async def _record_cache_lookup(hit: bool) -> None:
+        """记录一次缓存命中或未命中"""
+        try:
+            await async_redis_client.hincrby(SUMMARY_CACHE_STATS_KEY, "hits" if hit else "misses", 1)
+        except Exception as e:
+            app_logger.warning(f"记录AI总结缓存命中统计失败: {str(e)}")
+
+    @staticmethod
+    async def _set_cached_summary(cache_key: str, summary: str) -> None:
+        """缓存生成成功的总结，写入失败只记录警告"""
+        try:
+            await async_redis_client.set(
+                cache_key, summary.encode("utf-8"), ex=settings.llm_summary_cache_ttl_seconds
+            )
+        except Exception as e:
+            app_logger.warning(f"写入AI总结缓存失败: {str(e)}")
+
+    @staticmethod
+    async def get_summary_cache_stats() -> Dict[str, Any]:
+        """
+        总结缓存的累计命中统计
+
+        Returns:
+            {"hits": 命中次数, "misses": 未命中次数, "hit_rate": 命中率}
+        """
+        stats = await async_redis_client.hgetall(SUMMARY_CACHE_STATS_KEY)
+        hits = int(stats.get(b"hits", 0))
+        misses = int(stats.get(b"misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+
+    @staticmethod
+    def _compact_payload(analysis_type: str, data: Dict[str, Any], label: str) -> Any:
+        """把分析结果压缩到 llm_summary_token_budget 以内，并记录压缩前后的 token 数"""
+        digest, original_tokens, digest_tokens = compact_for_summary(
+            analysis_type, data, settings.llm_summary_token_budget
+        )
+        if digest_tokens < original_tokens:
+            app_logger.info(
+                f"{label} 的总结数据由 {original_tokens} tokens 压缩为 {digest_tokens} tokens，"
+                f"节省 {original_tokens - digest_tokens} tokens"
+            )
+        return digest
+
+    async def _cached_summary(
+        self,
+        template: str,
+        analysis_type: str,
+        data: Dict[str, Any],
+        inputs: Dict[str, Any],
+        label: str,
+        parse: Optional[Callable[[str], Any]] = None,
+    ) -> Any:
+        """
+        带缓存的异步总结：相同的模型、提示词、分析类型和数据直接返回上次生成的总结
+
+        只缓存生成成功的总结；关闭缓存（llm_summary_cache_ttl_seconds 为 0）时直接请求 LLM。
+        指定 parse 时返回解析后的结果，解析失败的输出不写入缓存，缓存中无法解析的内容视为未命中
+        """
+        parse = parse or (lambda text: text)
+        if settings.llm_summary_cache_ttl_seconds <= 0:
+            return parse(await self._ainvoke_summary(template, inputs, label))
+
+        cache_key = self._summary_cache_key(template, analysis_type, data)
+        cached = await self._get_cached_summary(cache_key)
+        if cached is not None:
+            try:
+                result = parse(cached)
+            except Exception as e:
+                app_logger.warning(f"{label} 的缓存内容无法解析，重新生成: {str(e)}")
+            else:
+                await self._record_cache_lookup(hit=True)
+                app_logger.info(f"{label} 的AI总结命中缓存")
+                return result
+        # 没有缓存或缓存内容无法解析都记为未命中
+        await self._record_cache_lookup(hit=False)
+
+        summary = await self._ainvoke_summary(template, inputs, label)
+        result = parse(summary)
+        await self._set_cached_summary(cache_key, summary)
+        return result
+
     async def summarize_model_prediction_async(self, analysis_type: str, prediction_data: Dict[str, Any]) -> str:
         """
         异步对模型预测结果进行总结
@@ -189,18 +368,18 @@ class AnalysisSummaryRAGService:
             AI生成的总结文本
         """
         try:
-            llm_async = get_chat_model(streaming=False)
-            prompt = ChatPromptTemplate.from_template(self.model_prediction_template)
-            chain = prompt | llm_async | StrOutputParser()
-            
-            # 将数据转换为JSON字符串以便在提示词中使用
-            prediction_json = json.dumps(prediction_data, ensure_ascii=False, indent=2)
-            
-            summary = await chain.ainvoke({
-                "analysis_type": analysis_type,
-                "prediction_data": prediction_json
-            })
-            
+            label = f"模型预测 {analysis_type}"
+            # 压缩为有限大小的摘要后转换为JSON字符串，缓存键也按摘要计算
+            digest = self._compact_payload(analysis_type, prediction_data, label)
+
+            summary = await self._cached_summary(
+                self.model_prediction_template,
+                analysis_type,
+                digest,
+                {"analysis_type": analysis_type, "prediction_data": dumps_payload(digest)},
+                label,
+            )
+
             app_logger.info(f"模型预测 {analysis_type} 的AI总结生成完成（异步）")
             return summary
             
@@ -220,21 +399,136 @@ class AnalysisSummaryRAGService:
             AI生成的总结文本
         """
         try:
-            llm_async = get_chat_model(streaming=False)
-            prompt = ChatPromptTemplate.from_template(self.statistical_analysis_template)
-            chain = prompt | llm_async | StrOutputParser()
-            
-            # 将数据转换为JSON字符串以便在提示词中使用
-            analysis_json = json.dumps(analysis_data, ensure_ascii=False, indent=2)
-            
-            summary = await chain.ainvoke({
-                "analysis_type": analysis_type,
-                "analysis_data": analysis_json
-            })
-            
+            label = f"统计分析 {analysis_type}"
+            # 压缩为有限大小的摘要后转换为JSON字符串，缓存键也按摘要计算
+            digest = self._compact_payload(analysis_type, analysis_data, label)
+
+            summary = await self._cached_summary(
+                self.statistical_analysis_template,
+                analysis_type,
+                digest,
+                {"analysis_type": analysis_type, "analysis_data": dumps_payload(digest)},
+                label,
+            )
+
             app_logger.info(f"统计分析 {analysis_type} 的AI总结生成完成（异步）")
             return summary
             
         except Exception as e:
             app_logger.error(f"生成统计分析总结失败（异步）: {str(e)}")
-            return f"总结生成失败: {str(e)}"
\ No newline at end of file
+            return f"总结生成失败: {str(e)}"
+
+    @staticmethod
+    def _parse_batch_summary(text: str, names: List[str]) -> Tuple[Dict[str, str], str]:
+        """
+        解析批量总结返回的 JSON
+
+        Raises:
+            ValueError: 不是 JSON 对象，或缺少某一项点评、整体总结
+        """
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("批量总结的返回内容不是 JSON 对象")
+        result = json.loads(text[start:end + 1])
+
+        comments = result.get("comments") or {}
+        missing = [name for name in names if not isinstance(comments.get(name), str) or not comments[name].strip()]
+        if missing:
+            raise ValueError(f"批量总结缺少以下分析项的点评: {', '.join(missing)}")
+        overall_summary = result.get("overall_summary")
+        if not isinstance(overall_summary, str) or not overall_summary.strip():
+            raise ValueError("批量总结缺少整体总结")
+        return {name: comments[name] for name in names}, overall_summary
+
+    async def _summarize_report_batched(
+        self, task_id: str, model_predictions: Dict[str, Any], statistical_analyses: Dict[str, Any]
+    ) -> Optional[Tuple[Dict[str, str], str]]:
+        """
+        用一次 LLM 请求生成整份报告的各项点评和整体总结
+
+        Returns:
+            (各项点评, 整体总结)；摘要合计超过 llm_summary_batch_token_budget、请求失败或返回内容不完整时返回 None
+        """
+        model_digests = {
+            name: self._compact_payload(name, data, f"模型预测 {name}") for name, data in model_predictions.items()
+        }
+        analysis_digests = {
+            name: self._compact_payload(name, data, f"统计分析 {name}") for name, data in statistical_analyses.items()
+        }
+        model_json = dumps_payload(model_digests)
+        analysis_json = dumps_payload(analysis_digests)
+
+        tokens = count_tokens(model_json) + count_tokens(analysis_json)
+        if tokens > settings.llm_summary_batch_token_budget:
+            app_logger.info(
+                f"任务 {task_id} 的总结数据共 {tokens} tokens，超过批量总结预算 "
+                f"{settings.llm_summary_batch_token_budget}，改为逐项生成"
+            )
+            return None
+
+        names = list(model_digests) + list(analysis_digests)
+        try:
+            result = await self._cached_summary(
+                self.batch_report_template,
+                "batch_report",
+                {"model_predictions": model_digests, "statistical_analyses": analysis_digests},
+                {
+                    "analysis_names": json.dumps(names, ensure_ascii=False),
+                    "model_predictions": model_json,
+                    "statistical_analyses": analysis_json,
+                },
+                f"任务 {task_id} 的批量总结",
+                parse=lambda text: self._parse_batch_summary(text, names),
+            )
+        except Exception as e:
+            app_logger.warning(f"任务 {task_id} 的批量AI总结失败，改为逐项生成: {str(e)}")
+            return None
+
+        app_logger.info(f"任务 {task_id} 的AI总结通过一次批量请求生成完成（{len(names)} 项，{tokens} tokens）")
+        return result
+
+    async def summarize_report_async(
+        self, task_id: str, model_predictions: Dict[str, Any], statistical_analyses: Dict[str, Any]
+    ) -> Tuple[Dict[str, str], Optional[str]]:
+        """
+        异步生成整份报告的AI总结
+
+        开启 llm_summary_batch_mode 时先尝试一次请求生成所有点评和整体总结，
+        摘要超过批量预算或批量请求失败时退回逐项并发请求
+
+        Args:
+            task_id: 任务ID
+            model_predictions: 模型名 → 预测结果
+            statistical_analyses: 统计分析名 → 分析结果
+
+        Returns:
+            (分析项名 → 总结文本, 整体总结；逐项生成时为 None)
+        """
+        if settings.llm_summary_batch_mode and (model_predictions or statistical_analyses):
+            batched = await self._summarize_report_batched(task_id, model_predictions, statistical_analyses)
+            if batched is not None:
+                await self._log_cache_stats(task_id)
+                return batched
+
+        names = list(model_predictions) + list(statistical_analyses)
+        comments = await asyncio.gather(
+            *(self.summarize_model_prediction_async(name, data) for name, data in model_predictions.items()),
+            *(self.summarize_statistical_analysis_async(name, data) for name, data in statistical_analyses.items()),
+        )
+        await self._log_cache_stats(task_id)
+        return dict(zip(names, comments)), None
+
+    async def _log_cache_stats(self, task_id: str) -> None:
+        """报告总结完成后记录总结缓存的累计命中率"""
+        if settings.llm_summary_cache_ttl_seconds <= 0:
+            return
+        try:
+            stats = await self.get_summary_cache_stats()
+        except Exception as e:
+            app_logger.warning(f"读取总结缓存命中统计失败: {str(e)}")
+            return
+        hit_rate = f"{stats['hit_rate']:.2%}" if stats["hit_rate"] is not None else "无"
+        app_logger.info(
+            f"任务 {task_id} 的报告总结完成，总结缓存累计命中 {stats['hits']} 次、"
+            f"未命中 {stats['misses']} 次，命中率 {hit_rate}"
+        )
@@ -2,15 +2,37 @@ import pandas as pd
 import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.logging import app_logger
 from app.db.models import Upload
-from app.utils.detect_file_encoding_with_cchardet import detect_file_encoding_with_cchardet
+from app.utils.dataframe_cache import load_cleaned_dataframe, save_cleaned_dataframe
+from app.utils.detect_file_encoding_with_cchardet import (
+    adetect_file_encoding_with_cchardet,
+    detect_file_encoding_with_cchardet,
+)
+from app.utils.memory_usage import dataframe_memory_mb
+
+# 清洗流程版本号，修改下方任何清洗逻辑（列映射、过滤、归一化等）后都必须递增，
+# 旧版本的缓存会因此自动失效
+CLEAN_PIPELINE_VERSION = "1"
+
+# 人口学信息列，取值种类很少，适合使用 category 类型
+DEMOGRAPHIC_COLUMNS = ["学院", "专业", "年级", "性别", "政治面貌"]
+
+# 多选题拆分出来的 0/1 标记列
+MULTI_SELECT_COLUMNS = [
+    "卷面考试", "随堂测试", "论文报告", "课堂展示", "个人作业", "小组作业", "无考核方式",
+    "参与社团活动", "参与校园文化", "参与创新创业", "参与国际交流", "参与社会实践", "未参与活动",
+    "接受辅导课程", "接受网站指导", "接受教师帮助", "接受导师帮助", "接受辅导员帮助", "未接受指导",
+]
 
 
 async def data_clean_task(task_id: int, data_id: int, db: AsyncSession) -> pd.DataFrame:
     """
     数据清洗任务
 
+    优先读取按 Upload.hash + 清洗流程版本号缓存的结果，未命中时才重新清洗并写入缓存
+
     Args:
         task_id: 数据库中的任务ID
         data_id: 数据ID
@@ -20,9 +42,84 @@ async def data_clean_task(task_id: int, data_id: int, db: AsyncSession) -> pd.Da
     """
     app_logger.info(f"开始执行数据清洗任务: task_id={task_id}, data_id={data_id}")
 
+    upload = await db.get(Upload, data_id)
+    if upload is None:
+        raise ValueError(f"数据不存在: {data_id}")
+
+    df_cleaned = load_cleaned_dataframe(upload.hash, CLEAN_PIPELINE_VERSION)
+    if df_cleaned is not None:
+        app_logger.info(f"命中清洗缓存: data_id={data_id}, hash={upload.hash}")
+    else:
+        encoding = await adetect_file_encoding_with_cchardet(upload.path, upload.hash)
+        df_cleaned = clean_raw_data(upload.path, upload.hash, encoding)
+        save_cleaned_dataframe(upload.hash, CLEAN_PIPELINE_VERSION, df_cleaned)
+
+    # 缓存中保存的始终是未压缩的结果，开关切换后无需清理缓存
+    if settings.compact_cleaned_dataframe:
+        df_cleaned = compact_dataframe(df_cleaned)
+    return df_cleaned
+
+
+def compact_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    压缩清洗后 DataFrame 的数据类型以降低内存占用
+
+    - 多选题 0/1 标记列（且无缺失值）转为 bool
+    - 人口学信息列转为 category
+    - 其余 float64 得分列转为 float32
+
+    列顺序保持不变（What-If 训练按位置切除前 5 列）
+
+    Args:
+        df: 清洗后的数据
+
+    Returns:
+        压缩后的数据
+    """
+    before_mb = dataframe_memory_mb(df)
+
+    bool_columns = [
+        col for col in MULTI_SELECT_COLUMNS
+        if col in df.columns
+        and not df[col].isna().any()
+        and df[col].isin([0, 1]).all()
+    ]
+    category_columns = [col for col in DEMOGRAPHIC_COLUMNS if col in df.columns]
+    float_columns = [
+        col for col in df.select_dtypes(include="float64").columns
+        if col not in bool_columns
+    ]
+
+    dtype_map = {col: bool for col in bool_columns}
+    dtype_map.update({col: "category" for col in category_columns})
+    dtype_map.update({col: "float32" for col in float_columns})
+    df = df.astype(dtype_map)
+
+    app_logger.info(
+        f"DataFrame 类型压缩完成: {before_mb}MB -> {dataframe_memory_mb(df)}MB, "
+        f"bool 列 {len(bool_columns)} 个, float32 列 {len(float_columns)} 个"
+    )
+    return df
+
+
+def clean_raw_data(
+    file_path: str,
+    file_hash: str | None = None,
+    detected_encoding: tuple[str, float] | None = None,
+) -> pd.DataFrame:
+    """
+    读取原始问卷 CSV 并执行完整的清洗流程
+
+    Args:
+        file_path: 原始文件路径
+        file_hash: 原始文件的 SHA-256，用于复用编码检测结果
+        detected_encoding: 调用方已检测的 (编码, 置信度)，为 None 时在这里检测
+
+    Returns:
+        清洗后的数据
+    """
     # 加载数据
-    file_path = (await db.get(Upload, data_id)).path
-    encoding, confidence = detect_file_encoding_with_cchardet(file_path)
+    encoding, confidence = detected_encoding or detect_file_encoding_with_cchardet(file_path, file_hash)
     app_logger.info(f"检测到文件编码为: {encoding}, 置信度为: {confidence:.2f}")
     df = pd.read_csv(file_path, encoding=encoding)
 
@@ -1,10 +1,8 @@
-import hashlib
 import json
 import os.path
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 
-import aiofiles
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
@@ -16,6 +14,7 @@ from app.db.models.document import Document, KnowledgeBase
 from app.db.models.upload import Upload
 from app.rag.processor.data_loader import load_documents
 from app.rag.processor.text_spliter import split_documents
+from app.utils.stream_upload import make_temp_upload_path, stream_upload_to_file, discard_temp_upload
 
 
 class DocumentService:
@@ -34,25 +33,32 @@ class DocumentService:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-        content: bytes = await file.read()
-        file_hash = hashlib.sha256(content).hexdigest()
         file_type = filename.lower().split('.')[-1] if '.' in filename else 'unknown'
+        temp_path = make_temp_upload_path(file_path)
+        finalized = False
 
         try:
-            # 保存文件
-            async with aiofiles.open(file_path, "wb") as f:
-                await f.write(content)
+            # 分块写入临时文件，同时增量计算哈希
+            file_hash, file_size = await stream_upload_to_file(file, temp_path)
+
+            # 在文件落盘之前检查内容是否已经上传过
+            res = await db.execute(select(Document.id).where(Document.file_hash == file_hash))
+            if res.first() is not None:
+                raise ValueError(f"文档 {filename} 已存在")
 
             # 创建文档记录
             document = Document(
                 filename=filename,
                 file_path=file_path,
-                file_size=len(content),
+                file_size=file_size,
                 file_hash=file_hash,
                 file_type=file_type,
                 status="uploaded"
             )
             db.add(document)
+            await db.flush()
+            os.replace(temp_path, file_path)
+            finalized = True
             await db.commit()
             await db.refresh(document)
 
@@ -69,12 +75,17 @@ class DocumentService:
         except IntegrityError:
             await db.rollback()
             raise ValueError(f"文档 {filename} 已存在")
+        except ValueError:
+            await db.rollback()
+            raise
         except Exception as e:
             await db.rollback()
             # 删除已保存的文件
-            if os.path.exists(file_path):
+            if finalized and os.path.exists(file_path):
                 os.remove(file_path)
             raise ValueError(f"文档上传失败: {str(e)}")
+        finally:
+            discard_temp_upload(temp_path)
 
     # async def process_document(self, document_id: int, db: AsyncSession) -> Dict[str, Any]:
     #     """处理文档：分割文本并准备向量化"""
@@ -153,7 +164,7 @@ class DocumentService:
                 await db.flush()  # 使用 flush 而不是 commit
 
                 # 加载文档（同步操作）
-                documents = load_documents([file_path])
+                documents = load_documents([file_path], {file_path: document.file_hash})
                 if not documents:
                     raise ValueError("无法加载文档内容")
 
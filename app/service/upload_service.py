@@ -1,7 +1,5 @@
-import hashlib
 import os.path
 
-import aiofiles
 from fastapi import UploadFile
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
@@ -11,13 +9,20 @@ from app.core.config import settings
 from app.db.models.upload import Upload
 from app.exception.exceptions.upload import FileConflictError
 from app.schemas import UploadResponse
+from app.utils.dataframe_cache import evict_cleaned_dataframe
+from app.utils.stream_upload import make_temp_upload_path, stream_upload_to_file, discard_temp_upload
 
 
 class UploadService:
     """上传文件服务"""
 
     async def upload(self, file: UploadFile, db: AsyncSession) -> UploadResponse:
-        """上传文件"""
+        """
+        上传文件
+
+        分块写入临时文件并增量计算哈希，内容重复时在文件落盘前直接拒绝，
+        峰值内存与文件大小无关
+        """
         filename = file.filename
         file_path = f"{settings.analysis_file_path}{filename}"
 
@@ -25,21 +30,26 @@ class UploadService:
         if not os.path.exists(directory):
             os.makedirs(directory)
 
-        content: bytes = await file.read()
+        temp_path = make_temp_upload_path(file_path)
 
         try:
-            file_hash: str
-            async with aiofiles.open(file_path, "wb") as f:
-                await f.write(content)
-            file_hash = hashlib.sha256(content).hexdigest()
+            file_hash, size = await stream_upload_to_file(file, temp_path)
+
+            # 在文件落盘之前检查内容是否已经上传过
+            res = await db.execute(select(Upload.id).where(Upload.hash == file_hash))
+            if res.first() is not None:
+                raise FileConflictError(filename)
 
             upload = Upload(
                 filename=filename,
                 path=file_path,
-                size=len(content),
+                size=size,
                 hash=file_hash,
             )
             db.add(upload)
+            # 先 flush 让唯一约束生效，确认无冲突后再把临时文件替换到正式路径
+            await db.flush()
+            os.replace(temp_path, file_path)
             await db.commit()
             await db.refresh(upload)
             return UploadResponse(
@@ -51,6 +61,8 @@ class UploadService:
         except IntegrityError:
             await db.rollback()
             raise FileConflictError(filename)
+        finally:
+            discard_temp_upload(temp_path)
 
     async def check_filename_conflict(self, filename: str, db: AsyncSession) -> bool:
         """检查文件名是否冲突"""
@@ -91,6 +103,8 @@ class UploadService:
                 # 如果数据库删除成功，再永久删除文件
                 if os.path.exists(temp_path):
                     os.remove(temp_path)
+                # 同时清理该文件的清洗缓存
+                evict_cleaned_dataframe(upload.hash)
                 return True
             except Exception:
                 # 如果数据库操作失败，恢复文件
@@ -0,0 +1,46 @@
+# app/utils/code_fingerprint.py
+
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+# 项目根目录下的 app 包
+APP_ROOT = Path(__file__).resolve().parent.parent
+
+# 决定分析结果的源码：数据清洗、模型训练和统计分析
+RESULT_SOURCE_PATHS = (
+    "analysis",
+    "service/data_clean_service.py",
+)
+
+
+@lru_cache(maxsize=None)
+def code_fingerprint(paths: tuple[str, ...] = RESULT_SOURCE_PATHS) -> str:
+    """
+    计算一组源码文件的指纹
+
+    任何一个文件的内容或路径变化都会得到不同的指纹，用于使旧代码版本产生的缓存结果失效；
+    同一进程内代码不会变化，因此只计算一次
+
+    Args:
+        paths: 相对于 app 包的文件或目录，目录下递归包含所有 .py 文件
+
+    Returns:
+        SHA-256 十六进制字符串
+    """
+    files = []
+    for relative_path in paths:
+        path = APP_ROOT / relative_path
+        if path.is_dir():
+            files.extend(path.rglob("*.py"))
+        elif path.exists():
+            files.append(path)
+
+    hasher = hashlib.sha256()
+    for file_path in sorted(files):
+        hasher.update(file_path.relative_to(APP_ROOT).as_posix().encode("utf-8"))
+        hasher.update(b"\0")
+        hasher.update(file_path.read_bytes())
+        hasher.update(b"\0")
+
+    return hasher.hexdigest()
@@ -0,0 +1,74 @@
+# app/utils/dataframe_cache.py
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from app.core.config import settings
+from app.core.logging import app_logger
+
+
+def _cache_dir() -> Path:
+    """获取缓存目录，不存在则创建"""
+    cache_dir = Path(settings.cleaned_data_cache_path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+def _cache_file(data_hash: str, pipeline_version: str) -> Path:
+    """缓存文件路径：内容哈希 + 清洗流程版本号"""
+    return _cache_dir() / f"{data_hash}_v{pipeline_version}.parquet"
+
+
+def load_cleaned_dataframe(data_hash: str, pipeline_version: str) -> pd.DataFrame | None:
+    """
+    读取清洗后 DataFrame 的缓存
+
+    Args:
+        data_hash: 原始文件的 SHA-256（Upload.hash）
+        pipeline_version: 清洗流程版本号
+
+    Returns:
+        缓存的 DataFrame，未命中或读取失败时返回 None
+    """
+    cache_file = _cache_file(data_hash, pipeline_version)
+    if not cache_file.exists():
+        return None
+
+    try:
+        return pd.read_parquet(cache_file)
+    except Exception as e:
+        # 缓存损坏不影响主流程，删除后重新清洗
+        app_logger.warning(f"读取清洗缓存失败，将重新清洗: {cache_file}, 错误: {e}")
+        cache_file.unlink(missing_ok=True)
+        return None
+
+
+def save_cleaned_dataframe(data_hash: str, pipeline_version: str, df: pd.DataFrame) -> Path | None:
+    """
+    将清洗后的 DataFrame 以 Parquet 格式写入缓存
+
+    先写临时文件再原子替换，避免并发读取到写了一半的文件
+
+    Returns:
+        缓存文件路径，写入失败时返回 None
+    """
+    cache_file = _cache_file(data_hash, pipeline_version)
+    temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+
+    try:
+        df.to_parquet(temp_file)
+        os.replace(temp_file, cache_file)
+        return cache_file
+    except Exception as e:
+        # 缓存写入失败不影响主流程
+        app_logger.warning(f"写入清洗缓存失败: {cache_file}, 错误: {e}")
+        temp_file.unlink(missing_ok=True)
+        return None
+
+
+def evict_cleaned_dataframe(data_hash: str) -> None:
+    """删除某个文件所有版本的清洗缓存（原始文件被删除时调用）"""
+    for cache_file in _cache_dir().glob(f"{data_hash}_v*.parquet"):
+        cache_file.unlink(missing_ok=True)
@@ -1,36 +1,182 @@
-import cchardet
+import asyncio
 import os
+import threading
+from collections import OrderedDict
+
+import cchardet
+
+from app.utils.redis_client import async_redis_client, redis_client
+
+# 每次喂给检测器的字节数
+DETECT_CHUNK_SIZE = 64 * 1024
+# 最多读取的字节数，超过后即使检测器没有得出结论也停止
+DETECT_MAX_BYTES = 1024 * 1024
+# 检测结果缓存过期时间（秒），内容哈希不变则编码不变，所以可以设置得很长
+ENCODING_CACHE_EXPIRE = 7 * 24 * 3600
+# 进程内缓存的最大条目数，超过后淘汰最久未使用的
+ENCODING_CACHE_MAX_ENTRIES = 1024
+# 回退解码时依次尝试的编码
+FALLBACK_ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'gb18030', 'big5']
+
+# 只看了文件的一部分，所以把检测结果替换为兼容它的超集编码，避免后文出现样本里没有的字符时解码失败
+_SUPERSET_ENCODINGS = {
+    'ascii': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+}
+
+# 进程内 LRU 缓存：{文件哈希: (编码, 置信度)}
+_encoding_cache: OrderedDict[str, tuple[str, float]] = OrderedDict()
+_encoding_cache_lock = threading.Lock()
+
+
+def _redis_key(file_hash: str) -> str:
+    return f"file_encoding:{file_hash}"
+
+
+def _get_local_encoding(file_hash: str) -> tuple[str, float] | None:
+    """读取进程内缓存，命中时移到最近使用的位置"""
+    with _encoding_cache_lock:
+        cached = _encoding_cache.get(file_hash)
+        if cached is not None:
+            _encoding_cache.move_to_end(file_hash)
+        return cached
+
+
+def _set_local_encoding(file_hash: str, encoding: str, confidence: float) -> None:
+    """写入进程内缓存，超过 ENCODING_CACHE_MAX_ENTRIES 时淘汰最久未使用的条目"""
+    with _encoding_cache_lock:
+        _encoding_cache[file_hash] = (encoding, confidence)
+        _encoding_cache.move_to_end(file_hash)
+        while len(_encoding_cache) > ENCODING_CACHE_MAX_ENTRIES:
+            _encoding_cache.popitem(last=False)
 
 
-def detect_file_encoding_with_cchardet(file_path):
+def _parse_cached(cached: bytes) -> tuple[str, float]:
+    encoding, confidence = cached.decode().split("|", 1)
+    return encoding, float(confidence)
+
+
+def _get_cached_encoding(file_hash: str) -> tuple[str, float] | None:
+    """按文件哈希读取编码缓存，先查进程内缓存再查 Redis"""
+    cached = _get_local_encoding(file_hash)
+    if cached is not None:
+        return cached
+
+    try:
+        cached = redis_client.get(_redis_key(file_hash))
+        if cached:
+            encoding, confidence = _parse_cached(cached)
+            _set_local_encoding(file_hash, encoding, confidence)
+            return encoding, confidence
+    except Exception:
+        pass  # 缓存读取失败，继续检测
+
+    return None
+
+
+def _set_cached_encoding(file_hash: str, encoding: str, confidence: float) -> None:
+    """写入编码缓存"""
+    _set_local_encoding(file_hash, encoding, confidence)
+    try:
+        redis_client.setex(_redis_key(file_hash), ENCODING_CACHE_EXPIRE, f"{encoding}|{confidence}")
+    except Exception:
+        pass  # 缓存存储失败不影响主流程
+
+
+def detect_file_encoding_with_cchardet(file_path, file_hash=None):
     """
     使用 cchardet 库检测文件的编码。
 
+    分块把文件喂给检测器，检测器有足够把握（done）或读满 DETECT_MAX_BYTES 后立即停止，
+    不会把整个文件读入内存。传入 file_hash 时检测结果会按哈希缓存，之后同一内容的文件直接返回缓存结果。
+
+    Args:
+        file_path (str): 要检测的文件的路径。
+        file_hash (str | None): 文件内容的 SHA-256，用作缓存键。
+
+    Returns:
+        tuple: (检测到的编码, 置信度) 或 (None, None) 如果无法检测。
+    """
+    if file_hash:
+        cached = _get_cached_encoding(file_hash)
+        if cached:
+            return cached
+
+    detected_encoding, confidence = _detect_encoding(file_path)
+    if file_hash and detected_encoding and confidence is not None:
+        _set_cached_encoding(file_hash, detected_encoding, confidence)
+    return detected_encoding, confidence
+
+
+async def adetect_file_encoding_with_cchardet(file_path, file_hash=None):
+    """
+    detect_file_encoding_with_cchardet 的异步版本，供事件循环中的调用方（如数据清洗任务）使用
+
+    Redis 缓存通过异步客户端读写，读取文件和检测在线程池中执行
+
     Args:
         file_path (str): 要检测的文件的路径。
+        file_hash (str | None): 文件内容的 SHA-256，用作缓存键。
 
     Returns:
         tuple: (检测到的编码, 置信度) 或 (None, None) 如果无法检测。
     """
+    if file_hash:
+        cached = _get_local_encoding(file_hash)
+        if cached is not None:
+            return cached
+        try:
+            cached = await async_redis_client.get(_redis_key(file_hash))
+            if cached:
+                encoding, confidence = _parse_cached(cached)
+                _set_local_encoding(file_hash, encoding, confidence)
+                return encoding, confidence
+        except Exception:
+            pass  # 缓存读取失败，继续检测
+
+    detected_encoding, confidence = await asyncio.to_thread(_detect_encoding, file_path)
+    if file_hash and detected_encoding and confidence is not None:
+        _set_local_encoding(file_hash, detected_encoding, confidence)
+        try:
+            await async_redis_client.setex(
+                _redis_key(file_hash), ENCODING_CACHE_EXPIRE, f"{detected_encoding}|{confidence}"
+            )
+        except Exception:
+            pass  # 缓存存储失败不影响主流程
+    return detected_encoding, confidence
+
+
+def _detect_encoding(file_path):
+    """分块检测文件编码（不读写缓存），返回 (编码, 置信度) 或 (None, None)"""
     if not os.path.exists(file_path):
         print(f"错误：文件 '{file_path}' 不存在。")
         return None, None
 
     try:
-        # 1. 以二进制模式打开文件读取
+        # 1. 以二进制模式分块读取并喂给检测器
+        detector = cchardet.UniversalDetector()
+        bytes_read = 0
         with open(file_path, 'rb') as f:
-            raw_data = f.read()  # 读取文件的所有字节数据
-
-        # 2. 使用 cchardet.detect() 检测编码
-        # 这个函数会尝试分析字节数据并返回最可能的编码及其置信度
-        result = cchardet.detect(raw_data)
-
-        # result 是一个字典，例如：
-        # {'encoding': 'utf-8', 'confidence': 0.99, 'language': 'Chinese'}
+            while bytes_read < DETECT_MAX_BYTES:
+                chunk = f.read(DETECT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                bytes_read += len(chunk)
+                detector.feed(chunk)
+                if detector.done:
+                    break
+        detector.close()
 
+        # 2. result 是一个字典，例如：
+        # {'encoding': 'UTF-8', 'confidence': 0.99}
+        result = detector.result
         detected_encoding = result.get('encoding')
         confidence = result.get('confidence')
 
+        if detected_encoding:
+            detected_encoding = _SUPERSET_ENCODINGS.get(detected_encoding.lower(), detected_encoding)
+
         return detected_encoding, confidence
 
     except Exception as e:
@@ -38,6 +184,33 @@ def detect_file_encoding_with_cchardet(file_path):
         return None, None
 
 
+def decode_file_with_fallback(file_path, file_hash=None, encodings=None):
+    """
+    检测失败时的回退解码：只读取一次文件，在内存中依次尝试候选编码
+
+    Args:
+        file_path (str): 文件路径。
+        file_hash (str | None): 文件内容的 SHA-256，解码成功的编码会按哈希缓存。
+        encodings (list[str] | None): 候选编码，默认为 FALLBACK_ENCODINGS。
+
+    Returns:
+        tuple: (解码后的文本, 使用的编码)，所有编码都失败时使用 utf-8 并忽略错误字符，编码返回 None。
+    """
+    with open(file_path, 'rb') as f:
+        raw_data = f.read()
+
+    for encoding in encodings or FALLBACK_ENCODINGS:
+        try:
+            text = raw_data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        if file_hash:
+            _set_cached_encoding(file_hash, encoding, 1.0)
+        return text, encoding
+
+    return raw_data.decode('utf-8', errors='ignore'), None
+
+
 # 测试
 def main():
     # 准备一个测试文件 (假设文件不存在)
@@ -0,0 +1,30 @@
+# app/utils/etag.py
+
+"""
+HTTP 条件请求（ETag / If-None-Match）
+ETag 由结果的版本信息（数据库记录的写入时间、结果文件的修改时间等）计算，
+判断是否命中时无需读取结果本身
+"""
+
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """由版本信息计算强 ETag（带引号）"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    判断请求头 If-None-Match 是否包含当前 ETag
+
+    支持 * 和逗号分隔的多个 ETag，按弱比较忽略 W/ 前缀
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
@@ -0,0 +1,23 @@
+# app/utils/json_utils.py
+
+import numpy as np
+
+
+def json_default(obj):
+    """
+    json.dump 的 default 回调
+
+    numpy 标量（如 float32、int64）不是 Python 内置数值类型的子类，直接序列化会报错，
+    这里转换为对应的 Python 原生类型，其它无法识别的对象仍按字符串处理
+
+    Args:
+        obj: json 无法直接序列化的对象
+
+    Returns:
+        可序列化的值
+    """
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
@@ -0,0 +1,265 @@
+# app/utils/llm_payload.py
+
+"""
+LLM 总结前的结果压缩
+图表结果中包含大量逐点数据（PCA 散点、逐个学生的标签、学院/专业/年级的每个单元格），
+直接放入提示词会使 token 数和 LLM 耗时成倍增加。这里按分析类型把结果压缩为有限大小的摘要：
+分布统计、分组均值、最高/最低的若干项等，并逐步收紧保留的条目数，直到不超过 token 预算
+"""
+
+import json
+import math
+import statistics
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+import tiktoken
+
+from app.core.logging import app_logger
+from app.utils.json_utils import json_default
+
+# 计算 token 数使用的编码
+TOKEN_ENCODING = "cl100k_base"
+# 依次尝试的保留条目数，从宽到严
+KEEP_STEPS = (10, 5, 3, 1)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        # 离线环境无法下载编码文件时按字符数估算
+        app_logger.warning(f"加载 tiktoken 编码 {TOKEN_ENCODING} 失败，按字符数估算 token: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """计算文本的 token 数"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def dumps_payload(data: Any) -> str:
+    """序列化放入提示词的数据（不缩进，减少 token）"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=json_default)
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _round(value: float) -> float:
+    return round(value, 4) if isinstance(value, float) and math.isfinite(value) else value
+
+
+def _stats(values: List[float]) -> Dict[str, Any]:
+    """数值序列的分布统计"""
+    values = [value for value in values if _is_number(value) and math.isfinite(value)]
+    if not values:
+        return {"count": 0}
+    quartiles = statistics.quantiles(values, n=4) if len(values) > 1 else [values[0]] * 3
+    return {
+        "count": len(values),
+        "mean": _round(statistics.fmean(values)),
+        "min": _round(min(values)),
+        "p25": _round(quartiles[0]),
+        "median": _round(quartiles[1]),
+        "p75": _round(quartiles[2]),
+        "max": _round(max(values)),
+    }
+
+
+def _top_bottom(items: List[Tuple[str, float]], keep: int) -> Dict[str, Any]:
+    """按数值排序后保留最高和最低的若干项"""
+    ranked = sorted(items, key=lambda item: item[1], reverse=True)
+    return {
+        "count": len(ranked),
+        "distribution": _stats([value for _, value in ranked]),
+        "highest": {name: _round(value) for name, value in ranked[:keep]},
+        "lowest": {name: _round(value) for name, value in ranked[-keep:][::-1]},
+    }
+
+
+def compact(value: Any, keep: int) -> Any:
+    """
+    通用压缩：超过 keep 两倍的长列表和大字典替换为统计摘要，其余结构递归处理
+
+    - 数值列表 → 分布统计
+    - 字符串列表 → 出现次数最多的若干项
+    - 坐标点列表 → 各维度的分布统计
+    - 记录列表 → 各字段的分布统计或取值次数
+    - 值全为数值的大字典 → 最高/最低的若干项
+    """
+    limit = keep * 2
+    if isinstance(value, float):
+        return _round(value)
+
+    if isinstance(value, dict):
+        if len(value) > limit and all(_is_number(item) for item in value.values()):
+            return _top_bottom([(str(name), item) for name, item in value.items()], keep)
+        compacted = {str(name): compact(item, keep) for name, item in list(value.items())[:limit * 2]}
+        if len(value) > limit * 2:
+            compacted["省略"] = f"其余 {len(value) - limit * 2} 项"
+        return compacted
+
+    if isinstance(value, list):
+        if len(value) <= limit:
+            return [compact(item, keep) for item in value]
+        if all(_is_number(item) for item in value):
+            return _stats(value)
+        if all(isinstance(item, str) for item in value):
+            return {"count": len(value), "most_common": dict(Counter(value).most_common(keep))}
+        if all(isinstance(item, list) and item and all(_is_number(x) for x in item) for item in value):
+            dims = max(len(item) for item in value)
+            return {
+                "count": len(value),
+                "dimensions": [_stats([item[i] for item in value if len(item) > i]) for i in range(dims)],
+            }
+        if all(isinstance(item, dict) for item in value):
+            fields = defaultdict(list)
+            for item in value:
+                for name, field_value in item.items():
+                    fields[name].append(field_value)
+            summary = {}
+            for name, field_values in fields.items():
+                if all(_is_number(item) for item in field_values):
+                    summary[name] = _stats(field_values)
+                elif all(isinstance(item, (str, bool)) for item in field_values):
+                    summary[name] = dict(Counter(map(str, field_values)).most_common(keep))
+                else:
+                    summary[name] = compact(field_values[:keep], keep)
+            return {"count": len(value), "fields": summary}
+        return [compact(item, keep) for item in value[:keep]] + [f"其余 {len(value) - keep} 项省略"]
+
+    return value
+
+
+def _reduce_student_portrait(data: Dict[str, Any], keep: int) -> Dict[str, Any]:
+    """学生画像模型：去掉逐个学生的标签和 PCA 散点，保留画像人数、画像特征均值和各画像在 PCA 空间的中心"""
+    statistics_data = data.get("persona_statistics", {})
+    pca = data.get("pca_visualization", {})
+
+    centers = defaultdict(list)
+    for point in pca.get("pca_2d_scatter", []):
+        centers[point.get("student_persona")].append((point.get("pc1", 0), point.get("pc2", 0)))
+
+    return {
+        "persona_counts": statistics_data.get("persona_counts"),
+        "persona_feature_means": statistics_data.get("persona_means"),
+        "total_samples": statistics_data.get("total_samples"),
+        "pca_2d_persona_centers": {
+            str(persona): {
+                "count": len(points),
+                "pc1": statistics.fmean(x for x, _ in points),
+                "pc2": statistics.fmean(y for _, y in points),
+            }
+            for persona, points in centers.items()
+        },
+    }
+
+
+def _academy_cells_reducer(dimension_names: Callable[[], List[str]]) -> Callable[[Any, int], Any]:
+    """
+    学院 → 专业 → 年级 嵌套结果（EHI、RPI）的压缩：
+    展开为单元格后给出综合得分的分布、各学院均值、各维度均值以及得分最高/最低的单元格
+
+    Args:
+        dimension_names: 返回每个单元格 data 数组各位置名称的函数（最后一位为综合得分）
+    """
+
+    def reduce(data: Any, keep: int) -> Any:
+        if not isinstance(data, list):
+            return data
+
+        cells = []
+        academy_scores = defaultdict(list)
+        for academy in data:
+            for major in academy.get("majors", []):
+                for grade in major.get("grades", []):
+                    values = grade.get("data") or []
+                    if not values:
+                        continue
+                    cells.append((f"{academy.get('name')}/{major.get('name')}/{grade.get('name')}", values))
+                    academy_scores[academy.get("name")].append(values[-1])
+        if not cells:
+            return data
+
+        names = dimension_names()
+        width = max(len(values) for _, values in cells)
+        if len(names) != width:
+            names = [f"指标{i + 1}" for i in range(width - 1)] + ["综合得分"]
+
+        return {
+            "score_name": names[-1],
+            "cells": _top_bottom([(name, values[-1]) for name, values in cells], keep),
+            "academy_mean_scores": compact(
+                {str(name): statistics.fmean(scores) for name, scores in academy_scores.items()}, keep
+            ),
+            "dimension_means": {
+                names[i]: _round(statistics.fmean(values[i] for _, values in cells if len(values) > i))
+                for i in range(width)
+            },
+        }
+
+    return reduce
+
+
+def _ehi_dimension_names() -> List[str]:
+    from app.analysis.statistical.correlation_based_EHI_builder.ehiCalculator import DataProcessor
+
+    return list(DataProcessor.KPI_MAPPING.keys()) + ["EHI"]
+
+
+def _rpi_dimension_names() -> List[str]:
+    from app.analysis.statistical.correlation_based_RPI_builder.RPICalculator import RPIProcessor
+
+    return list(RPIProcessor.RESOURCE_MAP.keys()) + ["RPI"]
+
+
+# 各分析类型的专用压缩，结果再经过通用压缩；未列出的类型只做通用压缩
+PAYLOAD_REDUCERS: Dict[str, Callable[[Any, int], Any]] = {
+    "student_portrait": _reduce_student_portrait,
+    "correlation_based_EHI_builder": _academy_cells_reducer(_ehi_dimension_names),
+    "correlation_based_RPI_builder": _academy_cells_reducer(_rpi_dimension_names),
+}
+
+
+def compact_for_summary(analysis_type: str, data: Any, token_budget: int) -> Tuple[Any, int, int]:
+    """
+    把分析结果压缩为不超过 token 预算的摘要
+
+    原始结果本身不超过预算时原样返回；否则按 KEEP_STEPS 逐步减少保留的条目数，
+    仍超过预算时返回最紧的一档并记录警告
+
+    Args:
+        analysis_type: 分析类型（模型名或统计分析名）
+        data: 分析结果
+        token_budget: token 预算
+
+    Returns:
+        (摘要, 原始 token 数, 摘要 token 数)
+    """
+    original_tokens = count_tokens(dumps_payload(data))
+    if original_tokens <= token_budget:
+        return data, original_tokens, original_tokens
+
+    reducer = PAYLOAD_REDUCERS.get(analysis_type)
+    digest, digest_tokens = data, original_tokens
+    for keep in KEEP_STEPS:
+        try:
+            digest = compact(reducer(data, keep) if reducer else data, keep)
+        except Exception as e:
+            # 结果结构与预期不符时退回通用压缩
+            app_logger.warning(f"{analysis_type} 的专用压缩失败，改用通用压缩: {str(e)}")
+            digest = compact(data, keep)
+        digest_tokens = count_tokens(dumps_payload(digest))
+        if digest_tokens <= token_budget:
+            break
+    else:
+        app_logger.warning(f"{analysis_type} 压缩后仍有 {digest_tokens} tokens，超过预算 {token_budget}")
+
+    return digest, original_tokens, digest_tokens
@@ -0,0 +1,102 @@
+# app/utils/memory_usage.py
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块
+    resource = None
+
+_PROC_STATUS = Path("/proc/self/status")
+_PROC_CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def _read_status_mb(field: str) -> float | None:
+    """读取 /proc/self/status 中的内存字段（如 VmRSS、VmHWM），单位 MB"""
+    try:
+        for line in _PROC_STATUS.read_text().splitlines():
+            if line.startswith(f"{field}:"):
+                return round(int(line.split()[1]) / 1024, 2)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """
+    把当前进程的峰值常驻内存重置为当前值，之后读取的峰值只反映本次执行
+
+    常驻的 Worker 进程（solo 池、快速队列子进程复用上千个任务）中 ru_maxrss 是整个进程生命周期的峰值，
+    需要在每次执行开始时重置。依赖 Linux 的 /proc/self/clear_refs（写入 5 重置 VmHWM）
+
+    Returns:
+        是否重置成功；其他平台返回 False，此时 peak_rss_mb 为进程生命周期内的峰值
+    """
+    try:
+        _PROC_CLEAR_REFS.write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_mb() -> float | None:
+    """当前进程的常驻内存（MB），平台不支持时返回 None"""
+    return _read_status_mb("VmRSS")
+
+
+def peak_rss_mb() -> float | None:
+    """
+    当前进程的峰值常驻内存（MB）
+
+    Linux 下读取 VmHWM，执行开始时调用 reset_peak_rss 后即为本次执行的峰值；
+    其他平台退回 ru_maxrss（进程生命周期内的峰值）
+
+    Returns:
+        峰值内存，平台不支持时返回 None
+    """
+    peak = _read_status_mb("VmHWM")
+    if peak is not None:
+        return peak
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 下单位为 KB，macOS 下为字节
+    if sys.platform == "darwin":
+        return round(peak / 1024 / 1024, 2)
+    return round(peak / 1024, 2)
+
+
+class PeakRssTracker:
+    """
+    记录一次执行的内存：开始时重置峰值并记录基线，结束时给出峰值和相对基线的增量
+
+    无法重置峰值的平台上 peak_rss_mb 为进程生命周期内的峰值，scope 标记为 process
+    """
+
+    def __init__(self):
+        self.scoped = reset_peak_rss()
+        self.baseline_mb = current_rss_mb()
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            {"peak_rss_mb": 峰值, "peak_rss_delta_mb": 峰值 - 开始时的常驻内存, "peak_rss_scope": "run" 或 "process"}
+        """
+        peak = peak_rss_mb()
+        delta = None
+        if peak is not None and self.baseline_mb is not None:
+            delta = round(peak - self.baseline_mb, 2)
+        return {
+            "peak_rss_mb": peak,
+            "peak_rss_delta_mb": delta,
+            "peak_rss_scope": "run" if self.scoped else "process",
+        }
+
+
+def dataframe_memory_mb(df: pd.DataFrame) -> float:
+    """DataFrame 实际占用的内存（MB，包含 object 列中字符串本身）"""
+    return round(df.memory_usage(deep=True).sum() / 1024 / 1024, 2)
@@ -2,11 +2,7 @@
 
 import functools
 import pickle
-import redis
-from app.core.config import settings
-
-# 创建全局Redis客户端
-redis_client = redis.from_url(settings.redis_url)
+from app.utils.redis_client import redis_client
 
 def cached_model_load(expire_time: int = 1800):
     """
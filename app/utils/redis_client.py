@@ -0,0 +1,12 @@
+# app/utils/redis_client.py
+
+import redis
+import redis.asyncio
+
+from app.core.config import settings
+
+# 全局Redis客户端（redis-py 在首次执行命令时才建立连接）
+redis_client = redis.from_url(settings.redis_url)
+
+# FastAPI 进程中使用的异步客户端（如订阅任务进度），只能在同一个事件循环中使用
+async_redis_client = redis.asyncio.from_url(settings.redis_url)
@@ -0,0 +1,84 @@
+# app/utils/report_status.py
+
+"""
+综合分析报告的生成状态
+任务完成后由 Worker 在后台生成综合分析报告，结果接口只读取已生成的报告；
+报告尚未写入任务目录时，接口根据这里记录的状态返回"生成中"或失败原因
+"""
+
+import json
+from typing import Any, Dict
+
+from app.core.logging import app_logger
+from app.utils.redis_client import redis_client
+
+GENERATING = "generating"
+FAILED = "failed"
+# 读取状态失败（Redis 不可用），无法判断报告是否已在生成
+UNAVAILABLE = "unavailable"
+
+# 生成中状态的保留时间（秒），需长于报告生成的最长时间；Worker 崩溃时到期后可重新提交
+GENERATING_TTL = 3600
+# 失败状态的保留时间（秒）
+FAILED_TTL = 24 * 3600
+
+
+def _status_key(task_id: int | str) -> str:
+    return f"analysis_report_status:{task_id}"
+
+
+def mark_report_generating(task_id: int | str) -> bool:
+    """
+    记录报告开始生成
+
+    Returns:
+        是否记录成功；已在生成中时返回 False，调用方不应重复提交；Redis 不可用时返回 True
+    """
+    try:
+        key = _status_key(task_id)
+        current = get_report_status(task_id)
+        if current is not None and current.get("status") == FAILED:
+            # 失败后重新生成
+            redis_client.delete(key)
+        return bool(redis_client.set(
+            key, json.dumps({"status": GENERATING}), nx=True, ex=GENERATING_TTL
+        ))
+    except Exception as e:
+        app_logger.warning(f"记录任务 {task_id} 的报告生成状态失败: {str(e)}")
+        return True
+
+
+def mark_report_failed(task_id: int | str, error: str) -> None:
+    """记录报告生成失败及原因"""
+    try:
+        redis_client.set(
+            _status_key(task_id),
+            json.dumps({"status": FAILED, "error": error}, ensure_ascii=False),
+            ex=FAILED_TTL,
+        )
+    except Exception as e:
+        app_logger.warning(f"记录任务 {task_id} 的报告生成失败状态失败: {str(e)}")
+
+
+def clear_report_status(task_id: int | str) -> None:
+    """报告生成完成后清除状态"""
+    try:
+        redis_client.delete(_status_key(task_id))
+    except Exception as e:
+        app_logger.warning(f"清除任务 {task_id} 的报告生成状态失败: {str(e)}")
+
+
+def get_report_status(task_id: int | str) -> Dict[str, Any] | None:
+    """
+    读取报告生成状态
+
+    Returns:
+        {"status": "generating"} 或 {"status": "failed", "error": ...}，没有记录时返回 None；
+        Redis 不可用时返回 {"status": "unavailable"}
+    """
+    try:
+        value = redis_client.get(_status_key(task_id))
+    except Exception as e:
+        app_logger.warning(f"读取任务 {task_id} 的报告生成状态失败: {str(e)}")
+        return {"status": UNAVAILABLE}
+    return json.loads(value) if value else None
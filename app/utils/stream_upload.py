@@ -0,0 +1,50 @@
+# app/utils/stream_upload.py
+
+import hashlib
+import os
+import uuid
+
+import aiofiles
+from fastapi import UploadFile
+
+# 每次从上传流中读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def make_temp_upload_path(file_path: str) -> str:
+    """在目标文件同目录下生成临时文件路径，保证之后可以原子替换"""
+    return f"{file_path}.{uuid.uuid4().hex}.uploading"
+
+
+async def stream_upload_to_file(
+    file: UploadFile, target_path: str, chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> tuple[str, int]:
+    """
+    分块读取上传文件并写入磁盘，同时增量计算 SHA-256
+
+    内存占用只与 chunk_size 有关，与文件大小无关
+
+    Args:
+        file: 上传的文件
+        target_path: 写入路径（一般为临时文件）
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        (文件哈希, 文件大小)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+
+    async with aiofiles.open(target_path, "wb") as f:
+        while chunk := await file.read(chunk_size):
+            hasher.update(chunk)
+            size += len(chunk)
+            await f.write(chunk)
+
+    return hasher.hexdigest(), size
+
+
+def discard_temp_upload(temp_path: str) -> None:
+    """删除残留的临时文件"""
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
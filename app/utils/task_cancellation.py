@@ -0,0 +1,82 @@
+# app/utils/task_cancellation.py
+
+"""
+分析任务取消
+API 在 Redis 中设置取消标记并撤销已排队的 Celery 消息；
+Worker 在检查点（各统计分析之间、各次超参数搜索之间等）读取标记后主动停止
+"""
+
+from typing import Iterable, List
+
+from app.core.logging import app_logger
+from app.exception.exceptions.analysis import AnalysisCancelledError
+from app.utils.redis_client import redis_client
+
+# 取消标记和 Celery 任务ID的保留时间（秒），需长于任务的最长执行时间
+CANCELLATION_TTL = 24 * 3600
+
+
+def _cancel_key(task_id: int | str) -> str:
+    return f"analysis_cancel:{task_id}"
+
+
+def _celery_ids_key(task_id: int | str) -> str:
+    return f"analysis_celery_ids:{task_id}"
+
+
+def request_cancel(task_id: int | str) -> None:
+    """设置任务的取消标记"""
+    try:
+        redis_client.set(_cancel_key(task_id), "1", ex=CANCELLATION_TTL)
+    except Exception as e:
+        app_logger.warning(f"设置任务 {task_id} 的取消标记失败: {str(e)}")
+
+
+def clear_cancel(task_id: int | str) -> None:
+    """清除任务的取消标记和已登记的 Celery 任务ID（任务重新执行前调用）"""
+    try:
+        redis_client.delete(_cancel_key(task_id), _celery_ids_key(task_id))
+    except Exception as e:
+        app_logger.warning(f"清除任务 {task_id} 的取消标记失败: {str(e)}")
+
+
+def is_cancelled(task_id: int | str) -> bool:
+    """
+    任务是否已被取消
+
+    Redis 不可用时视为未取消，任务照常执行
+    """
+    try:
+        return bool(redis_client.exists(_cancel_key(task_id)))
+    except Exception as e:
+        app_logger.warning(f"读取任务 {task_id} 的取消标记失败: {str(e)}")
+        return False
+
+
+def raise_if_cancelled(task_id: int | str) -> None:
+    """取消检查点：任务已被取消时抛出 AnalysisCancelledError"""
+    if is_cancelled(task_id):
+        raise AnalysisCancelledError(task_id)
+
+
+def register_celery_ids(task_id: int | str, celery_ids: Iterable[str]) -> None:
+    """登记属于该分析任务的 Celery 任务ID，取消时据此撤销"""
+    celery_ids = [celery_id for celery_id in celery_ids if celery_id]
+    if not celery_ids:
+        return
+    try:
+        pipe = redis_client.pipeline()
+        pipe.sadd(_celery_ids_key(task_id), *celery_ids)
+        pipe.expire(_celery_ids_key(task_id), CANCELLATION_TTL)
+        pipe.execute()
+    except Exception as e:
+        app_logger.warning(f"登记任务 {task_id} 的 Celery 任务ID失败: {str(e)}")
+
+
+def get_celery_ids(task_id: int | str) -> List[str]:
+    """读取已登记的 Celery 任务ID，Redis 不可用时返回空列表"""
+    try:
+        return [celery_id.decode() for celery_id in redis_client.smembers(_celery_ids_key(task_id))]
+    except Exception as e:
+        app_logger.warning(f"读取任务 {task_id} 的 Celery 任务ID失败: {str(e)}")
+        return []
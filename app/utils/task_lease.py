@@ -0,0 +1,160 @@
+# app/utils/task_lease.py
+
+"""
+分析任务租约
+保证同一个分析任务在任意时刻只有一次执行：
+
+- 入队时写入 queued 标记，表示消息已在队列中
+- Worker 开始执行时原子地领取租约（标记不存在或为 queued 时才能领取），领取失败说明任务已在别处执行
+- 执行期间由后台线程定期续约；Worker 崩溃后续约停止，租约到期自动失效
+- 定期巡检只重新提交租约已失效的 PENDING / PROCESSING 任务
+"""
+
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.config import settings
+from app.core.logging import app_logger
+from app.utils.redis_client import redis_client
+
+QUEUED = "queued"
+
+# 标记不存在或为 queued 时写入新的租约
+_CLAIM_SCRIPT = redis_client.register_script("""
+local current = redis.call('GET', KEYS[1])
+if (not current) or current == ARGV[2] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+    return 1
+end
+return 0
+""")
+
+# 租约仍归自己所有时延长有效期（只延长不缩短）
+_RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+if redis.call('TTL', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+""")
+
+# 租约仍归自己所有时删除
+_RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def _lease_key(task_id: int | str) -> str:
+    return f"analysis_lease:{task_id}"
+
+
+def mark_queued(task_id: int | str) -> bool:
+    """
+    入队前写入 queued 标记
+
+    Returns:
+        是否写入成功；任务已有 queued 标记或租约时返回 False，调用方不应重复入队
+    """
+    try:
+        return bool(redis_client.set(
+            _lease_key(task_id), QUEUED, nx=True, ex=settings.analysis_lease_queued_seconds
+        ))
+    except Exception as e:
+        app_logger.warning(f"写入任务 {task_id} 的入队标记失败: {str(e)}")
+        return True
+
+
+def claim_lease(task_id: int | str) -> str | None:
+    """
+    领取任务租约
+
+    Redis 不可用时照常执行（返回一个不会被校验通过的租约），只是失去去重能力
+
+    Returns:
+        租约令牌，任务已被其它 Worker 领取时返回 None
+    """
+    token = uuid.uuid4().hex
+    try:
+        if _CLAIM_SCRIPT(keys=[_lease_key(task_id)], args=[token, QUEUED, settings.analysis_lease_seconds]):
+            return token
+        return None
+    except Exception as e:
+        app_logger.warning(f"领取任务 {task_id} 的租约失败，跳过去重: {str(e)}")
+        return token
+
+
+def renew_lease(task_id: int | str, token: str, seconds: int | None = None) -> bool:
+    """
+    续约，租约剩余时间不足 seconds 时延长到 seconds
+
+    Returns:
+        租约是否仍归该令牌所有；Redis 不可用时返回 True
+    """
+    try:
+        return bool(_RENEW_SCRIPT(
+            keys=[_lease_key(task_id)], args=[token, seconds or settings.analysis_lease_seconds]
+        ))
+    except Exception as e:
+        app_logger.warning(f"任务 {task_id} 续约失败: {str(e)}")
+        return True
+
+
+def release_lease(task_id: int | str, token: str) -> None:
+    """任务结束后释放租约"""
+    try:
+        _RELEASE_SCRIPT(keys=[_lease_key(task_id)], args=[token])
+    except Exception as e:
+        app_logger.warning(f"释放任务 {task_id} 的租约失败: {str(e)}")
+
+
+def has_lease(task_id: int | str) -> bool:
+    """任务是否有 queued 标记或有效租约；Redis 不可用时返回 True，巡检不会重复提交"""
+    try:
+        return bool(redis_client.exists(_lease_key(task_id)))
+    except Exception as e:
+        app_logger.warning(f"读取任务 {task_id} 的租约失败: {str(e)}")
+        return True
+
+
+@contextmanager
+def lease_heartbeat(task_id: int | str, token: str) -> Iterator[None]:
+    """
+    在后台线程中定期续约，直到离开上下文
+
+    任务代码多为同步计算，会阻塞事件循环，因此续约放在独立线程中；
+    发现租约已被别人领取时只记录警告，由后续的令牌校验阻止结果写入；未传令牌（旧消息）时不续约
+    """
+    if token is None:
+        yield
+        return
+
+    stopped = threading.Event()
+    interval = max(settings.analysis_lease_seconds / 3, 1)
+
+    def beat():
+        while not stopped.wait(interval):
+            if not renew_lease(task_id, token):
+                app_logger.warning(f"任务 {task_id} 的租约已被其它 Worker 领取")
+                return
+
+    thread = threading.Thread(target=beat, name=f"lease-heartbeat-{task_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def is_lease_holder(task_id: int | str, token: str | None) -> bool:
+    """令牌是否仍持有租约（未传令牌的旧消息视为持有）"""
+    if token is None:
+        return True
+    return renew_lease(task_id, token)
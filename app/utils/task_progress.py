@@ -0,0 +1,123 @@
+# app/utils/task_progress.py
+
+"""
+分析任务进度事件
+Worker 把各阶段事件发布到 Redis 频道，同时追加到历史列表；
+API 订阅频道并先回放历史，使中途连接的客户端也能拿到完整进度
+"""
+
+import json
+import time
+from typing import Any, AsyncGenerator, Dict, List
+
+from app.core.logging import app_logger
+from app.utils.json_utils import json_default
+from app.utils.redis_client import async_redis_client, redis_client
+
+# 任务结束后历史事件的保留时间（秒）
+PROGRESS_HISTORY_TTL = 24 * 3600
+# 任务结束的阶段，客户端收到后不会再有新事件
+TERMINAL_STAGES = ("completed", "failed", "cancelled")
+
+
+def progress_channel(task_id: int | str) -> str:
+    """进度事件的发布订阅频道"""
+    return f"analysis_progress:{task_id}"
+
+
+def _history_key(task_id: int | str) -> str:
+    return f"analysis_progress:{task_id}:history"
+
+
+def _seq_key(task_id: int | str) -> str:
+    return f"analysis_progress:{task_id}:seq"
+
+
+def publish_progress(task_id: int | str, stage: str, **fields: Any) -> None:
+    """
+    发布一个进度事件
+
+    进度只用于展示，Redis 不可用时只记录警告，不影响任务执行
+
+    Args:
+        task_id: 任务ID
+        stage: 阶段名称，如 data_cleaned、model_trained、analysis_finished、completed、failed、cancelled
+        **fields: 事件附带的信息，如 name、status、duration_seconds
+    """
+    try:
+        seq = redis_client.incr(_seq_key(task_id))
+        event = {"seq": seq, "task_id": str(task_id), "stage": stage, "timestamp": time.time(), **fields}
+        message = json.dumps(event, ensure_ascii=False, default=json_default)
+
+        pipe = redis_client.pipeline()
+        pipe.rpush(_history_key(task_id), message)
+        pipe.publish(progress_channel(task_id), message)
+        pipe.expire(_history_key(task_id), PROGRESS_HISTORY_TTL)
+        pipe.expire(_seq_key(task_id), PROGRESS_HISTORY_TTL)
+        pipe.execute()
+    except Exception as e:
+        app_logger.warning(f"发布任务 {task_id} 进度事件 {stage} 失败: {str(e)}")
+
+
+def reset_progress(task_id: int | str) -> None:
+    """
+    清除任务的历史进度事件（任务重新执行前调用）
+
+    序号不重置，已连接的订阅者按序号去重时不会误丢新一轮的事件
+    """
+    try:
+        redis_client.delete(_history_key(task_id))
+    except Exception as e:
+        app_logger.warning(f"清除任务 {task_id} 进度事件失败: {str(e)}")
+
+
+async def get_progress_history(task_id: int | str) -> List[Dict[str, Any]]:
+    """读取任务已发布的全部进度事件"""
+    return [json.loads(message) for message in await async_redis_client.lrange(_history_key(task_id), 0, -1)]
+
+
+async def stream_progress(
+    task_id: int | str, heartbeat_seconds: float = 15.0
+) -> AsyncGenerator[Dict[str, Any] | None, None]:
+    """
+    订阅任务的进度事件
+
+    先订阅频道再读取历史，按序号去重，保证订阅前后的事件不丢失也不重复；
+    收到结束阶段的事件后停止
+
+    Args:
+        task_id: 任务ID
+        heartbeat_seconds: 没有新事件时每隔多少秒产出一次 None，供调用方发送心跳
+
+    Yields:
+        进度事件字典，或表示心跳的 None
+    """
+    pubsub = async_redis_client.pubsub()
+    await pubsub.subscribe(progress_channel(task_id))
+    try:
+        last_seq = 0
+        for event in await get_progress_history(task_id):
+            last_seq = event["seq"]
+            yield event
+            if event["stage"] in TERMINAL_STAGES:
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat_seconds)
+            if message is None:
+                yield None
+                continue
+
+            event = json.loads(message["data"])
+            if event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            yield event
+            if event["stage"] in TERMINAL_STAGES:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe(progress_channel(task_id))
+            await pubsub.reset()
+        except Exception as e:
+            app_logger.warning(f"取消订阅任务 {task_id} 进度事件失败: {str(e)}")